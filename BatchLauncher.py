@@ -0,0 +1,201 @@
+"""Headless batch launcher."""
+
+from argparse import ArgumentParser
+from random import Random
+from bt.profiler import TreeProfiler
+from model.Analysis import runUntilPrecise
+from model.KPI import PlantKPIs, STATISTICS
+from model.Distributions import Streams
+from model.Loader import readPlant, loadPlant
+from model.Model import Model
+from model.Partition import ParallelRunner
+from model.ModelBuilder import buildModel
+from model.Recorder import ColumnRecorder
+from model.Replay import ReplayWriter
+from model.Replication import ReplicationRunner
+from model.Simulation import History, labels
+from model.config import TICK
+
+def parseArguments():
+    """Parses the command line arguments."""
+    parser = ArgumentParser(description="Runs the model without GUI over a bounded horizon.")
+    parser.add_argument("--minutes", type=float, default=0, help="simulated minutes")
+    parser.add_argument("--hours", type=float, default=0, help="simulated hours")
+    parser.add_argument("--days", type=float, default=0, help="simulated days")
+    parser.add_argument("--sampling", type=float, default=60,\
+    help="minutes between two recorded samples (default: 60)")
+    parser.add_argument("--next-event", action="store_true",\
+    help="skips the idle ticks (next-event time advance)")
+    parser.add_argument("--compile", action="store_true",\
+    help="compiles the behaviour trees into flat tick functions")
+    parser.add_argument("--plant", help="plant definition file (default: reference plant)")
+    parser.add_argument("--dirty", action="store_true",\
+    help="only ticks the nodes whose elements changed or whose timers run (same results)")
+    parser.add_argument("--seed", type=int, help="seed of the random streams")
+    parser.add_argument("--crn", action="store_true",\
+    help="common random numbers : one random stream per random input")
+    parser.add_argument("--replications", type=int, default=1,\
+    help="number of independent replications (default: 1)")
+    parser.add_argument("--processes", type=int,\
+    help="processes running the replications (default: all the cores)")
+    parser.add_argument("--partitions", type=int,\
+    help="ticks independent sub-networks of the plant in this number of processes")
+    parser.add_argument("--cut", help="edges linking the partitions : 'auto', or edge names "\
+    "separated by commas (the transfers through them are delayed by up to --window ticks)")
+    parser.add_argument("--window", type=float, default=60,\
+    help="minutes between two exchanges between the partitions (default: 60)")
+    parser.add_argument("--checkpoint", help="checkpoint file to start from")
+    parser.add_argument("--save-checkpoint", help="file receiving the final checkpoint")
+    parser.add_argument("--history", help="CSV file receiving the level histories")
+    parser.add_argument("--record", metavar="DIRECTORY",\
+    help="directory receiving the level of every element at every tick (.npy table)")
+    parser.add_argument("--record-changes", action="store_true",\
+    help="only records the changes of the levels (with --record)")
+    parser.add_argument("--replay", metavar="FILE",\
+    help="replay file receiving the levels, to be reviewed with ModelLauncher --replay")
+    parser.add_argument("--replay-every", type=float, default=1,\
+    help="minutes between two frames of the replay (default: 1)")
+    parser.add_argument("--profile", metavar="FILE",\
+    help="profiles the behaviour trees, and writes the folded stacks (flame graph) in FILE")
+    parser.add_argument("--kpis", help="JSON file receiving the summary KPIs")
+    parser.add_argument("--precision", action="append", default=[], metavar="KPI=HALFWIDTH",\
+    help="stops as soon as the steady-state KPI (e.g. 'pit n°1:utilization=0.01') is "\
+    "estimated within this 95%% confidence half-width, the horizon being the maximum ; "\
+    "with --replications, the maximum number of replications")
+    return parser.parse_args()
+
+def printKPIs(kpis):
+    """Prints the summary KPIs."""
+    print("%-45s %12s %12s %12s %12s" % ("element", "mean", "min", "max", "final"))
+    for label, stats in kpis.items():
+        print("%-45s %12.2f %12.2f %12.2f %12.2f" % (label, stats["mean"], stats["min"],\
+        stats["max"], stats["final"]))
+
+def printPlantKPIs(plant):
+    """Prints the plant KPIs."""
+    for name, value in plant.items():
+        print("%-45s %12.4f" % (name, value))
+
+def printAggregated(aggregated, nbReplicas, names=()):
+    """Prints the mean levels over the replications, the plant KPIs and the given metrics,
+    with their confidence intervals."""
+    print("%-45s %12s %12s   (%d replications)" % ("element", "mean", "+/- 95%", nbReplicas))
+    for name, (mean, halfWidth) in aggregated.items():
+        if name.endswith(":mean"):
+            print("%-45s %12.2f %12.2f" % (name[:-len(":mean")], mean, halfWidth))
+    for name, (mean, halfWidth) in aggregated.items():
+        if name.rsplit(":", 1)[-1] in STATISTICS:
+            print("%-45s %12.4f %12.4f" % (name, mean, halfWidth))
+    for name in names:
+        print("%-45s %12.4f %12.4f" % ((name,) + aggregated[name]))
+
+def printEstimates(analyzer):
+    """Prints the steady-state KPIs of a run, with their confidence intervals."""
+    print("%-45s %12s %12s   (%d ticks, warm-up : %d ticks)" % ("steady-state KPI", "mean",\
+    "+/- 95%", analyzer.last - analyzer.start, analyzer.warmupTicks()))
+    for name, (mean, halfWidth) in analyzer.estimates().items():
+        print("%-45s %12.4f %12.4f" % (name, mean, halfWidth))
+
+def parseTarget(definition):
+    """Parses a KPI=HALFWIDTH precision target."""
+    name, halfWidth = definition.rsplit("=", 1)
+    return name, float(halfWidth)
+
+# ========================================== LAUNCHER PART =========================================
+if __name__ == '__main__':
+    ARGS = parseArguments()
+    if ARGS.partitions and ARGS.profile:
+        raise SystemExit("--profile cannot be used with --partitions")
+    if ARGS.partitions and ARGS.replay:
+        raise SystemExit("--replay cannot be used with --partitions")
+    if ARGS.partitions and ARGS.record:
+        raise SystemExit("--record cannot be used with --partitions")
+    # Horizon and sampling period (ticks)
+    DURATION = int((ARGS.minutes + ARGS.hours*60 + ARGS.days*1440)/TICK)
+    SAMPLING = max(1, int(ARGS.sampling/TICK))
+    PLANT = readPlant(ARGS.plant) if ARGS.plant else None
+    TARGETS = dict(parseTarget(target) for target in ARGS.precision)
+    if TARGETS and ARGS.partitions:
+        raise SystemExit("--precision cannot be used with --partitions")
+    CHECKPOINT = None
+    if ARGS.checkpoint:
+        with open(ARGS.checkpoint, 'rb') as INPUT:
+            CHECKPOINT = INPUT.read()
+    if ARGS.replications > 1:
+        RUNNER = ReplicationRunner(DURATION, SAMPLING, ARGS.next_event, ARGS.compile,\
+        ARGS.processes, CHECKPOINT, PLANT, ARGS.crn, bool(TARGETS))
+        if TARGETS:
+            RESULTS = RUNNER.runUntilPrecise(ARGS.seed or 0, TARGETS, ARGS.replications)
+        else:
+            RESULTS = []
+            for REPLICA, METRICS in RUNNER.run(ARGS.seed or 0, ARGS.replications):
+                RESULTS.append((REPLICA, METRICS))
+                print("replica %d done (%d/%d)" % (REPLICA, len(RESULTS), ARGS.replications))
+        printAggregated(ReplicationRunner.aggregate(RESULTS), len(RESULTS), list(TARGETS))
+    else:
+        # Creates and builds the model, without GUI
+        MODEL = Model()
+        RNG = Random(ARGS.seed) if ARGS.seed is not None else None
+        STREAMS = Streams(ARGS.seed or 0) if ARGS.crn else None
+        if PLANT is not None:
+            loadPlant(MODEL, PLANT, RNG, streams=STREAMS)
+        else:
+            buildModel(MODEL, RNG, streams=STREAMS)
+        if CHECKPOINT is not None:
+            MODEL.restore(CHECKPOINT)
+        if ARGS.compile and not ARGS.partitions:
+            MODEL.compile()
+        if ARGS.dirty and not ARGS.partitions:
+            MODEL.schedule()
+        # The tasks counting the plant KPIs run in the partitions
+        if not ARGS.partitions:
+            MODEL.kpis = PlantKPIs(MODEL)
+        RECORDER = None
+        if ARGS.record:
+            RECORDER = ColumnRecorder(MODEL, ARGS.record, ColumnRecorder.ON_CHANGE\
+            if ARGS.record_changes else ColumnRecorder.EVERY_TICK)
+            MODEL.addObserver(RECORDER)
+        REPLAY = None
+        if ARGS.replay:
+            REPLAY = ReplayWriter(MODEL, ARGS.replay, max(1, int(ARGS.replay_every/TICK)))
+            MODEL.addObserver(REPLAY)
+        PROFILER = None
+        if ARGS.profile:
+            PROFILER = TreeProfiler()
+            PROFILER.attach(MODEL, labels(MODEL.nodes, "node"))
+        if ARGS.partitions:
+            CUT = ARGS.cut if ARGS.cut in (None, "auto") else ARGS.cut.split(",")
+            try:
+                PARALLEL = ParallelRunner(MODEL, ARGS.partitions, max(1, int(ARGS.window/TICK)),\
+                CUT, ARGS.seed or 0, ARGS.compile, ARGS.next_event)
+            except (KeyError, ValueError) as ERROR:
+                raise SystemExit("--cut : " + str(ERROR.args[0]))
+            RESULT = PARALLEL.simulate(DURATION, SAMPLING)
+            PARALLEL.close()
+        elif TARGETS:
+            HISTORY = History(MODEL, SAMPLING)
+            MODEL.addObserver(HISTORY)
+            ANALYZER = runUntilPrecise(MODEL, TARGETS, DURATION, nextEvent=ARGS.next_event)
+            MODEL.removeObserver(HISTORY)
+            RESULT = HISTORY.result()
+            printEstimates(ANALYZER)
+        else:
+            RESULT = MODEL.simulate(DURATION, SAMPLING, ARGS.next_event)
+        if PROFILER is not None:
+            PROFILER.detach()
+            PROFILER.writeFolded(ARGS.profile)
+            PROFILER.printReport()
+        if RECORDER is not None:
+            RECORDER.close()
+        if REPLAY is not None:
+            MODEL.removeObserver(REPLAY)
+            REPLAY.close()
+        if ARGS.history:
+            RESULT.writeCSV(ARGS.history)
+        if ARGS.kpis:
+            RESULT.writeKPIs(ARGS.kpis)
+        if ARGS.save_checkpoint:
+            with open(ARGS.save_checkpoint, 'wb') as OUTPUT:
+                OUTPUT.write(MODEL.checkpoint())
+        printKPIs(RESULT.kpis())
+        printPlantKPIs(RESULT.plant)
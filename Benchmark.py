@@ -0,0 +1,329 @@
+"""Benchmarks of the behaviour trees, the model, the rendering and the imports."""
+
+from argparse import ArgumentParser
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+from datetime import datetime
+from random import Random
+from time import perf_counter
+from bt.base import Sequence, Selector, SequenceStar, SelectorStar, Threshold, SpaceChecker
+from bt.base import RawUpdater, Mine, Train, Boat, Consume, MultipleConsume
+from bt.decorator import Delay, Repeater, ThresholdDec
+from model.Model import Model, Node, Edge
+from model import ModelBuilder
+from model.ModelBuilder import buildModel, triangularDistrib
+from model.Snapshot import Layout, Snapshot
+from model.SharedState import SharedStateChannel
+
+# Capacity of the elements of the fixtures : they never fill up nor run dry
+LARGE = 1e12
+# Ticks run by one call of a benchmarked function
+BATCH = 1000
+# Modules of the headless core, imported by the workers and the command line runs :
+# they must not import the GUI modules (see --import-budget)
+CORE_MODULES = ("bt.base", "model.Model", "model.Replication", "BatchLauncher")
+GUI_MODULES = ("tkinter", "gui")
+
+def parseArguments():
+    """Parses the command line arguments."""
+    parser = ArgumentParser(description="Measures the ticks per second of the behaviour trees "\
+    "and of the model, and the cost of the snapshots and of the rendering.")
+    parser.add_argument("--output", help="JSON file receiving the results")
+    parser.add_argument("--compare", metavar="BASELINE",\
+    help="JSON file of previous results : flags the regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,\
+    help="relative slowdown flagged as a regression (default: 0.1)")
+    parser.add_argument("--filter", default="",\
+    help="only runs the benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5,\
+    help="measures per benchmark, the best one is kept (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.2,\
+    help="minimum duration of a measure (seconds, default: 0.2)")
+    parser.add_argument("--import-budget", type=float, metavar="MS",\
+    help="fails if importing a module of the headless core takes longer (milliseconds), "\
+    "or imports the GUI")
+    return parser.parse_args()
+
+# ============================================ FIXTURES ============================================
+def edge(level=0):
+    """Returns an edge that never fills up, with the given level."""
+    result = Edge("edge", LARGE)
+    result.current = level
+    return result
+
+def node():
+    """Returns a node that never fills up."""
+    return Node("node", LARGE)
+
+def ticker(task):
+    """Returns a function running a task BATCH times."""
+    run = task.run
+    def tick():
+        for _ in range(BATCH):
+            run()
+    return tick
+
+def builders():
+    """Behaviour trees of the model builder, on elements that never block them.
+    Each entry returns a function running BATCH ticks on a fresh tree."""
+    return {
+        "builder.trainBT": lambda: ticker(ModelBuilder.trainBT(node(), edge())),
+        "builder.miningBT": lambda: ticker(ModelBuilder.miningBT(node(), edge(), Random(0))),
+        "builder.receiptBT": lambda: ticker(ModelBuilder.receiptBT(edge(LARGE/2), node(), edge())),
+        "builder.preparationBT":\
+        lambda: ticker(ModelBuilder.preparationBT(edge(LARGE/2), node(), edge())),
+        "builder.treatmentBT":\
+        lambda: ticker(ModelBuilder.treatmentBT(edge(LARGE/2), edge(LARGE/2), node(), edge())),
+        "builder.shipmentBT":\
+        lambda: ticker(ModelBuilder.shipmentBT(edge(LARGE/2), node(), edge())),
+        "builder.boatBT": lambda: ticker(ModelBuilder.boatBT(edge(LARGE/2), node())),
+    }
+
+def composite(task, *children):
+    """Adds children to a composite task and returns it."""
+    for child in children:
+        task.add_child(child)
+    return task
+
+def passing():
+    """Condition that always succeeds."""
+    return Threshold(edge(1), 0, Threshold.SUPERIOR)
+
+def failing():
+    """Condition that always fails."""
+    return Threshold(edge(0), 1, Threshold.SUPERIOR)
+
+def primitives():
+    """Tasks of bt/base.py and bt/decorator.py, alone or over the cheapest conditions.
+    Each entry returns a function running BATCH ticks on a fresh task."""
+    rng = Random(0)
+    return {
+        "primitive.Sequence":\
+        lambda: ticker(composite(Sequence(), passing(), passing(), passing())),
+        "primitive.Selector":\
+        lambda: ticker(composite(Selector(), failing(), failing(), passing())),
+        "primitive.SequenceStar":\
+        lambda: ticker(composite(SequenceStar(), passing(), passing(), passing())),
+        "primitive.SelectorStar":\
+        lambda: ticker(composite(SelectorStar(), failing(), failing(), passing())),
+        "primitive.Threshold": lambda: ticker(passing()),
+        "primitive.SpaceChecker": lambda: ticker(SpaceChecker(edge(), 1)),
+        "primitive.RawUpdater": lambda: ticker(RawUpdater(edge(LARGE/2), edge(), 1)),
+        "primitive.Mine":\
+        lambda: ticker(Mine(node(), edge(), lambda: triangularDistrib(rng), 60, 1)),
+        "primitive.Train": lambda: ticker(Train(node(), edge(), 10, 100)),
+        "primitive.Boat": lambda: ticker(Boat(node(), edge(LARGE/2), 1)),
+        "primitive.Consume":\
+        lambda: ticker(Consume(edge(LARGE/2), node(), edge(), 100, 1, 1, 10)),
+        "primitive.MultipleConsume": lambda: ticker(MultipleConsume([edge(LARGE/2),\
+        edge(LARGE/2)], node(), edge(), 100, [1, 1], 1, 10)),
+        "primitive.Delay": lambda: ticker(composite(Delay(10), passing())),
+        "primitive.Repeater": lambda: ticker(composite(Repeater(), failing())),
+        "primitive.ThresholdDec":\
+        lambda: ticker(composite(ThresholdDec(edge(1), 0), passing())),
+    }
+
+def newModel(compiled=False, gui=None, scheduled=False):
+    """Returns the model of the plant, with a seeded random stream."""
+    model = Model(gui)
+    buildModel(model, Random(0))
+    if compiled:
+        model.compile()
+    if scheduled:
+        model.schedule()
+    return model
+
+def runner(model):
+    """Returns a function running BATCH ticks of a model."""
+    run = model.run
+    def tick():
+        for _ in range(BATCH):
+            run()
+    return tick
+
+def advancer(model):
+    """Returns a function advancing a model by BATCH ticks (next-event time advance)."""
+    advance = model.advance
+    def tick():
+        end = model.clock + BATCH
+        while model.clock < end:
+            advance(end - model.clock)
+    return tick
+
+def notifier(model):
+    """Returns a function publishing BATCH snapshots of a model."""
+    notify = model.notifyGUI
+    def tick():
+        for _ in range(BATCH):
+            notify()
+    return tick
+
+def snapshotter(model):
+    """Returns a function capturing BATCH snapshots of a model."""
+    def tick():
+        for _ in range(BATCH):
+            Snapshot.capture(model)
+    return tick
+
+def whole(channels):
+    """Whole model : ticks, snapshots and publication to the GUI.
+    The shared memory channels are appended to 'channels', to be closed afterwards."""
+    def sharedChannel():
+        model = newModel()
+        channels.append(SharedStateChannel(len(model.nodes) + len(model.edges)))
+        model.gui = channels[-1]
+        return notifier(model)
+    return {
+        "model.run": lambda: runner(newModel()),
+        "model.run.compiled": lambda: runner(newModel(True)),
+        "model.run.scheduled": lambda: runner(newModel(scheduled=True)),
+        "model.advance": lambda: advancer(newModel()),
+        "model.snapshot": lambda: snapshotter(newModel()),
+        "model.notifyGUI.queue": lambda: notifier(newModel(gui=queue.Queue(1))),
+        "model.notifyGUI.shm": sharedChannel,
+    }
+
+def rendering():
+    """Redraw of the canvas by the GUI, if a display is available."""
+    try:
+        from tkinter import Tk, Canvas, TclError
+    except ImportError:
+        return {}
+    from gui.Renderer import Renderer
+    from gui.ModelGUI import CANVAS_X, CANVAS_Y
+    try:
+        window = Tk()
+    except TclError:
+        return {}
+    canvas = Canvas(window, width=CANVAS_X, height=CANVAS_Y)
+    canvas.pack()
+    def redraw():
+        model = newModel()
+        renderer = Renderer(Layout(model), CANVAS_X, CANVAS_Y)
+        run = model.run
+        def tick():
+            # Redraws are much slower than ticks
+            for _ in range(BATCH//100):
+                run()
+                renderer.draw(canvas, Snapshot.capture(model))
+                window.update_idletasks()
+            return BATCH//100
+        return tick
+    return {"gui.redraw": redraw}
+
+def importTime(module):
+    """Returns the time (seconds) to import a module in a fresh interpreter, and the GUI
+    modules it imported."""
+    code = "import sys, time\nstart = time.perf_counter()\nimport " + module\
+    + "\nprint(time.perf_counter() - start)\nprint(' '.join(name for name in sys.modules "\
+    + "if name.split('.')[0] in " + repr(GUI_MODULES) + "))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,\
+    check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split("\n")
+    return float(output[0]), output[1].split()
+
+def imports(pattern="", repeat=5):
+    """Measures the imports of the modules of the headless core, each in a fresh interpreter
+    (the best of 'repeat' measures). Returns name -> (rate (per second), GUI modules)."""
+    results = {}
+    for module in CORE_MODULES:
+        name = "import." + module
+        if pattern in name:
+            measures = [importTime(module) for _ in range(repeat)]
+            best = min(time for time, _ in measures)
+            results[name] = (1/best, measures[0][1])
+    return results
+
+# ========================================== MEASUREMENTS ==========================================
+def measure(factory, repeat, minTime):
+    """Returns the best rate (calls of the benchmarked function per second, times BATCH)
+    over 'repeat' measures, each on a fresh fixture."""
+    best = 0
+    for _ in range(repeat):
+        tick = factory()
+        calls = 0
+        start = perf_counter()
+        elapsed = 0
+        while elapsed < minTime:
+            calls += tick() or BATCH
+            elapsed = perf_counter() - start
+        best = max(best, calls/elapsed)
+    return best
+
+def runAll(pattern="", repeat=5, minTime=0.2):
+    """Runs the benchmarks whose name contains the pattern.
+    Returns the results : name -> rate (per second)."""
+    channels = []
+    benchmarks = dict(builders(), **primitives())
+    benchmarks.update(whole(channels))
+    # Opens a window only if the redraw is benchmarked
+    if pattern in "gui.redraw":
+        redraw = rendering()
+        if not redraw:
+            print("gui.redraw : no display available, skipped")
+        benchmarks.update(redraw)
+    results = {}
+    try:
+        for name, factory in benchmarks.items():
+            if pattern in name:
+                results[name] = measure(factory, repeat, minTime)
+                print("%-35s %15.0f /s" % (name, results[name]))
+    finally:
+        for channel in channels:
+            channel.close()
+    for name, (rate, _) in imports(pattern, repeat).items():
+        results[name] = rate
+        print("%-35s %15.0f /s %8.1f ms" % (name, rate, 1000/rate))
+    return results
+
+def checkImports(budget, repeat=5):
+    """Checks the imports of the headless core against a budget (milliseconds).
+    Returns the failures."""
+    failures = []
+    for name, (rate, gui) in imports("", repeat).items():
+        if gui:
+            failures.append("%s imports %s" % (name, ", ".join(gui)))
+        if 1000/rate > budget:
+            failures.append("%s takes %.1f ms (budget : %.1f ms)" % (name, 1000/rate, budget))
+    return failures
+
+def compare(results, baseline, threshold):
+    """Compares the results with a baseline. Returns the names of the regressions."""
+    regressions = []
+    print("%-35s %15s %15s %8s" % ("benchmark", "baseline", "current", "ratio"))
+    for name, rate in results.items():
+        if name not in baseline:
+            continue
+        ratio = rate/baseline[name]
+        flag = ratio < 1 - threshold
+        if flag:
+            regressions.append(name)
+        print("%-35s %15.0f %15.0f %8.2f%s" % (name, baseline[name], rate, ratio,\
+        "  REGRESSION" if flag else ""))
+    return regressions
+
+# ========================================== LAUNCHER PART =========================================
+if __name__ == '__main__':
+    ARGS = parseArguments()
+    RESULTS = runAll(ARGS.filter, ARGS.repeat, ARGS.min_time)
+    if ARGS.import_budget is not None:
+        FAILURES = checkImports(ARGS.import_budget, ARGS.repeat)
+        for FAILURE in FAILURES:
+            print("IMPORT BUDGET : " + FAILURE)
+        if FAILURES:
+            sys.exit(1)
+    if ARGS.output:
+        with open(ARGS.output, 'w', encoding='utf-8') as OUTPUT:
+            json.dump({"date": datetime.now().isoformat(timespec='seconds'),\
+            "python": sys.version.split()[0], "machine": platform.platform(), "batch": BATCH,\
+            "results": RESULTS}, OUTPUT, indent=1)
+    if ARGS.compare:
+        with open(ARGS.compare, encoding='utf-8') as INPUT:
+            BASELINE = json.load(INPUT)["results"]
+        REGRESSIONS = compare(RESULTS, BASELINE, ARGS.threshold)
+        if REGRESSIONS:
+            print("%d regression(s) : %s" % (len(REGRESSIONS), ", ".join(REGRESSIONS)))
+            sys.exit(1)
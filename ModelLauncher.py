@@ -1,41 +1,100 @@
 """Model launcher."""
 
+import asyncio
+from argparse import ArgumentParser
 from multiprocessing import Process, Queue
 from gui.ModelGUI import ModelGUI
 from model.Model import Model
 from model.ModelBuilder import buildModel
+from model.Snapshot import Layout
+from model.SharedState import SharedStateChannel
+from model.Publisher import Publisher
+from model.KPI import PlantKPIs
+from model.Streaming import StreamClient, serve, parseAddress
+from model.Replay import Replay
 from model.config import TICK
 
 class ModelLauncher(Process):
     """Model launcher."""
 
-    def __init__(self, guiQueue=None):
+    def __init__(self, guiQueue=None, sharedMemory=False, publisher=None):
         super(ModelLauncher, self).__init__()
         self.queue = guiQueue
         # Creates and builds the model
-        self.model = Model(guiQueue)
+        self.model = Model(guiQueue, publisher)
         buildModel(self.model)
+        self.model.kpis = PlantKPIs(self.model)
+        # Replaces the queue by a shared memory channel
+        if sharedMemory:
+            self.queue = SharedStateChannel(Layout(self.model).nbValues)
+            self.model.gui = self.queue
 
     def run(self):
         """Runs the simulation."""
         while True:
             self.model.run()
 
+    def serve(self, host, port):
+        """Runs the simulation without GUI, streaming its levels to the dashboards
+        (see Streaming.serve)."""
+        def ready(address):
+            print("Streaming on %s:%d" % address, flush=True)
+        try:
+            asyncio.run(serve(self.model, host, port, ready))
+        except KeyboardInterrupt:
+            pass
+
     def getQueue(self):
         """Returns the queue."""
         return self.queue
 
+    def getLayout(self):
+        """Returns the static layout of the model."""
+        return Layout(self.model)
+
 # ========================================== LAUNCHER PART =========================================
 if __name__ == '__main__':
+    PARSER = ArgumentParser(description="Runs the model with its GUI.")
+    PARSER.add_argument("--shm", action="store_true",\
+    help="uses a shared memory channel instead of the GUI queue")
+    PARSER.add_argument("--every", type=int, default=1,\
+    help="publishes a snapshot every N ticks (default: 1)")
+    PARSER.add_argument("--fps", type=float,\
+    help="publishes at most N snapshots per second (default: no limit)")
+    PARSER.add_argument("--keep", choices=("latest", "oldest"), default="latest",\
+    help="snapshot kept when the GUI queue is full (default: latest)")
+    PARSER.add_argument("--fill-by-level", action="store_true",\
+    help="colours the nodes according to their level")
+    PARSER.add_argument("--serve", metavar="[HOST:]PORT",\
+    help="runs the model without GUI and streams its levels to the dashboards")
+    PARSER.add_argument("--connect", metavar="[HOST:]PORT",\
+    help="displays the levels streamed by a model run with --serve")
+    PARSER.add_argument("--replay", metavar="FILE",\
+    help="reviews a replay file written by BatchLauncher --replay, instead of running the model")
+    ARGS = PARSER.parse_args()
+    if sum(map(bool, (ARGS.serve, ARGS.connect, ARGS.replay))) > 1:
+        PARSER.error("--serve, --connect and --replay are exclusive")
+    POLICY = Publisher.KEEP_LATEST if ARGS.keep == "latest" else Publisher.KEEP_OLDEST
     # Size of the GUI queue : increase if more memory available
-    # To synchronize the GUI and the model, simply set to 1
+    # The model never waits for the GUI : with a size of 1, only the newest snapshot is kept
     QUEUE_SIZE = 100
-    # Creates the model
-    QUEUE = Queue(QUEUE_SIZE)
-    PROC = ModelLauncher(QUEUE)
-    # Creates the GUI
-    GUI = ModelGUI(PROC, TICK)
-    # Starts the random walk
-    PROC.start()
-    # Displays the GUI
-    GUI.display()
+    if ARGS.replay:
+        GUI = ModelGUI(Replay(ARGS.replay), TICK, ARGS.fill_by_level)
+        GUI.display()
+    elif ARGS.connect:
+        # Read-only dashboard of a model run with --serve
+        GUI = ModelGUI(StreamClient(*parseAddress(ARGS.connect)), TICK, ARGS.fill_by_level)
+        GUI.display()
+    elif ARGS.serve:
+        ModelLauncher(None, False, Publisher(ARGS.every, ARGS.fps, POLICY))\
+        .serve(*parseAddress(ARGS.serve))
+    else:
+        # Creates the model
+        QUEUE = None if ARGS.shm else Queue(QUEUE_SIZE)
+        PROC = ModelLauncher(QUEUE, ARGS.shm, Publisher(ARGS.every, ARGS.fps, POLICY))
+        # Creates the GUI
+        GUI = ModelGUI(PROC, TICK, ARGS.fill_by_level)
+        # Starts the random walk
+        PROC.start()
+        # Displays the GUI
+        GUI.display()
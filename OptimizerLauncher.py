@@ -0,0 +1,86 @@
+"""Capacity optimizer launcher."""
+
+from argparse import ArgumentParser
+import json
+from model.Loader import readPlant
+from model.Optimization import Axis, CapacityOptimizer, parseConstraint
+from model.Sweep import writeTable
+from model.config import DEFAULTS, TICK
+
+# Capacities searched by default : from a quarter to twice their reference value
+CAPACITIES = ("MAX_PIT1", "MAX_PIT2", "MAX_TANK", "MAX_RECEIPT")
+
+def parseArguments():
+    """Parses the command line arguments."""
+    parser = ArgumentParser(description="Searches the smallest parameter values meeting "\
+    "constraints on the KPIs (successive halving over parallel runs).")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=LOW:HIGH[:STEP]",\
+    help="range of a parameter of model/config.py (repeatable, default: %s from a quarter "\
+    "to twice their value)" % ", ".join(CAPACITIES))
+    parser.add_argument("--constraint", action="append", required=True,\
+    metavar="METRIC<=BOUND", help="bound on the mean of a metric (repeatable), e.g. "\
+    "'node0:rejectionRatio<=0' (no train turned away) or 'node6:turnaround<=2000'")
+    parser.add_argument("--weight", action="append", default=[], metavar="NAME=WEIGHT",\
+    help="weight of a parameter in the cost (default: 1)")
+    parser.add_argument("--days", type=float, default=365,\
+    help="simulated days, covering several boat cycles (default: 365)")
+    parser.add_argument("--min-days", type=float,\
+    help="simulated days of the first rung (default: the days divided by eta squared)")
+    parser.add_argument("--candidates", type=int, default=27,\
+    help="number of candidates of the first rung (default: 27)")
+    parser.add_argument("--eta", type=int, default=3,\
+    help="only the best 1/eta of the candidates go to the next rung (default: 3)")
+    parser.add_argument("--replications", type=int, default=1,\
+    help="replications per candidate (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random streams")
+    parser.add_argument("--processes", type=int,\
+    help="processes running the candidates (default: all the cores)")
+    parser.add_argument("--checkpoint", help="checkpoint file the candidates start from")
+    parser.add_argument("--plant", help="plant definition file (default: reference plant)")
+    parser.add_argument("--no-crn", action="store_true",\
+    help="independent random inputs in the candidates (default: common random numbers)")
+    parser.add_argument("--output", default="optimization.csv",\
+    help="CSV file receiving the rows of all the rungs")
+    return parser.parse_args()
+
+def parseAxis(definition):
+    """Parses a NAME=LOW:HIGH[:STEP] range."""
+    name, bounds = definition.split("=", 1)
+    return Axis(name, *(json.loads(bound) for bound in bounds.split(":")))
+
+def defaultAxis(name):
+    """Returns the range of a capacity, from a quarter to twice its reference value."""
+    value = DEFAULTS.values()[name]
+    return Axis(name, value//4, value*2, max(1, value//20))
+
+def printRung(rows):
+    """Prints the candidates of a rung, best first."""
+    print("rung %d : %d candidates over %d ticks" % (rows[0]["rung"], len(rows),\
+    rows[0]["ticks"]))
+    for row in rows:
+        print("  %-60s cost %8.4f  violation %10.4f" % (", ".join("%s=%s" % (axis.name,\
+        row[axis.name]) for axis in AXES), row["cost"], row["violation"]))
+
+# ========================================== LAUNCHER PART =========================================
+if __name__ == '__main__':
+    ARGS = parseArguments()
+    AXES = [parseAxis(axis) for axis in ARGS.param] if ARGS.param\
+    else [defaultAxis(name) for name in CAPACITIES]
+    CHECKPOINT = None
+    if ARGS.checkpoint:
+        with open(ARGS.checkpoint, 'rb') as INPUT:
+            CHECKPOINT = INPUT.read()
+    WEIGHTS = {name: float(weight) for name, weight in\
+    (definition.split("=", 1) for definition in ARGS.weight)}
+    OPTIMIZER = CapacityOptimizer(AXES, [parseConstraint(constraint)\
+    for constraint in ARGS.constraint], int(ARGS.days*1440/TICK),\
+    int(ARGS.min_days*1440/TICK) if ARGS.min_days else None, ARGS.eta, ARGS.replications,\
+    ARGS.seed, WEIGHTS, processes=ARGS.processes, checkpoint=CHECKPOINT,\
+    plant=readPlant(ARGS.plant) if ARGS.plant else None, crn=not ARGS.no_crn)
+    BEST, ROWS = OPTIMIZER.search(ARGS.candidates, printRung)
+    writeTable(ROWS, ARGS.output)
+    print("%d evaluations written in %s" % (len(ROWS), ARGS.output))
+    if BEST is None:
+        print("no candidate meets the constraints")
+    else:
+        print("best : " + ", ".join("%s=%s" % item for item in BEST.items()))
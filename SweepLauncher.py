@@ -0,0 +1,49 @@
+"""Parameter sweep launcher."""
+
+from argparse import ArgumentParser
+import json
+from model.Loader import readPlant
+from model.Sweep import Sweep, grid, writeTable
+from model.config import TICK
+
+def parseArguments():
+    """Parses the command line arguments."""
+    parser = ArgumentParser(description="Runs the model for a grid or a list of parameter values.")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",\
+    help="values of a parameter of model/config.py (grid axis, repeatable)")
+    parser.add_argument("--scenarios", help="JSON file holding a list of parameter overrides")
+    parser.add_argument("--days", type=float, default=30, help="simulated days (default: 30)")
+    parser.add_argument("--replications", type=int, default=1,\
+    help="replications per scenario (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random streams")
+    parser.add_argument("--processes", type=int,\
+    help="processes running the scenarios (default: all the cores)")
+    parser.add_argument("--checkpoint", help="checkpoint file the scenarios start from")
+    parser.add_argument("--plant", help="plant definition file (default: reference plant)")
+    parser.add_argument("--crn", action="store_true",\
+    help="common random numbers : same random inputs in all the scenarios")
+    parser.add_argument("--output", default="sweep.csv", help="CSV file receiving the table")
+    return parser.parse_args()
+
+def parseAxis(definition):
+    """Parses a NAME=V1,V2,... grid axis."""
+    name, values = definition.split("=", 1)
+    return name, [json.loads(value) for value in values.split(",")]
+
+# ========================================== LAUNCHER PART =========================================
+if __name__ == '__main__':
+    ARGS = parseArguments()
+    SCENARIOS = grid(**dict(parseAxis(axis) for axis in ARGS.param))
+    if ARGS.scenarios:
+        with open(ARGS.scenarios, encoding='utf-8') as INPUT:
+            SCENARIOS = json.load(INPUT) + (SCENARIOS if ARGS.param else [])
+    CHECKPOINT = None
+    if ARGS.checkpoint:
+        with open(ARGS.checkpoint, 'rb') as INPUT:
+            CHECKPOINT = INPUT.read()
+    SWEEP = Sweep(int(ARGS.days*1440/TICK), ARGS.replications, ARGS.seed,\
+    processes=ARGS.processes, checkpoint=CHECKPOINT,\
+    plant=readPlant(ARGS.plant) if ARGS.plant else None, crn=ARGS.crn)
+    ROWS = SWEEP.run(SCENARIOS)
+    writeTable(ROWS, ARGS.output)
+    print("%d scenarios written in %s" % (len(ROWS), ARGS.output))
@@ -3,10 +3,16 @@ from abc import ABCMeta, abstractmethod
 
 # Tolerance to approximations
 TOLERANCE = 0.001
+# Number of ticks during which a task stays idle while the model does not change
+FOREVER = float('inf')
 
 class Task(object, metaclass=ABCMeta):
     """ Classe base pour un noeud du Behavior Tree """
     ECHEC, SUCCES, RUNNING = range(3)  # compatibilite: False est un ECHEC et True est un SUCCES
+    # Attributes holding the progress of the task (saved in checkpoints)
+    STATE = ()
+    # Attributes counting the events of the task (see model.KPI, saved in checkpoints)
+    COUNTERS = ()
 
     def __init__(self):
         self._children = []
@@ -17,10 +23,27 @@ class Task(object, metaclass=ABCMeta):
         """Ticks."""
         return
 
+    def peek(self):
+        """Predicts the next ticks without running them.
+        Returns (status, ticks) : the next 'ticks' runs would all return 'status', and would
+        only update internal counters (see skip), as long as no model element changes.
+        ticks is 0 when the task has to be run."""
+        return (None, 0)
+
+    def skip(self, ticks):
+        """Applies at once the given number of idle runs predicted by peek."""
+        return
+
     def add_child(self, c):
         """Adds a child."""
         self._children.append(c)
 
+    def walk(self):
+        """Iterates over the task and its descendants, depth first."""
+        yield self
+        for child in self._children:
+            yield from child.walk()
+
 class Decorator(Task):
     """ Decorator """
     __metaclass__ = ABCMeta
@@ -35,6 +58,7 @@ class Decorator(Task):
 
 class Selector(Task):
     """ Selector """
+    STATE = ('index',)
 
     def __init__(self):
         super().__init__()
@@ -48,12 +72,31 @@ class Selector(Task):
                 return Task.RUNNING
         return Task.ECHEC
 
+    def peek(self):
+        ticks = FOREVER
+        for i in range(self.index, len(self._children)):
+            status, childTicks = self._children[i].peek()
+            ticks = min(ticks, childTicks)
+            if ticks == 0:
+                return (None, 0)
+            if status != Task.ECHEC:
+                return (status, ticks)
+        return (Task.ECHEC, ticks)
+
+    def skip(self, ticks):
+        for i in range(self.index, len(self._children)):
+            status, _ = self._children[i].peek()
+            self._children[i].skip(ticks)
+            if status != Task.ECHEC:
+                return
+
     def add_child(self, c):
         super(Selector, self).add_child(c)
 
 
 class SelectorStar(Task):
     """ Selector star """
+    STATE = ('index',)
 
     def __init__(self):
         super().__init__()
@@ -70,12 +113,36 @@ class SelectorStar(Task):
         self.index = 0
         return Task.ECHEC
 
+    def peek(self):
+        ticks = FOREVER
+        for i in range(self.index, len(self._children)):
+            status, childTicks = self._children[i].peek()
+            ticks = min(ticks, childTicks)
+            if ticks == 0:
+                return (None, 0)
+            if status != Task.ECHEC:
+                # The index must already be the one the run would set
+                if self.index != (i if status == Task.RUNNING else 0):
+                    return (None, 0)
+                return (status, ticks)
+        if self.index != 0:
+            return (None, 0)
+        return (Task.ECHEC, ticks)
+
+    def skip(self, ticks):
+        for i in range(self.index, len(self._children)):
+            status, _ = self._children[i].peek()
+            self._children[i].skip(ticks)
+            if status != Task.ECHEC:
+                return
+
     def add_child(self, c):
         super(SelectorStar, self).add_child(c)
 
 
 class Sequence(Task):
     """ Sequence """
+    STATE = ('index',)
 
     def __init__(self):
         super().__init__()
@@ -89,12 +156,31 @@ class Sequence(Task):
                 return Task.RUNNING
         return Task.SUCCES
 
+    def peek(self):
+        ticks = FOREVER
+        for i in range(self.index, len(self._children)):
+            status, childTicks = self._children[i].peek()
+            ticks = min(ticks, childTicks)
+            if ticks == 0:
+                return (None, 0)
+            if status != Task.SUCCES:
+                return (status, ticks)
+        return (Task.SUCCES, ticks)
+
+    def skip(self, ticks):
+        for i in range(self.index, len(self._children)):
+            status, _ = self._children[i].peek()
+            self._children[i].skip(ticks)
+            if status != Task.SUCCES:
+                return
+
     def add_child(self, c):
         super().add_child(c)
 
 
 class SequenceStar(Task):
     """ Sequence star """
+    STATE = ('index',)
 
     def __init__(self):
         super().__init__()
@@ -111,6 +197,29 @@ class SequenceStar(Task):
         self.index = 0
         return Task.SUCCES
 
+    def peek(self):
+        ticks = FOREVER
+        for i in range(self.index, len(self._children)):
+            status, childTicks = self._children[i].peek()
+            ticks = min(ticks, childTicks)
+            if ticks == 0:
+                return (None, 0)
+            if status != Task.SUCCES:
+                # The index must already be the one the run would set
+                if self.index != (i if status == Task.RUNNING else 0):
+                    return (None, 0)
+                return (status, ticks)
+        if self.index != 0:
+            return (None, 0)
+        return (Task.SUCCES, ticks)
+
+    def skip(self, ticks):
+        for i in range(self.index, len(self._children)):
+            status, _ = self._children[i].peek()
+            self._children[i].skip(ticks)
+            if status != Task.SUCCES:
+                return
+
     def add_child(self, c):
         super().add_child(c)
 
@@ -129,6 +238,7 @@ class NodeTask(Task):
 
 class Threshold(Task):
     """Threshold condition Task."""
+    COUNTERS = ('failures',)
     # Comparison type
     INFERIOR, SUPERIOR = range(2)
 
@@ -136,6 +246,8 @@ class Threshold(Task):
         super().__init__()
         self.element = element
         self.threshold = threshold
+        # Number of ticks the condition failed (see model.KPI)
+        self.failures = 0
         if comp == Threshold.INFERIOR:
             self.cond = self._inf
         else:
@@ -156,7 +268,17 @@ class Threshold(Task):
             return Task.ECHEC
 
     def run(self):
-        return self.cond()
+        status = self.cond()
+        if status == Task.ECHEC:
+            self.failures += 1
+        return status
+
+    def peek(self):
+        return (self.cond(), FOREVER)
+
+    def skip(self, ticks):
+        if self.cond() == Task.ECHEC:
+            self.failures += ticks
 
 class SpaceChecker(Task):
     """Verifies the remaining space in a model element."""
@@ -174,6 +296,9 @@ class SpaceChecker(Task):
         else:
             return Task.ECHEC
 
+    def peek(self):
+        return (self.run(), FOREVER)
+
 class RawUpdater(Task):
     """Updates the value of an element."""
     def __init__(self, elementFrom, elementTo, value):
@@ -188,8 +313,17 @@ class RawUpdater(Task):
             return Task.SUCCES
         return Task.ECHEC
 
+    def peek(self):
+        # Idle only if the update fails
+        if self.elementTo.canIncrease(self.value):
+            return (None, 0)
+        return (Task.ECHEC, FOREVER)
+
 class Mine(NodeTask):
     """Generates iron ore over a given period."""
+    STATE = ('remaining', 'tickAmount')
+    COUNTERS = ('blocked',)
+
     def __init__(self, node, outEdge, genFunc, nbTicks, minUpdate):
         super().__init__(node)
         # Outgoing edge
@@ -204,6 +338,8 @@ class Mine(NodeTask):
         self.remaining = nbTicks
         # Amount to produce at each tick over the current period
         self.tickAmount = self.genFunc()/nbTicks
+        # Number of ticks the mine could not produce, the node being full (see model.KPI)
+        self.blocked = 0
 
     def run(self):
         # If the production period is over
@@ -219,10 +355,51 @@ class Mine(NodeTask):
         # Decreases counter
         self.remaining -= 1
         # Returns running if the mine can still produce iron
-        return Task.RUNNING if running else Task.ECHEC
+        if running:
+            return Task.RUNNING
+        self.blocked += 1
+        return Task.ECHEC
+
+    def peek(self):
+        # A new production period draws a random amount
+        if self.remaining == 0:
+            return (None, 0)
+        node = self.node
+        # Can the node be emptied in the outgoing edge ?
+        canUpdate = self.outEdge.canIncrease(self.minUpdate)
+        if not node.canIncrease(self.tickAmount):
+            # The mine is blocked until the end of the period, unless the node can be emptied
+            if node.current >= self.minUpdate and canUpdate:
+                return (None, 0)
+            return (Task.ECHEC, self.remaining)
+        # The production only accumulates in the node until the next update of the edge
+        limit = node.capacity+node.TOLERANCE
+        if canUpdate:
+            limit = min(limit, self.minUpdate)
+        if self.tickAmount <= 0:
+            return (None, 0) if node.current >= limit else (Task.RUNNING, self.remaining)
+        # One tick of margin covers the rounding of the successive additions
+        ticks = int((limit-node.current)/self.tickAmount)-1
+        if ticks <= 0:
+            return (None, 0)
+        return (Task.RUNNING, min(ticks, self.remaining))
+
+    def skip(self, ticks):
+        node = self.node
+        if node.canIncrease(self.tickAmount):
+            # Same successive additions as the runs, to get the same rounding
+            current, capacity, amount = node.current, node.capacity, self.tickAmount
+            for _ in range(ticks):
+                current = min(current+amount, capacity)
+            node.current = current
+        else:
+            self.blocked += ticks
+        self.remaining -= ticks
 
 class Train(NodeTask):
     """Brings chemical products."""
+    COUNTERS = ('deliveries', 'rejections')
+
     def __init__(self, node, outEdge, nbWagons, wagonCapacity):
         super().__init__(node)
         # Outgoing edge
@@ -231,28 +408,76 @@ class Train(NodeTask):
         self.nbWagons = nbWagons
         # Capacity (litres) of a wagon
         self.wagonCapacity = wagonCapacity
+        # Number of trains unloaded, and turned away because the outgoing edge was full
+        # (see model.KPI)
+        self.deliveries = 0
+        self.rejections = 0
 
     def run(self):
         # Increases the outgoing edge value
         success = self.outEdge.increase(self.nbWagons*self.wagonCapacity)
-        return Task.SUCCES if success else Task.ECHEC
+        if success:
+            self.deliveries += 1
+            return Task.SUCCES
+        self.rejections += 1
+        return Task.ECHEC
+
+    def peek(self):
+        if self.outEdge.canIncrease(self.nbWagons*self.wagonCapacity):
+            return (None, 0)
+        return (Task.ECHEC, FOREVER)
 
 class Boat(NodeTask):
     """The boat leaves after loading."""
+    COUNTERS = ('departures', 'turnaround', 'waiting')
+
     def __init__(self, node, incEdge, boatSize):
         super().__init__(node)
         # Incoming edge
         self.incEdge = incEdge
         # Boat size
         self.boatSize = boatSize
+        # Number of boats which left (see model.Analysis)
+        self.departures = 0
+        # Ticks spent by the current boat, and total turnaround of the boats which left
+        # (ticks from the departure of the previous boat, see model.KPI)
+        self.waiting = 0
+        self.turnaround = 0
 
     def run(self):
          # Decreases the incoming edge value
         success = self.incEdge.decrease(self.boatSize)
+        self.waiting += 1
+        if success:
+            self.departures += 1
+            self.turnaround += self.waiting
+            self.waiting = 0
         return Task.SUCCES if success else Task.ECHEC
 
-class Consume(NodeTask):
+    def peek(self):
+        if self.incEdge.canDecrease(self.boatSize):
+            return (None, 0)
+        return (Task.ECHEC, FOREVER)
+
+    def skip(self, ticks):
+        self.waiting += ticks
+
+class Flow(NodeTask):
+    """Production task moving constant amounts at each tick : decreases the incoming
+    edges, increases the node, and moves the production to the outgoing edge once the
+    node holds minUpdate."""
+    COUNTERS = ('starved',)
+
+    def __init__(self, node):
+        super().__init__(node)
+        # Number of runs an incoming edge could not be decreased, lacking material
+        # (see model.KPI)
+        self.starved = 0
+
+class Consume(Flow):
     """Decreases the incoming edge, increases node and outgoing edge."""
+    STATE = ('remaining',)
+
     def __init__(self, incEdge, node, outEdge, toProduce, incStep, nodeStep, minUpdate):
         # Node
         super().__init__(node)
@@ -273,7 +498,8 @@ class Consume(NodeTask):
 
     def run(self):
         # Decreases value of incoming edge
-        self.incEdge.decrease(self.incStep)
+        if not self.incEdge.decrease(self.incStep):
+            self.starved += 1
         # Increases node value, decreases remaining amount
         self.node.increase(self.nodeStep)
         self.remaining -= self.nodeStep
@@ -296,8 +522,10 @@ class Consume(NodeTask):
         else:
             return Task.RUNNING
 
-class MultipleConsume(NodeTask):
+class MultipleConsume(Flow):
     """Decreases the incoming edges, increases node and outgoing edge."""
+    STATE = ('remaining',)
+
     def __init__(self, incEdges, node, outEdge, toProduce, incSteps, nodeStep, minUpdate):
         # Node
         super().__init__(node)
@@ -318,8 +546,12 @@ class MultipleConsume(NodeTask):
 
     def run(self):
         # Decreases value of incoming edges
+        starved = False
         for index, edge in enumerate(self.incEdges):
-            edge.decrease(self.incSteps[index])
+            if not edge.decrease(self.incSteps[index]):
+                starved = True
+        if starved:
+            self.starved += 1
         # Increases node value, decreases remaining amount
         self.node.increase(self.nodeStep)
         self.remaining -= self.nodeStep
@@ -0,0 +1,153 @@
+"""Compiles a behaviour tree into a single generated Python function."""
+from bt.base import Task, TOLERANCE, Selector, SelectorStar, Sequence, SequenceStar
+from bt.base import Threshold, SpaceChecker
+from bt.decorator import Delay, Repeater, ThresholdDec
+
+# Python limits the number of statically nested loops : deeper subtrees are
+# compiled into separate functions
+MAX_NESTING = 15
+
+class Compiler(object):
+    """Generates the source of the tick function of a tree.
+    Composites and conditions are inlined, their state stays in the task objects
+    (index, delay), so that a compiled tree and its object tree can be mixed.
+    Other tasks are called through their run method."""
+    def __init__(self):
+        # Objects used by the generated code
+        self.namespace = {'SUCCES': Task.SUCCES, 'ECHEC': Task.ECHEC, 'RUNNING': Task.RUNNING}
+        # Generated functions
+        self.functions = []
+        self.count = 0
+
+    def newName(self, prefix, value=None):
+        """Returns a new identifier, bound to value in the namespace if given."""
+        self.count += 1
+        name = prefix + str(self.count)
+        if value is not None:
+            self.namespace[name] = value
+        return name
+
+    def function(self, task):
+        """Generates a function ticking a tree. Returns its name."""
+        name = self.newName('tick')
+        lines = ["def " + name + "():"]
+        status = self.task(task, lines, 1, 0)
+        lines.append("    return " + status)
+        self.functions.append("\n".join(lines))
+        return name
+
+    def task(self, task, lines, depth, nesting):
+        """Generates the code of a task. Returns the variable holding its status."""
+        status = self.newName('s')
+        kind = type(task)
+        if kind in (Sequence, SequenceStar, Selector, SelectorStar):
+            if nesting >= MAX_NESTING:
+                function = self.function(task)
+                self.emit(lines, depth, status + " = " + function + "()")
+            else:
+                self.composite(task, status, lines, depth, nesting)
+        elif kind is Delay:
+            self.delay(task, status, lines, depth, nesting)
+        elif kind is Repeater:
+            child = self.task(task._children[0], lines, depth, nesting)
+            self.emit(lines, depth, status + " = SUCCES if " + child + " == SUCCES else RUNNING")
+        elif kind is ThresholdDec and task.cond in (task._inf, task._sup):
+            element = self.newName('e', task.element)
+            threshold = self.newName('k', task.threshold)
+            comp = " <= " if task.cond == task._inf else " >= "
+            self.emit(lines, depth, "if " + element + ".current" + comp + threshold + ":")
+            child = self.task(task._children[0], lines, depth+1, nesting)
+            self.emit(lines, depth+1, status + " = " + child)
+            self.emit(lines, depth, "else:")
+            self.emit(lines, depth+1, status + " = ECHEC")
+        elif kind is Threshold and task.cond in (task._inf, task._sup):
+            element = self.newName('e', task.element)
+            if task.cond == task._inf:
+                threshold = self.newName('k', task.threshold+TOLERANCE)
+                test = element + ".current <= " + threshold
+            else:
+                threshold = self.newName('k', task.threshold-TOLERANCE)
+                test = element + ".current >= " + threshold
+            # The failures are counted as in Threshold.run
+            name = self.newName('t', task)
+            self.emit(lines, depth, "if " + test + ":")
+            self.emit(lines, depth+1, status + " = SUCCES")
+            self.emit(lines, depth, "else:")
+            self.emit(lines, depth+1, status + " = ECHEC")
+            self.emit(lines, depth+1, name + ".failures += 1")
+        elif kind is SpaceChecker:
+            element = self.newName('e', task.element)
+            minSpace = self.newName('k', task.minSpace)
+            self.emit(lines, depth, status + " = SUCCES if " + element + ".capacity - " + element\
+            + ".current >= " + minSpace + " else ECHEC")
+        else:
+            # Bound at compile time : instrumentation wrappers must be set before compiling
+            run = self.newName('run', task.run)
+            self.emit(lines, depth, status + " = " + run + "()")
+        return status
+
+    def composite(self, task, status, lines, depth, nesting):
+        """Generates the code of a sequence or a selector.
+        The loop over the children is unrolled inside a one-pass loop, whose break
+        ends the composite."""
+        kind = type(task)
+        star = kind in (SequenceStar, SelectorStar)
+        # Status ending the composite, and status returned when no child ends it
+        if kind in (Sequence, SequenceStar):
+            stop, default = "ECHEC", "SUCCES"
+        else:
+            stop, default = "SUCCES", "ECHEC"
+        name = self.newName('t', task)
+        index = self.newName('i')
+        self.emit(lines, depth, "while True:")
+        self.emit(lines, depth+1, index + " = " + name + ".index")
+        for i, child in enumerate(task._children):
+            self.emit(lines, depth+1, "if " + index + " <= " + str(i) + ":")
+            childStatus = self.task(child, lines, depth+2, nesting+1)
+            self.emit(lines, depth+2, "if " + childStatus + " == " + stop + ":")
+            if star:
+                self.emit(lines, depth+3, name + ".index = 0")
+            self.emit(lines, depth+3, status + " = " + stop)
+            self.emit(lines, depth+3, "break")
+            self.emit(lines, depth+2, "elif " + childStatus + " == RUNNING:")
+            if star:
+                self.emit(lines, depth+3, name + ".index = " + str(i))
+            self.emit(lines, depth+3, status + " = RUNNING")
+            self.emit(lines, depth+3, "break")
+        if star:
+            self.emit(lines, depth+1, name + ".index = 0")
+        self.emit(lines, depth+1, status + " = " + default)
+        self.emit(lines, depth+1, "break")
+
+    def delay(self, task, status, lines, depth, nesting):
+        """Generates the code of a delay decorator."""
+        name = self.newName('t', task)
+        self.emit(lines, depth, "if " + name + ".delay > 0:")
+        self.emit(lines, depth+1, name + ".delay -= 1")
+        self.emit(lines, depth+1, status + " = RUNNING")
+        self.emit(lines, depth, "else:")
+        child = self.task(task._children[0], lines, depth+1, nesting)
+        self.emit(lines, depth+1, "if " + child + " == SUCCES:")
+        self.emit(lines, depth+2, name + ".delay = " + name + "._delay")
+        self.emit(lines, depth+2, status + " = SUCCES")
+        self.emit(lines, depth+1, "elif " + child + " == RUNNING:")
+        self.emit(lines, depth+2, status + " = RUNNING")
+        self.emit(lines, depth+1, "else:")
+        self.emit(lines, depth+2, name + ".delay = " + name + "._delay")
+        self.emit(lines, depth+2, status + " = ECHEC")
+
+    @staticmethod
+    def emit(lines, depth, line):
+        """Adds an indented line."""
+        lines.append("    "*depth + line)
+
+def compileTree(task):
+    """Compiles a tree into a function ticking it, with the same statuses and side effects
+    as task.run(). The generated source is available in the 'source' attribute."""
+    compiler = Compiler()
+    name = compiler.function(task)
+    source = "\n\n".join(compiler.functions)
+    exec(compile(source, "<bt " + type(task).__name__ + ">", "exec"), compiler.namespace)
+    function = compiler.namespace[name]
+    function.source = source
+    return function
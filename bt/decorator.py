@@ -1,8 +1,10 @@
 """Decorators."""
-from bt.base import Task, Decorator
+from math import ceil
+from bt.base import Task, Decorator, FOREVER
 
 class Delay(Decorator):
     """ Decorator base sur un simple delay. Il y a un seul child. """
+    STATE = ('delay',)
 
     def __init__(self, delay=0):
         super().__init__()
@@ -25,9 +27,49 @@ class Delay(Decorator):
                 self.delay = self._delay
                 return Task.ECHEC
 
+    def peek(self):
+        if self.delay > 0:
+            return (Task.RUNNING, ceil(self.delay))
+        status, ticks = self._children[0].peek()
+        # The delay is restarted when the child finishes
+        if status != Task.RUNNING and self._delay != 0:
+            return (None, 0)
+        return (status, ticks)
+
+    def skip(self, ticks):
+        if self.delay > 0:
+            self.delay -= ticks
+        else:
+            self._children[0].skip(ticks)
+
     def add_child(self, c):
         super().add_child(c)
 
+class RandomDelay(Delay):
+    """Delay drawn again, from a generation function, each time the child finishes
+    (e.g. the times between two trains). The drawn values are multiplied by scale
+    (e.g. to convert minutes to ticks)."""
+    STATE = ('delay', '_delay')
+
+    def __init__(self, genFunc, scale=1):
+        self.genFunc = genFunc
+        self.scale = scale
+        super().__init__(genFunc()*scale)
+
+    def run(self):
+        status = super().run()
+        if status != Task.RUNNING:
+            self._delay = self.genFunc()*self.scale
+            self.delay = self._delay
+        return status
+
+    def peek(self):
+        status, ticks = super().peek()
+        # A new delay is drawn when the child finishes
+        if status is not None and status != Task.RUNNING and self.delay <= 0:
+            return (None, 0)
+        return (status, ticks)
+
 class Repeater(Decorator):
     """ Retourne l'etat RUNNING tant que son enfant n'a pas retourne SUCCES"""
 
@@ -41,6 +83,15 @@ class Repeater(Decorator):
         else:
             return Task.RUNNING
 
+    def peek(self):
+        status, ticks = self._children[0].peek()
+        if status == Task.SUCCES:
+            return (Task.SUCCES, ticks)
+        return (Task.RUNNING, ticks)
+
+    def skip(self, ticks):
+        self._children[0].skip(ticks)
+
     def add_child(self, c):
         super().add_child(c)
 
@@ -81,5 +132,14 @@ class ThresholdDec(Decorator):
         else:
             return Task.ECHEC
 
+    def peek(self):
+        if self.cond():
+            return self._children[0].peek()
+        return (Task.ECHEC, FOREVER)
+
+    def skip(self, ticks):
+        if self.cond():
+            self._children[0].skip(ticks)
+
     def add_child(self, c):
         super().add_child(c)
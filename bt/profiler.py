@@ -0,0 +1,99 @@
+"""Opt-in profiling of the behaviour trees."""
+from time import perf_counter
+
+class TaskStats(object):
+    """Statistics of a task : calls, cumulative time (children included) and statuses."""
+    __slots__ = ('path', 'calls', 'time', 'statuses')
+
+    def __init__(self, path):
+        # Names of the tree and of the tasks from the root to this task
+        self.path = path
+        self.calls = 0
+        self.time = 0.0
+        # Number of ECHEC, SUCCES and RUNNING returned (indexed by status)
+        self.statuses = [0, 0, 0]
+
+class TreeProfiler(object):
+    """Counts the runs of every task of the behaviour trees of a model, their duration
+    and their statuses. The run method of each task is replaced by a measuring wrapper
+    on the instance while the profiler is attached : nothing is measured, and nothing
+    slows the trees down, otherwise. Compiled trees are run through their objects while
+    attached. Ticks skipped by the next-event time advance are not counted."""
+    def __init__(self):
+        self.stats = []
+        # Profiled tasks, and nodes to compile again when detached
+        self.tasks = []
+        self.compiled = []
+
+    def attach(self, model, labels=None):
+        """Starts profiling the trees of a model. The trees are named after the labels of
+        their nodes (e.g. Simulation.labels), by default their names or 'node<index>'."""
+        if labels is None:
+            labels = [node.name or "node" + str(index) for index, node in enumerate(model.nodes)]
+        for node, label in zip(model.nodes, labels):
+            if node.bTree is None:
+                continue
+            if node.compiled is not None:
+                node.compiled = None
+                self.compiled.append(node)
+            self.wrap(node.bTree, (label.replace("\n", " "), type(node.bTree).__name__))
+
+    def wrap(self, task, path):
+        """Wraps the run method of a task and of its descendants.
+        The path holds the frames from the tree to the task ; a frame names a task
+        by its class and its index among the children of its parent."""
+        stats = TaskStats(path)
+        self.stats.append(stats)
+        self.tasks.append(task)
+        run = task.run
+        statuses = stats.statuses
+        def profiled():
+            start = perf_counter()
+            status = run()
+            stats.time += perf_counter() - start
+            stats.calls += 1
+            statuses[status] += 1
+            return status
+        task.run = profiled
+        for index, child in enumerate(task._children):
+            self.wrap(child, path + ("%s[%d]" % (type(child).__name__, index),))
+
+    def detach(self):
+        """Stops profiling : restores the run methods, and compiles the trees again.
+        The statistics are kept."""
+        for task in self.tasks:
+            del task.run
+        for node in self.compiled:
+            node.compile()
+        self.tasks = []
+        self.compiled = []
+
+    def report(self):
+        """Returns the statistics of the tasks, by decreasing cumulative time."""
+        return sorted(self.stats, key=lambda stats: stats.time, reverse=True)
+
+    def printReport(self, limit=20):
+        """Prints the most expensive tasks."""
+        print("%10s %10s %10s %10s %10s  %s" % ("calls", "time (s)", "echec", "succes",\
+        "running", "task"))
+        for stats in self.report()[:limit]:
+            print("%10d %10.3f %10d %10d %10d  %s" % ((stats.calls, stats.time)\
+            + tuple(stats.statuses) + (" > ".join(stats.path),)))
+
+    def folded(self):
+        """Returns the profile in the folded stacks format of the flame graph tools :
+        one 'tree;task;...;task microseconds' line per task, counting its own time."""
+        children = {}
+        for stats in self.stats:
+            children.setdefault(stats.path[:-1], []).append(stats)
+        lines = []
+        for stats in self.stats:
+            own = stats.time - sum(child.time for child in children.get(stats.path, ()))
+            stack = ";".join(name.replace(";", ",") for name in stats.path)
+            lines.append("%s %d" % (stack, max(0, round(own*1e6))))
+        return lines
+
+    def writeFolded(self, path):
+        """Writes the folded stacks in a file."""
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write("\n".join(self.folded()) + "\n")
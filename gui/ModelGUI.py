@@ -1,9 +1,10 @@
 """GUI for model rendering."""
 
 from tkinter import Tk, PanedWindow, Canvas, LabelFrame, Label, Scale, DoubleVar
-from tkinter import TOP, Y, BOTH, ALL, VERTICAL, HORIZONTAL
+from tkinter import TOP, Y, BOTH, ALL, LEFT, VERTICAL, HORIZONTAL
 from time import sleep
 import queue
+from .Renderer import Renderer
 
 # Default parameters
 DEFAULT_REFRESH_RATE = 1
@@ -13,15 +14,16 @@ BG_COLOR = '#f0f8ff'
 
 class ModelGUI(object):
     """Rendering of the model."""
-    def __init__(self, modelProc, tick):
+    def __init__(self, modelProc, tick, fillByLevel=False):
         self.modelProc = modelProc
         self.tick = tick
         self.queue = modelProc.getQueue()
+        # Draws the snapshots received from the model
+        self.layout = modelProc.getLayout()
+        self.renderer = Renderer(self.layout, CANVAS_X, CANVAS_Y, fillByLevel)
         # ----------------- Model parameters -----------------
         # Waiting time between two events
         self.refreshRate = DEFAULT_REFRESH_RATE
-        # Elapsed time (in number of ticks)
-        self.count = 0
         # ------------------------ GUI -----------------------
         # Main window
         self.window = Tk()
@@ -36,6 +38,16 @@ class ModelGUI(object):
         mainPane.add(canvasFrame)
         self.canvas = Canvas(canvasFrame, width=CANVAS_X, height=CANVAS_Y, background="white")
         self.canvas.pack()
+        # ===> Timeline of a replay (see model.Replay) : seeks to the time of the slider
+        self.timeVar = None
+        if hasattr(modelProc, 'seek'):
+            self.timeVar = DoubleVar(canvasFrame, value=modelProc.start*tick/60)
+            timeline = Scale(canvasFrame, from_=modelProc.start*tick/60,\
+            to_=modelProc.last*tick/60, resolution=tick/60, length=CANVAS_X, orient=HORIZONTAL,\
+            variable=self.timeVar, label="# Simulated time (hours)", bg=BG_COLOR, bd=1)
+            timeline.bind("<B1-Motion>", self.seek)
+            timeline.bind("<ButtonRelease-1>", self.seek)
+            timeline.pack()
         # Parameters frame
         paramFrame = LabelFrame(mainPane, text="Simulation parameters",\
         padx=20, pady=20, bg=BG_COLOR)
@@ -49,6 +61,9 @@ class ModelGUI(object):
         # ===> Elapsed time
         self.timeLabel = Label(paramFrame, text="# Elapsed time (hours) :\n0", bg=BG_COLOR)
         self.timeLabel.grid(row=3, column=1)
+        # ===> Plant KPIs
+        self.kpiLabel = Label(paramFrame, text="", justify=LEFT, bg=BG_COLOR)
+        self.kpiLabel.grid(row=5, column=1)
         # Rows and columns configuration
         paramFrame.grid_columnconfigure(0, weight=1)
         paramFrame.grid_columnconfigure(1, weight=2)
@@ -56,11 +71,13 @@ class ModelGUI(object):
         paramFrame.grid_rowconfigure(0, weight=1)
         paramFrame.grid_rowconfigure(2, weight=2)
         paramFrame.grid_rowconfigure(4, weight=2)
+        paramFrame.grid_rowconfigure(6, weight=2)
 
     def onClosing(self):
         """Called when exiting the window."""
         self.modelProc.terminate()
         self.window.destroy()
+        self.queue.close()
 
     def display(self):
         """Display the GUI."""
@@ -72,36 +89,47 @@ class ModelGUI(object):
     def update(self):
         """Tries to get a new version of the labels list."""
         try:
-            model = self.queue.get(False)
-            self.updateRendering(model)
+            snapshot = self.queue.get(False)
+            self.updateRendering(snapshot)
             self.window.after(int(self.refreshRate*1000), self.update)
         except queue.Empty:
             #print("Queue is empty !!")
             self.window.after(int(self.refreshRate*1000), self.update)
 
-    def updateRendering(self, model):
+    def seek(self, event):
+        """Renders the replay at the time of the timeline."""
+        self.updateRendering(self.modelProc.seek(round(self.timeVar.get()*60/self.tick)))
+
+    def updateRendering(self, snapshot):
         """Updates the rendering."""
-        self.updateTime()
-        self.cleanCanvas()
-        nodes, edges = model
-        # Draws the nodes
-        for node in nodes:
-            node.draw(self.canvas, CANVAS_X, CANVAS_Y)
-        # Draws the edges
-        for edge in edges:
-            edge.draw(self.canvas, CANVAS_X, CANVAS_Y)
+        self.updateTime(snapshot.time)
+        if self.timeVar is not None:
+            self.timeVar.set(snapshot.time*self.tick/60)
+        self.renderer.draw(self.canvas, snapshot)
+        self.updateKPIs(snapshot)
 
-    def updateTime(self):
-        """Updates the timeLabel value."""
-        self.count += 1
+    def updateTime(self, clock):
+        """Updates the timeLabel value from the simulation clock (in number of ticks)."""
         # Current simulation time (hours)
-        newTime = (self.count*self.tick)/60
+        newTime = (clock*self.tick)/60
         self.timeLabel['text'] = "# Elapsed time (hours) :\n" + str('%.2f'%newTime)
 
+    def updateKPIs(self, snapshot):
+        """Updates the plant KPIs following the levels in the snapshot."""
+        names = self.layout.kpiNames
+        if not names:
+            return
+        first = self.layout.nbNodes + self.layout.nbEdges
+        text = "# Plant KPIs :\n" + "\n".join("%s : %.2f" % (name, value)\
+        for name, value in zip(names, snapshot.values[first:]))
+        if text != self.kpiLabel['text']:
+            self.kpiLabel['text'] = text
+
     def updateRate(self, event):
         """Updates the refresh rate when the slider is moved."""
         self.refreshRate = self.stepVar.get()
 
     def cleanCanvas(self):
-        """Cleans the canvas."""
+        """Cleans the canvas : the items are created again at the next rendering."""
         self.canvas.delete(ALL)
+        self.renderer.reset()
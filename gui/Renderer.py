@@ -0,0 +1,145 @@
+"""Drawing of the model from its layout and snapshots."""
+
+from math import atan2, fabs, pi
+from tkinter import LAST
+
+def trunc(number):
+    """Truncates to 2 decimals."""
+    if number == "":
+        return ""
+    return '%.2f'%number
+
+class Renderer(object):
+    """Draws snapshots of the model on a canvas, in retained mode : the items are created
+    once, then only the texts (and fill colours) which changed are updated."""
+    # Fill colours of the nodes from empty to full, when coloured by level
+    LEVEL_COLORS = ('#98fb98', '#b4f08c', '#d0e680', '#ecdc74', '#ffc864', '#ffa050', '#ff7840',\
+    '#ff5030')
+    def __init__(self, layout, canvas_x, canvas_y, fillByLevel=False):
+        self.layout = layout
+        self.canvas_x = canvas_x
+        self.canvas_y = canvas_y
+        self.fillByLevel = fillByLevel
+        # The geometry never changes
+        self.boxes = [self.nodeBox(index) for index in range(layout.nbNodes)]
+        self.ends = [self.edgeEnds(index) for index in range(layout.nbEdges)]
+        self.reset()
+
+    def reset(self):
+        """Forgets the canvas items (e.g. after the canvas has been cleared)."""
+        self.canvas = None
+        # Rectangles of the nodes, texts of the levels and their current contents
+        self.rectangles = []
+        self.textItems = []
+        self.texts = []
+        self.fills = []
+
+    def draw(self, canvas, snapshot):
+        """Draws a snapshot on a canvas."""
+        if canvas is not self.canvas:
+            self.create(canvas)
+        layout = self.layout
+        values = snapshot.values
+        texts = self.texts
+        for index in range(layout.nbNodes):
+            current = values[index]
+            capacity = layout.nodeCapacities[index]
+            text = str(trunc(current))+"/"+str(capacity)
+            if text != texts[index]:
+                texts[index] = text
+                canvas.itemconfig(self.textItems[index], text=text)
+                if self.fillByLevel:
+                    self.fillNode(canvas, index, current, capacity)
+        nbNodes = layout.nbNodes
+        for index in range(layout.nbEdges):
+            text = layout.edgeNames[index]+": "+str(trunc(values[nbNodes+index]))+"/"\
+            +str(layout.edgeCapacities[index])
+            if text != texts[nbNodes+index]:
+                texts[nbNodes+index] = text
+                canvas.itemconfig(self.textItems[nbNodes+index], text=text)
+
+    def create(self, canvas):
+        """Creates the items of the model on a canvas, with empty level texts."""
+        self.reset()
+        self.canvas = canvas
+        for index in range(self.layout.nbNodes):
+            self.drawNode(canvas, index)
+        for index in range(self.layout.nbEdges):
+            self.drawEdge(canvas, index)
+        self.texts = [None]*len(self.textItems)
+        self.fills = [None]*len(self.rectangles)
+
+    def fillNode(self, canvas, index, current, capacity):
+        """Colours a node according to its level."""
+        if not isinstance(capacity, (int, float)) or capacity <= 0:
+            return
+        ratio = min(max(current/capacity, 0), 1)
+        color = Renderer.LEVEL_COLORS[min(int(ratio*len(Renderer.LEVEL_COLORS)),\
+        len(Renderer.LEVEL_COLORS)-1)]
+        if color != self.fills[index]:
+            self.fills[index] = color
+            canvas.itemconfig(self.rectangles[index], fill=color)
+
+    def nodeBox(self, index):
+        """Returns the center and the half sizes of a node on the canvas."""
+        position = self.layout.positions[index]
+        size = self.layout.sizes[index]
+        x = (position[0]/100)*self.canvas_x
+        y = (position[1]/100)*self.canvas_y
+        dx = ((size[0]/2)/100)*self.canvas_x
+        dy = ((size[1]/2)/100)*self.canvas_y
+        return x, y, dx, dy
+
+    def drawNode(self, canvas, index):
+        """Creates the items of a node on a canvas."""
+        layout = self.layout
+        x, y, dx, dy = self.boxes[index]
+        # Draws a rectangle
+        self.rectangles.append(canvas.create_rectangle(x-dx, y+dy, x+dx, y-dy, fill='pale green'))
+        # Adds the name
+        canvas.create_text(x, y, text=layout.nodeNames[index])
+        # Adds the capacity
+        self.textItems.append(canvas.create_text(x, y+dy/2, text=""))
+
+    def edgeEnds(self, index):
+        """Returns the coordinates of the ends of an edge on the canvas."""
+        iFrom, iTo = self.layout.edgeEnds[index]
+        xFrom, yFrom, dxFrom, dyFrom = self.nodeBox(iFrom)
+        xTo, yTo, dxTo, dyTo = self.nodeBox(iTo)
+        vect = (xTo-xFrom, yTo-yFrom)
+        angle = atan2(vect[1], vect[0])*(180/pi)
+        # Right dial
+        if fabs(angle) <= 45:
+            xFrom += dxFrom
+            xTo -= dxTo
+        # Left dial
+        elif fabs(angle) >= 135:
+            xFrom -= dxFrom
+            xTo += dxTo
+        # Upper dial
+        elif angle > 0:
+            yFrom += dyFrom
+            yTo -= dyTo
+        # Lower dial
+        elif angle < 0:
+            yFrom -= dyFrom
+            yTo += dyTo
+        else:
+            print("Unexpected case.")
+        return xFrom, yFrom, xTo, yTo
+
+    def drawEdge(self, canvas, index):
+        """Creates the items of an edge on a canvas."""
+        xFrom, yFrom, xTo, yTo = self.ends[index]
+        # Creates a line
+        canvas.create_line(xFrom, yFrom, xTo, yTo, arrow=LAST)
+        # Adds text
+        self.textItems.append(canvas.create_text((xFrom+xTo)/2, (yFrom+yTo)/2+10, text=""))
+
+def drawModel(canvas, model, canvas_x, canvas_y, fillByLevel=False):
+    """Draws the current levels of a model on a canvas (in place of the draw methods the
+    model objects no longer have). Returns the renderer, to draw the next states with."""
+    from model.Snapshot import Layout, Snapshot
+    renderer = Renderer(Layout(model), canvas_x, canvas_y, fillByLevel)
+    renderer.draw(canvas, Snapshot.capture(model))
+    return renderer
@@ -0,0 +1,131 @@
+"""Sequential output analysis : steady-state KPIs estimated while the model runs,
+with automatic warm-up truncation, and runs stopped as soon as they are precise enough."""
+
+from bt.base import Boat
+from .Simulation import labels
+from .Statistics import RunningStats, mser
+from .config import TICK
+
+# Minimum number of batches after the warm-up before a run can be precise enough
+MIN_BATCHES = 10
+
+class OutputAnalyzer(object):
+    """Model observer estimating steady-state KPIs from batch means : the boat departures
+    per day ('<boat node>:departuresPerDay'), and the utilization and the ratio of time
+    empty (stockout) of each edge ('<edge>:utilization', '<edge>:emptyRatio'), with the
+    labels of SimulationResult.kpis.
+    The run is cut into batches of 'batch' ticks. The first batches (warm-up) are dropped
+    by the MSER rule, and the KPIs are the means of the remaining batch means, with their
+    confidence intervals. Notified at any tick the model stops at : the levels do not change
+    over the skipped idle ticks (see Model.advance)."""
+    sampling = None
+
+    def __init__(self, model, batch=1440, level=0.95):
+        self.batch = batch
+        self.level = level
+        nodeLabels = labels(model.nodes, "node")
+        edgeLabels = labels(model.edges, "edge", nodeLabels)
+        # Boat tasks, by label of their node
+        self.boats = [(label + ":departuresPerDay", task) for label, node\
+        in zip(nodeLabels, model.nodes) if node.bTree is not None\
+        for task in node.bTree.walk() if isinstance(task, Boat)]
+        # Edges with a capacity
+        self.edges = [(label, edge) for label, edge in zip(edgeLabels, model.edges)\
+        if isinstance(edge.capacity, (int, float)) and edge.capacity > 0]
+        self.names = [name for name, _ in self.boats]
+        for label, _ in self.edges:
+            self.names.extend((label + ":utilization", label + ":emptyRatio"))
+        # Batch means of each KPI, and statistics of those after the warm-up
+        self.batches = {name: [] for name in self.names}
+        self.stats = {name: RunningStats() for name in self.names}
+        # Number of batches of the warm-up
+        self.warmup = 0
+        # First tick and last tick accounted for, end of the current batch,
+        # sums over the current batch
+        self.start = model.clock
+        self.last = model.clock
+        self.end = model.clock + batch
+        self.departures = [task.departures for _, task in self.boats]
+        self.levels = [0.0]*len(self.edges)
+        self.empty = [0]*len(self.edges)
+
+    def update(self, model):
+        """Accounts for the ticks since the last notification : the current levels have
+        been held since then."""
+        clock = model.clock
+        while self.last < clock:
+            end = min(clock, self.end)
+            ticks = end - self.last
+            for index, (_, edge) in enumerate(self.edges):
+                self.levels[index] += edge.current*ticks
+                if edge.current <= 0:
+                    self.empty[index] += ticks
+            self.last = end
+            if end == self.end:
+                self.closeBatch()
+
+    def closeBatch(self):
+        """Records the means of the current batch, and updates the warm-up."""
+        batch = self.batch
+        means = []
+        for index, (_, task) in enumerate(self.boats):
+            means.append((task.departures - self.departures[index])*1440/(TICK*batch))
+            self.departures[index] = task.departures
+        for index, (_, edge) in enumerate(self.edges):
+            means.append(self.levels[index]/(batch*edge.capacity))
+            means.append(self.empty[index]/batch)
+        self.levels = [0.0]*len(self.edges)
+        self.empty = [0]*len(self.edges)
+        self.end += batch
+        for name, mean in zip(self.names, means):
+            self.batches[name].append(mean)
+        # The warm-up ends when all the KPIs are steady
+        warmup = max((mser(values) for values in self.batches.values()), default=0)
+        if warmup != self.warmup:
+            self.warmup = warmup
+            self.stats = {name: RunningStats(values[warmup:])\
+            for name, values in self.batches.items()}
+        else:
+            for name, mean in zip(self.names, means):
+                self.stats[name].add(mean)
+
+    def warmupTicks(self):
+        """Returns the number of ticks of the warm-up."""
+        return self.warmup*self.batch
+
+    def estimates(self):
+        """Returns the mean and the confidence interval half-width of each KPI, by name."""
+        return {name: (stats.mean, stats.halfWidth(self.level))\
+        for name, stats in self.stats.items()}
+
+    def precise(self, targets):
+        """Returns True if each KPI of targets (name -> half-width) is estimated within its
+        target half-width, over at least MIN_BATCHES batches after the warm-up."""
+        for name, target in targets.items():
+            if name not in self.stats:
+                raise KeyError("unknown KPI : " + name + " (known : " + ", ".join(self.names)\
+                + ")")
+            stats = self.stats[name]
+            if stats.count < MIN_BATCHES or stats.halfWidth(self.level) > target:
+                return False
+        return True
+
+def runUntilPrecise(model, targets, maxTicks, batch=1440, level=0.95, nextEvent=True):
+    """Runs the model until each KPI of targets (name -> half-width, see OutputAnalyzer)
+    is precise enough, or for maxTicks ticks. Returns the OutputAnalyzer."""
+    analyzer = OutputAnalyzer(model, batch, level)
+    model.addObserver(analyzer)
+    try:
+        end = model.clock + maxTicks
+        while model.clock < end and not analyzer.precise(targets):
+            # Checked at the end of each batch
+            chunk = min(end, analyzer.end)
+            if nextEvent:
+                while model.clock < chunk:
+                    model.advance(chunk - model.clock)
+            else:
+                for _ in range(chunk - model.clock):
+                    model.step()
+    finally:
+        model.removeObserver(analyzer)
+    return analyzer
@@ -0,0 +1,117 @@
+"""Binary checkpoints of the full simulation state."""
+
+from array import array
+import random
+import struct
+
+# Magic number and version of the format
+MAGIC = b'MFCK'
+VERSION = 3
+# Versions which can be restored (1 : without the samplers, 2 : without the counters)
+VERSIONS = (1, 2, 3)
+# Magic, version, clock, number of nodes, of edges, of task values, Mersenne Twister words
+HEADER = struct.Struct('<4sHQIIII')
+# Number of values drawn but not used yet by a sampler, Mersenne Twister words of its own stream
+# (0 if it draws from the stream of the model)
+SAMPLER = struct.Struct('<II')
+
+def taskValues(model, counters=True):
+    """Iterates over (task, attribute) couples holding the progress of the behaviour trees,
+    then their counters (see Task.COUNTERS) if asked, in a fixed order : nodes order,
+    then depth first in each tree."""
+    for node in model.nodes:
+        if node.bTree is not None:
+            for task in node.bTree.walk():
+                for name in task.STATE + (task.COUNTERS if counters else ()):
+                    yield task, name
+
+def randomState(model):
+    """Returns the state of the random generator used by the model."""
+    return model.rng.getstate() if model.rng is not None else random.getstate()
+
+def packRandom(state):
+    """Returns the bytes of a random generator state : Mersenne Twister words, then the
+    cached gaussian variate (NaN if none)."""
+    version, words, gauss = state
+    return array('I', words).tobytes() + struct.pack('<Id', version,\
+    float('nan') if gauss is None else gauss)
+
+def unpackRandom(data, offset, nbWords):
+    """Returns a random generator state read from bytes, and the offset after it."""
+    words = array('I')
+    words.frombytes(data[offset:offset+4*nbWords])
+    offset += 4*nbWords
+    version, gauss = struct.unpack_from('<Id', data, offset)
+    return (version, tuple(words), None if gauss != gauss else gauss), offset+12
+
+def ownStream(model, sampler):
+    """Returns True if a sampler draws from a stream of its own (see Distributions.Streams)."""
+    return sampler.rng is not None and sampler.rng is not model.rng
+
+def saveState(model):
+    """Returns a checkpoint of the model : clock, levels, progress of the tasks
+    (delays, remaining production, composite indexes...) and their counters, random
+    generator state, and state of the samplers (values drawn in advance, own streams)."""
+    values = array('d', [node.current for node in model.nodes])
+    values.extend([edge.current for edge in model.edges])
+    tasks = [getattr(task, name) for task, name in taskValues(model)]
+    values.extend(tasks)
+    state = randomState(model)
+    header = HEADER.pack(MAGIC, VERSION, model.clock, len(model.nodes), len(model.edges),\
+    len(tasks), len(state[1]))
+    samplers = [struct.pack('<I', len(model.samplers))]
+    for sampler in model.samplers:
+        pending = sampler.pending()
+        stream = sampler.rng.getstate() if ownStream(model, sampler) else None
+        samplers.append(SAMPLER.pack(len(pending), len(stream[1]) if stream else 0))
+        samplers.append(array('d', pending).tobytes())
+        if stream:
+            samplers.append(packRandom(stream))
+    return header + values.tobytes() + packRandom(state) + b''.join(samplers)
+
+def restoreState(model, data, rngState=True):
+    """Restores a checkpoint in a model built with the same structure.
+    The counters of the tasks are left as is with a checkpoint of version 1 or 2.
+    If rngState is False, the random generators of the model and of its samplers are left
+    as is, so that replicas branched from the same checkpoint diverge."""
+    magic, version, clock, nbNodes, nbEdges, nbTasks, nbWords = HEADER.unpack_from(data)
+    if magic != MAGIC or version not in VERSIONS:
+        raise ValueError("not a checkpoint, or unsupported version")
+    slots = list(taskValues(model, version >= 3))
+    if (nbNodes, nbEdges, nbTasks) != (len(model.nodes), len(model.edges), len(slots)):
+        raise ValueError("the checkpoint does not match the structure of the model")
+    offset = HEADER.size
+    values = array('d')
+    values.frombytes(data[offset:offset+8*(nbNodes+nbEdges+nbTasks)])
+    offset += 8*len(values)
+    for element, value in zip(model.nodes + model.edges, values):
+        element.current = value
+    for (task, name), value in zip(slots, values[nbNodes+nbEdges:]):
+        # Keeps the type of the attribute (composite indexes are integers)
+        setattr(task, name, type(getattr(task, name))(value))
+    model.clock = clock
+    if rngState:
+        state, offset = unpackRandom(data, offset, nbWords)
+        if model.rng is not None:
+            model.rng.setstate(state)
+        else:
+            random.setstate(state)
+        if version >= 2:
+            restoreSamplers(model, data, offset)
+
+def restoreSamplers(model, data, offset):
+    """Restores the state of the samplers of a model from a checkpoint."""
+    nbSamplers, = struct.unpack_from('<I', data, offset)
+    offset += 4
+    if nbSamplers != len(model.samplers):
+        raise ValueError("the checkpoint does not match the samplers of the model")
+    for sampler in model.samplers:
+        nbPending, nbWords = SAMPLER.unpack_from(data, offset)
+        offset += SAMPLER.size
+        pending = array('d')
+        pending.frombytes(data[offset:offset+8*nbPending])
+        offset += 8*nbPending
+        sampler.setPending(pending)
+        if nbWords:
+            state, offset = unpackRandom(data, offset, nbWords)
+            sampler.rng.setstate(state)
@@ -0,0 +1,213 @@
+"""Random inputs of the model : distributions, block samplers and common random numbers."""
+
+from array import array
+from bisect import bisect_right
+from hashlib import sha256
+from itertools import accumulate
+from math import sqrt
+import random
+
+# Number of values drawn at once by a sampler
+BLOCK = 1024
+
+class Distribution(object):
+    """Distribution of a random input. The variates are drawn by inversion from one uniform
+    each, when possible : two scenarios using the same stream then get the same inputs,
+    whatever the parameters."""
+    def draw(self, rng):
+        """Returns one variate, drawn from a random.Random stream."""
+        return self.inverse(rng.random())
+
+    def inverse(self, u):
+        """Returns the variate of a uniform in [0, 1)."""
+        raise NotImplementedError("inverse method not implemented !")
+
+    def sample(self, rng, n):
+        """Returns n variates (array of doubles)."""
+        inverse = self.inverse
+        uniform = rng.random
+        return array('d', [inverse(uniform()) for _ in range(n)])
+
+    def numpy(self, generator, n):
+        """Returns n variates drawn from a numpy Generator (see Vectorized)."""
+        import numpy as np
+        inverse = self.inverse
+        return np.array([inverse(u) for u in generator.random(n)], dtype=float)
+
+class Constant(Distribution):
+    """Always the same value."""
+    def __init__(self, value):
+        self.value = value
+
+    def draw(self, rng):
+        return self.value
+
+    def inverse(self, u):
+        return self.value
+
+    def sample(self, rng, n):
+        return array('d', [self.value])*n
+
+    def numpy(self, generator, n):
+        import numpy as np
+        return np.full(n, float(self.value))
+
+class Triangular(Distribution):
+    """Triangular distribution (same variates as ModelBuilder.triangularDistrib)."""
+    def __init__(self, low, mode, high):
+        if not low <= mode <= high or low == high:
+            raise ValueError("triangular distribution : low <= mode <= high, low < high")
+        self.low = low
+        self.mode = mode
+        self.high = high
+        self.mid = (mode-low)/(high-low)
+
+    def inverse(self, u):
+        low, mode, high = self.low, self.mode, self.high
+        if u < self.mid:
+            return low + sqrt(u*(high-low)*(mode-low))
+        return high - sqrt((1-u)*(high-low)*(high-mode))
+
+    def numpy(self, generator, n):
+        return generator.triangular(self.low, self.mode, self.high, n)
+
+class Empirical(Distribution):
+    """Observed values, drawn with the given weights (equal by default)."""
+    def __init__(self, values, weights=None):
+        if not values:
+            raise ValueError("empirical distribution : no values")
+        weights = weights or [1]*len(values)
+        if len(weights) != len(values) or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError("empirical distribution : one positive weight per value")
+        self.values = list(values)
+        total = sum(weights)
+        self.cumulative = [weight/total for weight in accumulate(weights)]
+
+    def inverse(self, u):
+        return self.values[min(bisect_right(self.cumulative, u), len(self.values)-1)]
+
+    def numpy(self, generator, n):
+        import numpy as np
+        indexes = np.searchsorted(self.cumulative, generator.random(n), side='right')
+        return np.asarray(self.values, dtype=float)[np.minimum(indexes, len(self.values)-1)]
+
+class Normal(Distribution):
+    """Normal distribution, truncated to [low, high] if given (e.g. 0 for quantities)."""
+    def __init__(self, mean, sd, low=None, high=None):
+        if sd <= 0:
+            raise ValueError("normal distribution : sd > 0")
+        # Imported here : statistics is slow to import, and few plants have normal inputs
+        from statistics import NormalDist
+        self.normal = NormalDist(mean, sd)
+        self.low = low
+        self.high = high
+
+    def inverse(self, u):
+        # inv_cdf is not defined in 0
+        value = self.normal.inv_cdf(min(max(u, 1e-12), 1-1e-12))
+        if self.low is not None:
+            value = max(value, self.low)
+        if self.high is not None:
+            value = min(value, self.high)
+        return value
+
+    def numpy(self, generator, n):
+        values = generator.normal(self.normal.mean, self.normal.stdev, n)
+        if self.low is not None or self.high is not None:
+            import numpy as np
+            values = np.clip(values, self.low, self.high)
+        return values
+
+class Gamma(Distribution):
+    """Gamma distribution. Drawn by rejection : the number of uniforms per variate varies,
+    so it should have a stream of its own for common random numbers."""
+    def __init__(self, shape, scale):
+        if shape <= 0 or scale <= 0:
+            raise ValueError("gamma distribution : shape > 0, scale > 0")
+        self.shape = shape
+        self.scale = scale
+
+    def draw(self, rng):
+        return rng.gammavariate(self.shape, self.scale)
+
+    def sample(self, rng, n):
+        gamma = rng.gammavariate
+        shape, scale = self.shape, self.scale
+        return array('d', [gamma(shape, scale) for _ in range(n)])
+
+    def numpy(self, generator, n):
+        return generator.gamma(self.shape, self.scale, n)
+
+def interArrival(mean, cv):
+    """Returns the distribution of the times between two arrivals (e.g. trains), from
+    their mean and their coefficient of variation : a gamma distribution, exponential
+    for cv = 1, constant for cv = 0."""
+    if cv <= 0:
+        return Constant(mean)
+    return Gamma(1/cv**2, mean*cv**2)
+
+def fromSpec(spec):
+    """Returns a distribution from its description, e.g. in a plant file :
+    {"type": "triangular", "low": 10, "mode": 20, "high": 60}, "normal" (mean, sd, low,
+    high), "gamma" (shape, scale), "empirical" (values, weights), "interarrival"
+    (mean, cv), "constant" (value), or a plain number."""
+    if isinstance(spec, (int, float)):
+        return Constant(spec)
+    spec = dict(spec)
+    kind = spec.pop("type", None)
+    kinds = {"constant": Constant, "triangular": Triangular, "empirical": Empirical,\
+    "normal": Normal, "gamma": Gamma, "interarrival": interArrival}
+    if kind not in kinds:
+        raise ValueError("unknown distribution type : " + str(kind))
+    try:
+        return kinds[kind](**spec)
+    except TypeError as error:
+        raise ValueError(kind + " distribution : " + str(error))
+
+class Sampler(object):
+    """Callable drawing the variates of a distribution from a stream, BLOCK at a time.
+    Used as the generation function of a task (e.g. Mine). Without stream, draws from
+    the global random generator."""
+    def __init__(self, distribution, rng=None, block=BLOCK):
+        self.distribution = distribution
+        self.rng = rng
+        self.block = block
+        # Drawn values not used yet
+        self.buffer = array('d')
+        self.position = 0
+
+    def __call__(self):
+        if self.position >= len(self.buffer):
+            self.buffer = self.distribution.sample(self.rng if self.rng is not None else random,\
+            self.block)
+            self.position = 0
+        self.position += 1
+        return self.buffer[self.position-1]
+
+    def pending(self):
+        """Returns the values drawn but not used yet."""
+        return self.buffer[self.position:]
+
+    def setPending(self, values):
+        """Replaces the values drawn but not used yet (see Checkpoint)."""
+        self.buffer = array('d', values)
+        self.position = 0
+
+class Streams(object):
+    """Common random numbers : one independent stream per random input, identified by
+    its name (e.g. the node id) and derived from a root seed. A scenario changing the
+    parameters or the draws of an input leaves the streams of the others untouched."""
+    def __init__(self, seed):
+        self.seed = seed
+        self.streams = {}
+
+    def stream(self, name):
+        """Returns the stream of an input."""
+        if name not in self.streams:
+            digest = sha256((str(self.seed) + "#" + str(name)).encode()).digest()
+            self.streams[name] = random.Random(int.from_bytes(digest[:8], 'little'))
+        return self.streams[name]
+
+    def sampler(self, name, distribution, block=BLOCK):
+        """Returns a sampler of a distribution on the stream of an input."""
+        return Sampler(distribution, self.stream(name), block)
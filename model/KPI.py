@@ -0,0 +1,98 @@
+"""Plant KPIs maintained while the model runs : the tasks count the outcomes of their runs
+(and of the ticks skipped over), so that no level history has to be stored nor scanned."""
+
+from bt.base import Threshold, Flow, Mine, Train, Boat
+from .Simulation import labels
+from .config import TICK
+
+# Names of the KPIs, after the labels of the elements
+STATISTICS = ("departures", "turnaround", "rejections", "rejectionRatio", "blockedRatio",\
+"starvedRatio")
+
+class PlantKPIs(object):
+    """Plant KPIs, by '<element label>:<name>' as in SimulationResult.kpis :
+    - boat nodes : 'departures' and 'turnaround' (mean hours from the departure of the
+      previous boat to the departure of a boat ; without departure, the hours the current
+      boat has waited so far, a lower bound),
+    - train nodes : 'rejections' (trains turned away, their edge being full) and
+      'rejectionRatio',
+    - mining nodes : 'blockedRatio' (ratio of the ticks the node was too full to produce),
+    - production nodes : 'starvedRatio' (ratio of the ticks the production waited for,
+      or lacked, material in an incoming edge).
+    The counters of the tasks are updated at each tick in O(1), here they are only read.
+    The KPIs cover the ticks since the creation of the object (or the last reset)."""
+    def __init__(self, model):
+        self.model = model
+        nodeLabels = labels(model.nodes, "node")
+        # Counting tasks of each node, by label
+        self.boats, self.trains, self.mines, self.productions = [], [], [], []
+        for label, node in zip(nodeLabels, model.nodes):
+            if node.bTree is None:
+                continue
+            tasks = list(node.bTree.walk())
+            self.boats.extend((label, task) for task in tasks if isinstance(task, Boat))
+            self.trains.extend((label, task) for task in tasks if isinstance(task, Train))
+            self.mines.extend((label, task) for task in tasks if isinstance(task, Mine))
+            flows = [task for task in tasks if isinstance(task, Flow)]
+            if flows:
+                # Conditions on the material of the incoming edges
+                incoming = set(map(id, node.incoming))
+                checks = [task for task in tasks if type(task) is Threshold\
+                and id(task.element) in incoming]
+                self.productions.append((label, flows, checks))
+        self.names = []
+        for label, _ in self.boats:
+            self.names.extend((label + ":departures", label + ":turnaround"))
+        for label, _ in self.trains:
+            self.names.extend((label + ":rejections", label + ":rejectionRatio"))
+        for label, _ in self.mines:
+            self.names.append(label + ":blockedRatio")
+        for label, _, _ in self.productions:
+            self.names.append(label + ":starvedRatio")
+        self.reset()
+
+    def counters(self):
+        """Returns the current counters of the tasks, in the order of the KPIs."""
+        # The sleeping nodes count the ticks they slept when they wake
+        if self.model.scheduler is not None:
+            self.model.scheduler.settle()
+        values = []
+        for _, boat in self.boats:
+            values.extend((boat.departures, boat.turnaround))
+        for _, train in self.trains:
+            values.extend((train.deliveries, train.rejections))
+        for _, mine in self.mines:
+            values.append(mine.blocked)
+        for _, flows, checks in self.productions:
+            values.append(sum(flow.starved for flow in flows)\
+            + sum(check.failures for check in checks))
+        return values
+
+    def reset(self):
+        """Starts the KPIs over from the current tick (e.g. after a warm-up)."""
+        self.start = self.model.clock
+        self.origin = self.counters()
+
+    def values(self):
+        """Returns the KPIs, in the order of the names."""
+        counts = [count - origin for count, origin in zip(self.counters(), self.origin)]
+        ticks = max(1, self.model.clock - self.start)
+        values = []
+        position = 0
+        for _, boat in self.boats:
+            departures, turnaround = counts[position:position+2]
+            position += 2
+            values.extend((departures, turnaround*TICK/60/departures if departures\
+            else boat.waiting*TICK/60))
+        for _ in self.trains:
+            deliveries, rejections = counts[position:position+2]
+            position += 2
+            values.extend((rejections, rejections/(deliveries + rejections)\
+            if deliveries + rejections else 0))
+        for count in counts[position:]:
+            values.append(count/ticks)
+        return values
+
+    def kpis(self):
+        """Returns the KPIs, by name."""
+        return dict(zip(self.names, self.values()))
@@ -0,0 +1,225 @@
+"""Declarative plant definitions : topology and behaviour trees read from a data file.
+
+A plant file (JSON, or TOML with Python 3.11+) holds :
+- "parameters" : optional overrides of model/config.py (see config.parameters),
+- "nodes" : list of {"id", "name", "capacity", "size", "position", "tree"},
+- "edges" : list of {"id", "name", "capacity", "from", "to"}.
+The id of an element defaults to its name and must be unique. Only the ids and the
+capacities are required. A capacity is a number, or the name of a parameter
+("MAX_PIT1") ; the capacity of the train and boat nodes is "".
+"from" and "to" are node ids. "tree" gives the behaviour tree of the node : its "type"
+(see TREES) and the ids of the edges it works on, by role, e.g.
+{"type": "treatment", "tank": "tank", "pit": "pit1", "out": "pit2"}. It may also give the
+distributions of its random inputs (see Distributions.fromSpec) : the "output" of a mine
+over a period, the "interval" between two trains (minutes)."""
+
+import json
+from .Model import Node, Edge
+from .ModelBuilder import trainBT, miningBT, receiptBT, preparationBT, treatmentBT
+from .ModelBuilder import shipmentBT, boatBT
+from .Distributions import Sampler, Triangular, interArrival, fromSpec
+from .config import parameters
+
+# Behaviour trees : roles of their edges, with the node the edge must start from ('out')
+# or end at ('in'), builder (node, edges and random inputs by role, stream, parameters)
+# and random inputs
+TREES = {
+    "train": ((("out", "out"),),\
+    lambda node, e, i, rng, p: trainBT(node, e["out"], p, i.get("interval")), ("interval",)),
+    "mining": ((("out", "out"),),\
+    lambda node, e, i, rng, p: miningBT(node, e["out"], rng, p, i.get("output")), ("output",)),
+    "receipt": ((("in", "in"), ("out", "out")),\
+    lambda node, e, i, rng, p: receiptBT(e["in"], node, e["out"], p), ()),
+    "preparation": ((("in", "in"), ("out", "out")),\
+    lambda node, e, i, rng, p: preparationBT(e["in"], node, e["out"], p), ()),
+    "treatment": ((("tank", "in"), ("pit", "in"), ("out", "out")),\
+    lambda node, e, i, rng, p: treatmentBT(e["tank"], e["pit"], node, e["out"], p), ()),
+    "shipment": ((("in", "in"), ("out", "out")),\
+    lambda node, e, i, rng, p: shipmentBT(e["in"], node, e["out"], p), ()),
+    "boat": ((("in", "in"),), lambda node, e, i, rng, p: boatBT(e["in"], node, p), ()),
+}
+# Maximum number of errors reported by validate
+MAX_ERRORS = 20
+
+def readPlant(path):
+    """Reads a plant definition from a JSON or TOML file."""
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, 'rb') as source:
+            return tomllib.load(source)
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+def isNumber(value):
+    """Returns True for the numbers (not the booleans)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def isPair(value):
+    """Returns True for the [x, y] coordinates."""
+    return isinstance(value, (list, tuple)) and len(value) == 2 and all(map(isNumber, value))
+
+def validate(plant):
+    """Returns the errors of a plant definition (empty if it is valid)."""
+    errors = []
+    if not isinstance(plant, dict):
+        return ["the plant must be an object"]
+    overrides = plant.get("parameters", {})
+    names = {}
+    try:
+        names = parameters(**overrides).values()
+    except (KeyError, TypeError) as error:
+        errors.append("parameters : " + str(error))
+    def isCapacity(value, empty):
+        return isNumber(value) or (isinstance(value, str) and (value in names\
+        or (empty and value == "")))
+    nodes = plant.get("nodes")
+    edges = plant.get("edges", [])
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        return errors + ["'nodes' and 'edges' must be lists"]
+    # Ids of the nodes, then ends of the edges by id
+    nodeIds = set()
+    for position, node in enumerate(nodes):
+        where = "nodes[%d]" % position
+        key = node.get("id", node.get("name")) if isinstance(node, dict) else None
+        if not isinstance(key, str) or not key:
+            errors.append(where + " : missing id")
+            continue
+        where += " (" + key + ")"
+        if key in nodeIds:
+            errors.append(where + " : duplicate id")
+        nodeIds.add(key)
+        if not isCapacity(node.get("capacity"), True):
+            errors.append(where + " : the capacity must be a number, a parameter or \"\"")
+        for name in ("size", "position"):
+            if name in node and not isPair(node[name]):
+                errors.append(where + " : the " + name + " must be a pair of numbers")
+    ends = {}
+    for position, edge in enumerate(edges):
+        where = "edges[%d]" % position
+        key = edge.get("id", edge.get("name")) if isinstance(edge, dict) else None
+        if not isinstance(key, str) or not key:
+            errors.append(where + " : missing id")
+            continue
+        where += " (" + key + ")"
+        if key in ends:
+            errors.append(where + " : duplicate id")
+        ends[key] = (edge.get("from"), edge.get("to"))
+        if not isCapacity(edge.get("capacity"), False):
+            errors.append(where + " : the capacity must be a number or a parameter")
+        for end in ("from", "to"):
+            if edge.get(end) not in nodeIds:
+                errors.append(where + " : unknown node '" + str(edge.get(end)) + "'")
+    # The edges of a tree are linked to its node
+    for position, node in enumerate(nodes):
+        tree = node.get("tree") if isinstance(node, dict) else None
+        if tree is None:
+            continue
+        key = node.get("id", node.get("name"))
+        where = "nodes[%d] (%s)" % (position, key)
+        if not isinstance(tree, dict) or tree.get("type") not in TREES:
+            errors.append(where + " : the tree type must be one of " + ", ".join(TREES))
+            continue
+        for role, direction in TREES[tree["type"]][0]:
+            edge = tree.get(role)
+            if edge not in ends:
+                errors.append(where + " : unknown edge '" + str(edge) + "' for " + role)
+            elif ends[edge][0 if direction == "out" else 1] != key:
+                errors.append(where + " : the edge '" + edge + "' does not " + ("start from"\
+                if direction == "out" else "end at") + " the node")
+        for role in TREES[tree["type"]][2]:
+            if role in tree:
+                try:
+                    fromSpec(tree[role])
+                except (ValueError, TypeError, AttributeError) as error:
+                    errors.append(where + " : " + role + " : " + str(error))
+    return errors
+
+def inputs(key, tree, rng, params, streams):
+    """Returns the samplers of the random inputs of a tree, by role. An input varies
+    if the tree gives its distribution, or if the parameters make it vary (see buildModel).
+    With common random numbers, each node draws from its own stream."""
+    samplers = {}
+    for role in TREES[tree["type"]][2]:
+        if role in tree:
+            distribution = fromSpec(tree[role])
+        elif role == "interval" and params.TRAIN_REFRESH_CV > 0:
+            distribution = interArrival(params.TRAIN_REFRESH_TIME, params.TRAIN_REFRESH_CV)
+        elif role == "output" and streams is not None:
+            distribution = Triangular(params.MINE_MIN_OUTPUT, params.MINE_MODE_OUTPUT,\
+            params.MINE_MAX_OUTPUT)
+        else:
+            continue
+        samplers[role] = streams.sampler(key, distribution) if streams is not None\
+        else Sampler(distribution, rng)
+    return samplers
+
+def loadPlant(model, plant, rng=None, params=None, streams=None):
+    """Builds a plant definition in a model, as buildModel does for the reference plant.
+    The parameters default to those of the file. Raises ValueError if it is invalid."""
+    errors = validate(plant)
+    if errors:
+        raise ValueError("invalid plant definition :\n  " + "\n  ".join(errors[:MAX_ERRORS])\
+        + ("\n  ..." if len(errors) > MAX_ERRORS else ""))
+    if params is None:
+        params = parameters(**plant.get("parameters", {}))
+    model.rng = rng
+    model.params = params
+    def capacity(value):
+        return getattr(params, value) if value and isinstance(value, str) else value
+    # Bulk construction : the elements are created, linked and indexed in one pass
+    nodes = [Node(node.get("name", node.get("id")), capacity(node["capacity"]),\
+    tuple(node.get("size", (0, 0))), tuple(node.get("position", (0, 0))))\
+    for node in plant["nodes"]]
+    offset = len(model.nodes)
+    model.nodes.extend(nodes)
+    for position, node in enumerate(plant["nodes"]):
+        model.register(model.nodeIndex, node.get("id", node.get("name")), offset+position)
+        model.registerName(model.nodeNames, nodes[position].name, offset+position)
+    nodeIndex = model.nodeIndex
+    offset = len(model.edges)
+    for position, definition in enumerate(plant.get("edges", [])):
+        edge = Edge(definition.get("name", definition.get("id")),\
+        capacity(definition["capacity"]))
+        edge.nodeFrom = model.nodes[nodeIndex[definition["from"]]]
+        edge.nodeTo = model.nodes[nodeIndex[definition["to"]]]
+        edge.nodeFrom.outgoing.append(edge)
+        edge.nodeTo.incoming.append(edge)
+        model.edges.append(edge)
+        model.register(model.edgeIndex, definition.get("id", definition.get("name")),\
+        offset+position)
+        model.registerName(model.edgeNames, edge.name, offset+position)
+    edgeIndex = model.edgeIndex
+    edges = model.edges
+    for node, definition in zip(nodes, plant["nodes"]):
+        tree = definition.get("tree")
+        if tree is not None:
+            roles, builder, _ = TREES[tree["type"]]
+            samplers = inputs(definition.get("id", definition.get("name")), tree, rng, params,\
+            streams)
+            model.samplers.extend(samplers.values())
+            node.bTree = builder(node, {role: edges[edgeIndex[tree[role]]]\
+            for role, _ in roles}, samplers, rng, params)
+    return model
+
+def loadPlantFile(model, path, rng=None, params=None, streams=None):
+    """Reads and builds a plant file (see loadPlant)."""
+    return loadPlant(model, readPlant(path), rng, params, streams)
+
+def sites(plant, nbSites):
+    """Returns a plant made of nbSites copies of a plant, e.g. to generate large networks.
+    The ids of the copy i get the suffix '@i'."""
+    def rename(key, site):
+        return key + "@" + str(site)
+    result = {"parameters": dict(plant.get("parameters", {})), "nodes": [], "edges": []}
+    for site in range(nbSites):
+        for node in plant["nodes"]:
+            copy = dict(node, id=rename(node.get("id", node.get("name")), site))
+            if "tree" in node:
+                roles = TREES[node["tree"]["type"]][0]
+                copy["tree"] = dict(node["tree"], **{role: rename(node["tree"][role], site)\
+                for role, _ in roles})
+            result["nodes"].append(copy)
+        for edge in plant.get("edges", []):
+            result["edges"].append(dict(edge, id=rename(edge.get("id", edge.get("name")), site),\
+            **{"from": rename(edge["from"], site), "to": rename(edge["to"], site)}))
+    return result
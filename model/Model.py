@@ -1,26 +1,23 @@
 """Objects of the model."""
 
 from enum import Enum
-from math import atan2, fabs, pi
-from copy import deepcopy
-from tkinter import LAST
-import queue
+from .Simulation import History
+from .Publisher import Publisher
+from bt.compiler import compileTree
+from .Checkpoint import saveState, restoreState
+from .Scheduler import Scheduler
 
 # Walk type
 class NodeState(Enum):
     """WORKING - WAITING"""
     WORKING = 1 ; WAITING = 2
 
-def trunc(number):
-    """Truncates to 3 decimals."""
-    if number == "":
-        return ""
-    return '%.2f'%number
-
 class ModelObject(object):
     """Object of the model."""
     # Tolerance to approximations
     TOLERANCE = 0.001
+    # Called with the object when increase or decrease are about to change it (see Scheduler)
+    listener = None
 
     def __init__(self, name, capacity):
         self.name = name
@@ -31,6 +28,8 @@ class ModelObject(object):
     def increase(self, amount):
         """Increases the current value of the object from a given amount."""
         if self.current + amount <= self.capacity+ModelObject.TOLERANCE:
+            if self.listener is not None:
+                self.listener(self)
             self.current = min(self.current+amount, self.capacity)
             return True
         else:
@@ -39,14 +38,26 @@ class ModelObject(object):
     def decrease(self, amount):
         """Decreases the current value of the object from a given amount."""
         if self.current - amount >= 0-ModelObject.TOLERANCE:
+            if self.listener is not None:
+                self.listener(self)
             self.current = max(self.current-amount, 0)
             return True
         else:
             return False
 
-    def draw(self, canvas, canvas_x, canvas_y):
-        """Draws the object on a canvas."""
-        raise NotImplementedError("draw method not implemented !")
+    def canIncrease(self, amount):
+        """Returns True if increase(amount) would succeed."""
+        return self.current + amount <= self.capacity+ModelObject.TOLERANCE
+
+    def canDecrease(self, amount):
+        """Returns True if decrease(amount) would succeed."""
+        return self.current - amount >= 0-ModelObject.TOLERANCE
+
+    def __getstate__(self):
+        # The listener belongs to the scheduler of the original model
+        state = dict(self.__dict__)
+        state.pop('listener', None)
+        return state
 
     def __str__(self):
         """String representation."""
@@ -67,23 +78,37 @@ class Node(ModelObject):
         self.outgoing = []
         self.size = size
         self.position = position
+        # Compiled behaviour tree (see compile)
+        self.compiled = None
+
+    def compile(self):
+        """Compiles the behaviour tree into a flat tick function, used by run from then on."""
+        self.compiled = compileTree(self.bTree) if self.bTree is not None else None
 
     def run(self):
         """Ticks the node behaviour tree."""
-        self.bTree.run()
-
-    def draw(self, canvas, canvas_x, canvas_y):
-        """Draws the node on a canvas."""
-        # Draws a rectangle
-        x = (self.position[0]/100)*canvas_x
-        y = (self.position[1]/100)*canvas_y
-        dx = ((self.size[0]/2)/100)*canvas_x
-        dy = ((self.size[1]/2)/100)*canvas_y
-        canvas.create_rectangle(x-dx, y+dy, x+dx, y-dy, fill='pale green')
-        # Adds the name
-        canvas.create_text(x, y, text=self.name)
-        # Adds the capacity
-        canvas.create_text(x, y+dy/2, text=str(trunc(self.current))+"/"+str(self.capacity))
+        if self.compiled is not None:
+            return self.compiled()
+        return self.bTree.run()
+
+    def elements(self):
+        """Returns the model elements the node reads or writes when ticked : the node itself,
+        and the elements referred to by the tasks of its behaviour tree."""
+        elements = {id(self): self}
+        if self.bTree is not None:
+            for task in self.bTree.walk():
+                for value in vars(task).values():
+                    values = value if isinstance(value, (list, tuple)) else (value,)
+                    for element in values:
+                        if isinstance(element, ModelObject):
+                            elements[id(element)] = element
+        return list(elements.values())
+
+    def __getstate__(self):
+        # Generated functions cannot be pickled : a copied node runs its object tree
+        state = ModelObject.__getstate__(self)
+        state['compiled'] = None
+        return state
 
 class Edge(ModelObject):
     """Edge of the model."""
@@ -94,63 +119,57 @@ class Edge(ModelObject):
         # Destination node of the edge
         self.nodeTo = None
 
-    def draw(self, canvas, canvas_x, canvas_y):
-        """Draws the edge on a canvas."""
-        xFrom = (self.nodeFrom.position[0]/100)*canvas_x
-        yFrom = (self.nodeFrom.position[1]/100)*canvas_y
-        xTo = (self.nodeTo.position[0]/100)*canvas_x
-        yTo = (self.nodeTo.position[1]/100)*canvas_y
-        dxFrom = ((self.nodeFrom.size[0]/2)/100)*canvas_x
-        dyFrom = ((self.nodeFrom.size[1]/2)/100)*canvas_y
-        dxTo = ((self.nodeTo.size[0]/2)/100)*canvas_x
-        dyTo = ((self.nodeTo.size[1]/2)/100)*canvas_y
-        vect = (xTo-xFrom, yTo-yFrom)
-        angle = atan2(vect[1], vect[0])*(180/pi)
-        # Right dial
-        if fabs(angle) <= 45:
-            xFrom += dxFrom
-            xTo -= dxTo
-        # Left dial
-        elif fabs(angle) >= 135:
-            xFrom -= dxFrom
-            xTo += dxTo
-        # Upper dial
-        elif angle > 0:
-            yFrom += dyFrom
-            yTo -= dyTo
-        # Lower dial
-        elif angle < 0:
-            yFrom -= dyFrom
-            yTo += dyTo
-        else:
-            print("Unexpected case.")
-        # Creates a line
-        canvas.create_line(xFrom, yFrom, xTo, yTo, arrow=LAST)
-        # Adds text
-        canvas.create_text((xFrom+xTo)/2, (yFrom+yTo)/2+10,\
-        text=self.name+": "+str(trunc(self.current))+"/"+str(self.capacity))
-
 class Model(object):
     """Model."""
-    def __init__(self, gui=None):
+    # Maximum number of ticks between two attempts to skip idle ticks (see advance)
+    MAX_BACKOFF = 64
+    def __init__(self, gui=None, publisher=None):
         self.nodes = []
         self.edges = []
+        # Indexes of the nodes and of the edges, by key (see addNode)
+        self.nodeIndex = {}
+        self.edgeIndex = {}
+        # Positions of the nodes and of the edges by name, None for a name several have
+        self.nodeNames = {}
+        self.edgeNames = {}
         self.gui = gui
+        # Publication policy of the snapshots sent to the GUI
+        self.publisher = publisher if publisher is not None else Publisher()
+        # Elapsed time (in number of ticks)
+        self.clock = 0
+        # Random stream of the model (None for the global one) and parameters (see buildModel)
+        self.rng = None
+        self.params = None
+        # Samplers of the random inputs drawing in blocks (see Distributions)
+        self.samplers = []
+        # Objects notified after each tick (see addObserver)
+        self.observers = []
+        # Plant KPIs sent with the snapshots and the results, if any (see KPI.PlantKPIs)
+        self.kpis = None
+        # Ticks to run before the next attempt to skip idle ticks, and current backoff
+        self.wait = 0
+        self.backoff = 1
+        # Dirty-set scheduler (see schedule), None to tick every node
+        self.scheduler = None
 
-    def addNode(self, name, capacity, size=None, position=None, bTree=None):
-        """Adds a node to the model.
+    def addNode(self, name, capacity, size=None, position=None, bTree=None, key=None):
+        """Adds a node to the model. The node can then be found by its key, if given,
+        or by its name, unless other nodes have the same name.
         Returns the node and its index in the node list."""
         # Adds the node to the list
         node = Node(name, capacity, size, position, bTree)
         self.nodes.append(node)
+        self.register(self.nodeIndex, key, len(self.nodes)-1)
+        self.registerName(self.nodeNames, name, len(self.nodes)-1)
         return (node, len(self.nodes)-1)
 
-    def addEdge(self, name, capacity, iNodeFrom, iNodeTo):
-        """Adds an edge between two nodes (from their indexes) in the model.
-        Returns the index of the edge in the edge list."""
+    def addEdge(self, name, capacity, iNodeFrom, iNodeTo, key=None):
+        """Adds an edge between two nodes (from their indexes or their keys) in the model.
+        The edge can then be found by its key, if given, or by its unique name.
+        Returns the edge and its index in the edge list."""
         edge = Edge(name, capacity)
-        nodeFrom = self.nodes[iNodeFrom]
-        nodeTo = self.nodes[iNodeTo]
+        nodeFrom = self.node(iNodeFrom)
+        nodeTo = self.node(iNodeTo)
         # Links the edge to the nodes
         edge.nodeFrom = nodeFrom
         edge.nodeTo = nodeTo
@@ -159,19 +178,153 @@ class Model(object):
         nodeTo.incoming.append(edge)
         # Adds the edge to the list
         self.edges.append(edge)
+        self.register(self.edgeIndex, key, len(self.edges)-1)
+        self.registerName(self.edgeNames, name, len(self.edges)-1)
         return (edge, len(self.edges)-1)
 
+    @staticmethod
+    def register(index, key, position):
+        """Indexes an element by its key."""
+        if not key:
+            return
+        if key in index:
+            raise ValueError("duplicate key : " + str(key))
+        index[key] = position
+
+    @staticmethod
+    def registerName(names, name, position):
+        """Indexes an element by its name, unless another element has the same name."""
+        if name:
+            names[name] = None if name in names else position
+
+    @staticmethod
+    def find(key, index, names):
+        """Returns the position of an element from its position, its key or its name."""
+        if isinstance(key, int):
+            return key
+        if key in index:
+            return index[key]
+        if names.get(key) is None:
+            raise KeyError(("ambiguous name : " if key in names else "unknown key : ") + str(key))
+        return names[key]
+
+    def node(self, key):
+        """Returns a node from its index, its key or its unique name."""
+        return self.nodes[self.find(key, self.nodeIndex, self.nodeNames)]
+
+    def edge(self, key):
+        """Returns an edge from its index, its key or its unique name."""
+        return self.edges[self.find(key, self.edgeIndex, self.edgeNames)]
+
+    def addObserver(self, observer):
+        """Adds an observer, whose update(model) method is called after each tick."""
+        self.observers.append(observer)
+
+    def removeObserver(self, observer):
+        """Removes an observer."""
+        self.observers.remove(observer)
+
+    def compile(self):
+        """Compiles the behaviour trees of all the nodes (see Node.compile)."""
+        for node in self.nodes:
+            node.compile()
+
+    def schedule(self, enabled=True):
+        """Only ticks the nodes which may do something from then on (see Scheduler),
+        with the same results. The structure of the model must not change afterwards."""
+        if self.scheduler is not None:
+            self.scheduler.detach()
+        self.scheduler = Scheduler(self) if enabled else None
+
+    def step(self):
+        """Ticks all the nodes behaviour trees once, without notifying the GUI."""
+        if self.scheduler is not None:
+            self.scheduler.tick()
+        else:
+            for node in self.nodes:
+                if node.bTree is not None:
+                    node.run()
+        self.clock += 1
+        for observer in self.observers:
+            observer.update(self)
+
     def run(self):
         """Runs the model."""
-        # Ticks all the nodes behaviour trees
-        for node in self.nodes:
-            if node.bTree is not None:
-                node.bTree.run()
-        self.notifyGUI()
+        self.step()
+        if self.gui is not None:
+            self.notifyGUI()
 
-    def notifyGUI(self):
-        """Notifies the GUI of the changes to the model."""
+    def advance(self, limit):
+        """Next-event time advance : jumps the clock over the idle ticks, up to 'limit' ticks.
+        If a behaviour tree has to be run, ticks the model once instead.
+        Gives the same results as step(). Returns the number of elapsed ticks."""
+        # Observers are notified at the ticks multiple of their sampling period
+        # (None : at any tick the model stops at)
+        for observer in self.observers:
+            sampling = getattr(observer, 'sampling', 1)
+            if sampling is not None:
+                limit = min(limit, sampling - self.clock % sampling)
+        ticks = 0
+        if self.wait > 0:
+            self.wait -= 1
+        elif limit > 1:
+            ticks = limit
+            for node in self.nodes:
+                if node.bTree is not None:
+                    ticks = min(ticks, node.bTree.peek()[1])
+                    if ticks <= 1:
+                        break
+            ticks = int(ticks)
+            # Peeking is not free : waits longer after each unsuccessful attempt
+            if ticks <= 1:
+                self.wait = self.backoff
+                self.backoff = min(2*self.backoff, Model.MAX_BACKOFF)
+            else:
+                self.backoff = 1
+        if ticks <= 1:
+            self.step()
+            return 1
+        if self.scheduler is not None:
+            self.scheduler.skip(ticks)
+        else:
+            for node in self.nodes:
+                if node.bTree is not None:
+                    node.bTree.skip(ticks)
+        self.clock += ticks
+        for observer in self.observers:
+            observer.update(self)
+        return ticks
+
+    def simulate(self, nbTicks, sampling=1, nextEvent=False):
+        """Runs the model headless for a given number of ticks, as fast as possible.
+        The levels are recorded every 'sampling' ticks.
+        With nextEvent, the idle ticks are skipped (see advance).
+        Returns a SimulationResult."""
+        history = History(self, sampling)
+        self.addObserver(history)
         try:
-            self.gui.put((deepcopy(self.nodes), deepcopy(self.edges)))
-        except queue.Full:
-            print("Queue is full !!")
+            if nextEvent:
+                end = self.clock + nbTicks
+                while self.clock < end:
+                    self.advance(end - self.clock)
+            else:
+                step = self.step
+                for _ in range(nbTicks):
+                    step()
+        finally:
+            self.removeObserver(history)
+        return history.result()
+
+    def checkpoint(self):
+        """Returns a binary checkpoint of the simulation state (see Checkpoint.saveState)."""
+        return saveState(self)
+
+    def restore(self, data, rngState=True):
+        """Restores a checkpoint (see Checkpoint.restoreState)."""
+        restoreState(self, data, rngState)
+        if self.scheduler is not None:
+            self.scheduler.reset()
+
+    def notifyGUI(self):
+        """Notifies the GUI of the changes to the model, according to the publication policy."""
+        self.publisher.publish(self.gui, self)
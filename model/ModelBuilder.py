@@ -2,15 +2,18 @@
 
 from random import random
 from math import sqrt
+from functools import partial
 from bt.base import Sequence, SequenceStar, SelectorStar, Threshold, SpaceChecker, RawUpdater
 from bt.base import Consume, MultipleConsume, Mine, Train, Boat
-from bt.decorator import Delay, Repeater, ThresholdDec
-from .config import *
+from bt.decorator import Delay, RandomDelay, Repeater, ThresholdDec
+from .config import DEFAULTS
+from .Distributions import Sampler, Triangular, interArrival
 
-def triangularDistrib():
-    """Generates a Triangular-distributed random variate."""
-    MIN = 10 ; MAX = 60 ; MOD = 20
-    rand = random()
+def triangularDistrib(rng=None, params=DEFAULTS):
+    """Generates a Triangular-distributed random variate.
+    Draws from the given random.Random stream, or from the global one."""
+    MIN = params.MINE_MIN_OUTPUT ; MAX = params.MINE_MAX_OUTPUT ; MOD = params.MINE_MODE_OUTPUT
+    rand = rng.random() if rng is not None else random()
     mid = (MOD-MIN)/(MAX-MIN)
     if rand < mid:
         return MIN + sqrt(rand*(MAX-MIN)*(MOD-MIN))
@@ -18,32 +21,38 @@ def triangularDistrib():
         return MAX - sqrt((1-rand)*(MAX-MIN)*(MAX-MOD))
 
 # ========================================= BEHAVIOUR TREES ========================================
-def trainBT(node, outEdge):
-    """Train BT."""
+def trainBT(node, outEdge, params=DEFAULTS, interval=None):
+    """Train BT. The times between two trains (minutes) are drawn from the interval
+    generation function if given (see Distributions), else fixed."""
     # We assume that the train always brings 2/3 solvent, 1/3 base
     # Waits a given amount of time between two trains
-    wait = Delay(TRAIN_REFRESH_TIME/TICK)
+    if interval is not None:
+        wait = RandomDelay(interval, 1/params.TICK)
+    else:
+        wait = Delay(params.TRAIN_REFRESH_TIME/params.TICK)
     # Train brings in wagons with chemical products
-    train = Train(node, outEdge, NB_WAGONS, WAGON_CAPACITY)
+    train = Train(node, outEdge, params.NB_WAGONS, params.WAGON_CAPACITY)
     wait.add_child(train)
     return wait
 
-def miningBT(node, outEdge):
-    """Mining BT."""
-    nbTicks = MINE_REFRESH_TIME/TICK
+def miningBT(node, outEdge, rng=None, params=DEFAULTS, output=None):
+    """Mining BT. The mine output over a period is drawn from the output generation
+    function if given (see Distributions), else from the given random stream."""
+    nbTicks = params.MINE_REFRESH_TIME/params.TICK
     # Minimum to produce before updating the edge (ton)
     minUpdate = 1
-    mine = Mine(node, outEdge, triangularDistrib, nbTicks, minUpdate)
+    genFunc = output if output is not None else partial(triangularDistrib, rng, params)
+    mine = Mine(node, outEdge, genFunc, nbTicks, minUpdate)
     return mine
 
-def boatBT(incEdge, node):
+def boatBT(incEdge, node, params=DEFAULTS):
     """Boat BT."""
     seq = Sequence()
     # Verifies if the loading has been done
-    verifyLoading = Threshold(incEdge, BOAT_CAPACITY, Threshold.SUPERIOR)
+    verifyLoading = Threshold(incEdge, params.BOAT_CAPACITY, Threshold.SUPERIOR)
     seq.add_child(verifyLoading)
     # The boat leaves
-    boat = Boat(node, incEdge, BOAT_CAPACITY)
+    boat = Boat(node, incEdge, params.BOAT_CAPACITY)
     seq.add_child(boat)
     return boat
 
@@ -82,32 +91,32 @@ def consumer(incEdge, node, outEdge, quantity, incStep, nodeStep, minUpdate):
     seq.add_child(consume)
     return seqStar1
 
-def receiptBT(incEdge, node, outEdge):
+def receiptBT(incEdge, node, outEdge, params=DEFAULTS):
     """Receipt BT."""
-    quantity = NB_WAGONS*WAGON_CAPACITY
-    step = quantity/(TRAIN_UNLOADING_TIME/TICK)
-    minUpdate = MIN_RECEIPT
+    quantity = params.NB_WAGONS*params.WAGON_CAPACITY
+    step = quantity/(params.TRAIN_UNLOADING_TIME/params.TICK)
+    minUpdate = params.MIN_RECEIPT
     return consumer(incEdge, node, outEdge, quantity, step, step, minUpdate)
 
-def preparationBT(incEdge, node, outEdge):
+def preparationBT(incEdge, node, outEdge, params=DEFAULTS):
     """Preparation BT."""
-    quantity = MIN_PREPARATION
-    step = quantity/(PREPARATION_TIME/TICK)
-    minUpdate = MIN_RECEIPT
+    quantity = params.MIN_PREPARATION
+    step = quantity/(params.PREPARATION_TIME/params.TICK)
+    minUpdate = params.MIN_RECEIPT
     return consumer(incEdge, node, outEdge, quantity, step, step, minUpdate)
 
-def shipmentBT(incEdge, node, outEdge):
+def shipmentBT(incEdge, node, outEdge, params=DEFAULTS):
     """Shipment BT."""
-    step = SHIPMENT_SPEED/(60/TICK)
-    quantity = BOAT_CAPACITY
-    minUpdate = MIN_SHIPMENT
+    step = params.SHIPMENT_SPEED/(60/params.TICK)
+    quantity = params.BOAT_CAPACITY
+    minUpdate = params.MIN_SHIPMENT
     return consumer(incEdge, node, outEdge, quantity, step, step, minUpdate)
 
-def treatmentBT(incEdge1, incEdge2, node, outEdge):
+def treatmentBT(incEdge1, incEdge2, node, outEdge, params=DEFAULTS):
     """Treatment BT."""
-    pitStep = TREATMENT_SPEED/(60/TICK)
-    tankStep = MIN_TANK/(60/TICK)
-    quantity = MIN_PIT1
+    pitStep = params.TREATMENT_SPEED/(60/params.TICK)
+    tankStep = params.MIN_TANK/(60/params.TICK)
+    quantity = params.MIN_PIT1
     # Minimum to produce before updating the edge (ton)
     minUpdate = 1
     seqStar1 = SequenceStar()
@@ -128,10 +137,10 @@ def treatmentBT(incEdge1, incEdge2, node, outEdge):
     seqStar2 = SequenceStar()
     selectorStar.add_child(seqStar2)
     # Are there enough chemicals in the tank ?
-    tankChecker = Threshold(incEdge1, MIN_TANK)
+    tankChecker = Threshold(incEdge1, params.MIN_TANK)
     seqStar2.add_child(tankChecker)
     # Is there enough ore in the pit n°1 ?
-    pit1Checker = Threshold(incEdge2, MIN_PIT1)
+    pit1Checker = Threshold(incEdge2, params.MIN_PIT1)
     seqStar2.add_child(pit1Checker)
     # If it is the case, repeat production step
     repeater = Repeater()
@@ -149,8 +158,23 @@ def treatmentBT(incEdge1, incEdge2, node, outEdge):
 
 # ==================================================================================================
 
-def buildModel(model):
-    """Builds the model."""
+def buildModel(model, rng=None, params=DEFAULTS, streams=None):
+    """Builds the model with the given parameters (see config.parameters).
+    The random variates are drawn from the given random.Random stream, or from the global one,
+    or from one stream per random input with common random numbers (see Distributions.Streams)."""
+    p = params
+    model.rng = rng
+    model.params = params
+    # Random inputs : the mine output, and the times between two trains if they vary
+    output = interval = None
+    if streams is not None:
+        output = streams.sampler("mining", Triangular(p.MINE_MIN_OUTPUT, p.MINE_MODE_OUTPUT,\
+        p.MINE_MAX_OUTPUT))
+    if p.TRAIN_REFRESH_CV > 0:
+        distribution = interArrival(p.TRAIN_REFRESH_TIME, p.TRAIN_REFRESH_CV)
+        interval = streams.sampler("train", distribution) if streams is not None\
+        else Sampler(distribution, rng)
+    model.samplers.extend(sampler for sampler in (output, interval) if sampler is not None)
      # ============ About position and size : ============
     # Size and position values must be between 0 and 100,
     # because they are percentages of the canvas size.
@@ -158,28 +182,29 @@ def buildModel(model):
     # ===================================================
     # ********************** NODES **********************
     trainNode, trainIndex = model.addNode("", "", (0, 0), (0, 20))
-    receiptNode, receiptIndex = model.addNode("Réception des produits\nchimiques", MAX_RECEIPT,\
+    receiptNode, receiptIndex = model.addNode("Réception des produits\nchimiques", p.MAX_RECEIPT,\
     size, (20, 20))
-    miningNode, miningIndex = model.addNode("Extraction du minerai\nbrut de la mine", MAX_MINING,\
+    miningNode, miningIndex = model.addNode("Extraction du minerai\nbrut de la mine", p.MAX_MINING,\
     size, (20, 80))
     preparationNode, preparationIndex = \
-    model.addNode("Préparation de la mixture\npour le traitement", MAX_PREPARATION, size, (50, 20))
-    treatmentNode, treatmentIndex = model.addNode("Traitement du minerai", MAX_TREATMENT,\
+    model.addNode("Préparation de la mixture\npour le traitement", p.MAX_PREPARATION,\
+    size, (50, 20))
+    treatmentNode, treatmentIndex = model.addNode("Traitement du minerai", p.MAX_TREATMENT,\
     size, (50, 50))
-    shipmentNode, shipmentIndex = model.addNode("Expédition", MAX_SHIPMENT, size, (80, 50))
+    shipmentNode, shipmentIndex = model.addNode("Expédition", p.MAX_SHIPMENT, size, (80, 50))
     boatNode, boatIndex = model.addNode("", "", (0, 0), (100, 50))
     # ********************** EDGES **********************
-    trainEdge, _ = model.addEdge("Train", MAX_TRAIN, trainIndex, receiptIndex)
-    receiptEdge, _ = model.addEdge("", MAX_RECEIPT_EDGE, receiptIndex, preparationIndex)
-    pit1, _ = model.addEdge("pit n°1", MAX_PIT1, miningIndex, treatmentIndex)
-    tank, _ = model.addEdge("tank", MAX_TANK, preparationIndex, treatmentIndex)
-    pit2, _ = model.addEdge("pit n°2", MAX_PIT2, treatmentIndex, shipmentIndex)
-    boatEdge, _ = model.addEdge("Bateau", BOAT_CAPACITY, shipmentIndex, boatIndex)
+    trainEdge, _ = model.addEdge("Train", p.MAX_TRAIN, trainIndex, receiptIndex)
+    receiptEdge, _ = model.addEdge("", p.MAX_RECEIPT_EDGE, receiptIndex, preparationIndex)
+    pit1, _ = model.addEdge("pit n°1", p.MAX_PIT1, miningIndex, treatmentIndex)
+    tank, _ = model.addEdge("tank", p.MAX_TANK, preparationIndex, treatmentIndex)
+    pit2, _ = model.addEdge("pit n°2", p.MAX_PIT2, treatmentIndex, shipmentIndex)
+    boatEdge, _ = model.addEdge("Bateau", p.BOAT_CAPACITY, shipmentIndex, boatIndex)
     # ************************ BT ***********************
-    trainNode.bTree = trainBT(trainNode, trainEdge)
-    receiptNode.bTree = receiptBT(trainEdge, receiptNode, receiptEdge)
-    miningNode.bTree = miningBT(miningNode, pit1)
-    preparationNode.bTree = preparationBT(receiptEdge, preparationNode, tank)
-    treatmentNode.bTree = treatmentBT(tank, pit1, treatmentNode, pit2)
-    shipmentNode.bTree = shipmentBT(pit2, shipmentNode, boatEdge)
-    boatNode.bTree = boatBT(boatEdge, boatNode)
+    trainNode.bTree = trainBT(trainNode, trainEdge, p, interval)
+    receiptNode.bTree = receiptBT(trainEdge, receiptNode, receiptEdge, p)
+    miningNode.bTree = miningBT(miningNode, pit1, rng, p, output)
+    preparationNode.bTree = preparationBT(receiptEdge, preparationNode, tank, p)
+    treatmentNode.bTree = treatmentBT(tank, pit1, treatmentNode, pit2, p)
+    shipmentNode.bTree = shipmentBT(pit2, shipmentNode, boatEdge, p)
+    boatNode.bTree = boatBT(boatEdge, boatNode, p)
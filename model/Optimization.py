@@ -0,0 +1,131 @@
+"""Capacity optimization : searches the smallest parameter values (e.g. buffer sizes)
+meeting constraints on the KPIs, by successive halving over parallel sweeps."""
+
+from math import ceil, inf, isnan, log
+from random import Random
+from .Sweep import Sweep
+from .config import DEFAULTS
+
+def parseConstraint(definition):
+    """Parses a NAME<=BOUND or NAME>=BOUND constraint on a metric of the replicas
+    (e.g. 'node0:rejections<=0'). Returns the (name, operator, bound) triple."""
+    for operator in ("<=", ">="):
+        if operator in definition:
+            name, bound = definition.rsplit(operator, 1)
+            return name.strip(), operator, float(bound)
+    raise ValueError("constraint : NAME<=BOUND or NAME>=BOUND expected : " + definition)
+
+class Axis(object):
+    """Searched parameter, from low to high by steps."""
+    def __init__(self, name, low, high, step=1):
+        if name not in DEFAULTS.values():
+            raise KeyError("unknown parameter : " + name)
+        if high < low or step <= 0:
+            raise ValueError("axis %s : low <= high and step > 0 expected" % name)
+        self.name = name
+        self.low = low
+        self.high = high
+        self.step = step
+
+    def value(self, fraction):
+        """Returns the value at a fraction of the range, rounded down to a step."""
+        count = int((self.high - self.low)//self.step)
+        return self.low + min(count, int(fraction*(count + 1)))*self.step
+
+def latinHypercube(axes, count, rng):
+    """Returns count scenarios spreading the values of each axis evenly : the range of
+    each axis is cut into count strata, each holding the value of one scenario."""
+    columns = []
+    for axis in axes:
+        strata = list(range(count))
+        rng.shuffle(strata)
+        columns.append([axis.value((stratum + rng.random())/count) for stratum in strata])
+    names = [axis.name for axis in axes]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+class CapacityOptimizer(object):
+    """Searches the candidate parameter values of the lowest cost meeting the constraints.
+    The cost of a candidate is the weighted sum of its values relative to the top of
+    their axis (weights default to 1). The constraints bound the mean of metrics of the
+    replicas (see Replication.runReplica, e.g. the plant KPIs) over the horizon, at every
+    rung : over the short horizons, the ratios and means are fairer bounds than the counts.
+    Successive halving : the candidates (a Latin hypercube) first run over a short
+    horizon, then only the best 1/eta of them run again over a horizon eta times longer,
+    and so on up to the full horizon, so that most of the runs go to the promising ones.
+    The candidates are ranked by violation of the constraints, then by cost.
+    Each rung is a Sweep over the pool of processes ; with common random numbers (crn),
+    the candidates of a rung get the same random inputs."""
+    def __init__(self, axes, constraints, nbTicks, minTicks=None, eta=3, replications=1,\
+    seed=0, weights=None, sampling=60, nextEvent=True, compiled=True, processes=None,\
+    checkpoint=None, plant=None, crn=True):
+        if eta < 2:
+            raise ValueError("successive halving : eta >= 2 expected")
+        self.axes = list(axes)
+        self.constraints = list(constraints)
+        self.nbTicks = nbTicks
+        self.minTicks = max(1, minTicks or nbTicks//eta**2)
+        self.eta = eta
+        self.seed = seed
+        self.weights = weights or {}
+        self.replications = replications
+        self.settings = {"sampling": sampling, "nextEvent": nextEvent, "compiled": compiled,\
+        "processes": processes, "checkpoint": checkpoint, "plant": plant, "crn": crn}
+
+    def horizons(self):
+        """Returns the horizons of the rungs (ticks), the last one being the full one."""
+        nbRungs = 1 + int(log(self.nbTicks/self.minTicks)/log(self.eta) + 1e-9)\
+        if self.nbTicks > self.minTicks else 1
+        return [max(1, self.nbTicks//self.eta**rung) for rung in reversed(range(nbRungs))]
+
+    def cost(self, overrides):
+        """Returns the cost of candidate values."""
+        return sum(self.weights.get(axis.name, 1)*overrides[axis.name]/axis.high\
+        for axis in self.axes if axis.high > 0)
+
+    def violation(self, row):
+        """Returns how far the metrics of an evaluated candidate are from meeting the
+        constraints (0 if they are met), each relative to its bound. An undefined (NaN)
+        metric does not meet its constraint."""
+        total = 0
+        for name, operator, bound in self.constraints:
+            if name not in row:
+                raise KeyError("unknown metric : " + name)
+            if isnan(row[name]):
+                return inf
+            excess = row[name] - bound if operator == "<=" else bound - row[name]
+            total += max(0, excess)/max(1, abs(bound))
+        return total
+
+    def evaluate(self, candidates, nbTicks, rung=0):
+        """Runs the candidates over a horizon. Returns their rows (see Sweep.run, plus the
+        rung, horizon, cost, violation and feasibility), best first."""
+        sweep = Sweep(nbTicks, self.replications, self.seed, **self.settings)
+        rows = sweep.run(candidates)
+        for row in rows:
+            row["rung"] = rung
+            row["ticks"] = nbTicks
+            row["cost"] = self.cost(row)
+            row["violation"] = self.violation(row)
+            row["feasible"] = row["violation"] == 0
+        rows.sort(key=lambda row: (row["violation"], row["cost"]))
+        return rows
+
+    def search(self, nbCandidates=27, report=None):
+        """Runs the successive halving from nbCandidates candidates. report, if given, is
+        called with the rows of each rung. Returns the overrides of the best feasible
+        candidate (None if there is none), and the rows of all the rungs."""
+        names = [axis.name for axis in self.axes]
+        sweep = Sweep(self.nbTicks, self.replications, self.seed, **self.settings)
+        candidates = sweep.distinct(latinHypercube(self.axes, nbCandidates, Random(self.seed)))
+        horizons = self.horizons()
+        history = []
+        for rung, nbTicks in enumerate(horizons):
+            rows = self.evaluate(candidates, nbTicks, rung)
+            history.extend(rows)
+            if report is not None:
+                report(rows)
+            if rung < len(horizons) - 1:
+                rows = rows[:max(1, ceil(len(rows)/self.eta))]
+            candidates = [{name: row[name] for name in names} for row in rows]
+        best = rows[0] if rows and rows[0]["feasible"] else None
+        return (None if best is None else {name: best[name] for name in names}), history
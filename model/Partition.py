@@ -0,0 +1,235 @@
+"""Partitioning of the plant into sub-networks ticked in parallel processes."""
+
+from os import cpu_count
+import random
+from .Model import Model
+from .Checkpoint import ownStream
+from .Replication import replicaSeed
+from .Simulation import History
+
+class Plan(object):
+    """Assignment of the nodes of a model to partitions.
+    Nodes accessing a common element are in the same partition, unless the element is
+    a cut edge (a link) : the tree of its origin node only adds to it, the tree of its
+    destination node only takes from it."""
+    def __init__(self, model, parts, cut=None):
+        self.model = model
+        self.nodeIndexes = {id(node): index for index, node in enumerate(model.nodes)}
+        self.access = [node.elements() for node in model.nodes]
+        # Nodes accessing each element
+        self.users = {}
+        for index, elements in enumerate(self.access):
+            for element in elements:
+                self.users.setdefault(id(element), []).append(index)
+        edgeIndexes = {id(edge): index for index, edge in enumerate(model.edges)}
+        if cut == "auto":
+            links = self.autoCut(parts)
+        else:
+            links = {edgeIndexes[id(model.edge(key))] for key in (cut or ())}
+            for index in links:
+                if not self.cuttable(model.edges[index]):
+                    raise ValueError("edge " + str(index) + " is not only accessed by its ends")
+        components = self.components(links)
+        self.partitions = self.pack(components, parts)
+        # Only the links between different partitions are kept
+        owner = {}
+        for part, nodes in enumerate(self.partitions):
+            for index in nodes:
+                owner[index] = part
+        self.owner = owner
+        self.links = sorted(index for index in links\
+        if len({owner[user] for user in self.users[id(model.edges[index])]}) > 1)
+
+    def cuttable(self, edge):
+        """Returns True if an edge is only accessed by the trees of its two ends."""
+        ends = {self.nodeIndexes[id(edge.nodeFrom)], self.nodeIndexes[id(edge.nodeTo)]}
+        return set(self.users.get(id(edge), ())) <= ends
+
+    def components(self, links):
+        """Returns the groups of nodes linked by the elements they access, except the links."""
+        parent = list(range(len(self.model.nodes)))
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+        linked = {id(self.model.edges[index]) for index in links}
+        for key, users in self.users.items():
+            if key not in linked:
+                for user in users[1:]:
+                    parent[find(user)] = find(users[0])
+        groups = {}
+        for index in range(len(self.model.nodes)):
+            groups.setdefault(find(index), []).append(index)
+        return list(groups.values())
+
+    def autoCut(self, parts):
+        """Chooses the links : cuts the largest component in two as evenly as possible,
+        preferring the largest buffers, until there are enough components."""
+        links = set()
+        while True:
+            components = self.components(links)
+            if len(components) >= parts:
+                return links
+            largest = set(max(components, key=len))
+            best = None
+            for index, edge in enumerate(self.model.edges):
+                if index in links or not self.cuttable(edge)\
+                or self.nodeIndexes[id(edge.nodeFrom)] not in largest:
+                    continue
+                sizes = [len(group) for group in self.components(links | {index})\
+                if largest.issuperset(group)]
+                if len(sizes) < 2:
+                    continue
+                capacity = edge.capacity if isinstance(edge.capacity, (int, float)) else 0
+                score = (min(sizes), capacity)
+                if best is None or score > best[0]:
+                    best = (score, index)
+            if best is None:
+                return links
+            links.add(best[1])
+
+    def pack(self, components, parts):
+        """Distributes the components over the partitions, balancing their number of tasks."""
+        def weight(component):
+            return sum(len(list(self.model.nodes[index].bTree.walk()))\
+            for index in component if self.model.nodes[index].bTree is not None) or 1
+        partitions = [[] for _ in range(min(parts, len(components)))]
+        loads = [0]*len(partitions)
+        for component in sorted(components, key=weight, reverse=True):
+            lightest = loads.index(min(loads))
+            partitions[lightest].extend(component)
+            loads[lightest] += weight(component)
+        return [sorted(nodes) for nodes in partitions if nodes]
+
+def _worker(connection, nodes, edges, links, samplers, rng, seed, compiled, nextEvent):
+    """Ticks a partition on demand : runs windows and reports the levels of its nodes and
+    edges, and the deltas of its links."""
+    # Random stream of the partition
+    if rng is not None:
+        rng.seed(seed)
+    random.seed(seed)
+    local = Model()
+    local.nodes = nodes
+    local.edges = edges
+    local.rng = rng
+    if compiled:
+        local.compile()
+    while True:
+        message = connection.recv()
+        if message[0] == "run":
+            _, clock, end, levels = message
+            for link, level in zip(links, levels):
+                link.current = level
+            local.clock = clock
+            if nextEvent:
+                while local.clock < end:
+                    local.advance(end - local.clock)
+            else:
+                for _ in range(end - clock):
+                    local.step()
+            connection.send(([element.current for element in nodes + edges],\
+            [link.current - level for link, level in zip(links, levels)]))
+        elif message[0] == "state":
+            connection.send(([getattr(task, name) for node in nodes if node.bTree is not None\
+            for task in node.bTree.walk() for name in task.STATE + task.COUNTERS],\
+            [(sampler.pending(), sampler.rng.getstate() if ownStream(local, sampler) else None)\
+            for sampler in samplers]))
+        else:
+            connection.close()
+            return
+
+class ParallelRunner(object):
+    """Ticks the partitions of a model in worker processes, and merges their levels in
+    the model at barriers, every 'window' ticks (and at the samples of the observers).
+    Without links, the partitions are independent and the run follows the same rules as
+    a single process run ; each partition draws from its own random stream.
+    A link adds a delay of at most 'window' ticks : the origin side adds to it with the
+    free space seen at the last barrier, the destination side takes from the stock seen
+    at the last barrier, and their deltas are summed at the next one. The level of a
+    link therefore always stays within its bounds."""
+    def __init__(self, model, processes=None, window=60, cut=None, seed=0, compiled=False,\
+    nextEvent=False):
+        self.model = model
+        self.window = window
+        # Imported when needed, so that the other runs start faster
+        from multiprocessing import Pipe, Process
+        self.plan = Plan(model, processes or cpu_count() or 1, cut)
+        self.links = [model.edges[index] for index in self.plan.links]
+        samplerIndexes = {id(sampler): index for index, sampler in enumerate(model.samplers)}
+        self.workers = []
+        for part, nodeIndexes in enumerate(self.plan.partitions):
+            nodes = [model.nodes[index] for index in nodeIndexes]
+            # Samplers drawn by the tasks of the partition
+            samplers = [model.samplers[index] for index in sorted({samplerIndexes[id(value)]\
+            for node in nodes if node.bTree is not None for task in node.bTree.walk()\
+            for value in vars(task).values() if id(value) in samplerIndexes})]
+            accessed = {id(element) for index in nodeIndexes\
+            for element in self.plan.access[index]}
+            links = [edge for edge in self.links if id(edge) in accessed]
+            # Edges owned by the partition
+            edges = [edge for edge in model.edges if id(edge) in accessed and edge not in links]
+            connection, workerConnection = Pipe()
+            process = Process(target=_worker, args=(workerConnection, nodes, edges, links,\
+            samplers, model.rng, replicaSeed(seed, part), compiled, nextEvent), daemon=True)
+            process.start()
+            workerConnection.close()
+            self.workers.append((connection, process, nodes, edges, links, samplers))
+
+    def advance(self, ticks):
+        """Runs all the partitions for the given number of ticks, then merges their levels
+        and notifies the observers."""
+        model = self.model
+        end = model.clock + ticks
+        for connection, _, _, _, links, _ in self.workers:
+            connection.send(("run", model.clock, end, [link.current for link in links]))
+        deltas = {id(link): 0 for link in self.links}
+        for connection, _, nodes, edges, links, _ in self.workers:
+            levels, linkDeltas = connection.recv()
+            for element, level in zip(nodes + edges, levels):
+                element.current = level
+            for link, delta in zip(links, linkDeltas):
+                deltas[id(link)] += delta
+        for link, level in zip(self.links, [link.current for link in self.links]):
+            link.current = min(max(level + deltas[id(link)], 0), link.capacity)
+        model.clock = end
+        for observer in model.observers:
+            observer.update(model)
+
+    def simulate(self, nbTicks, sampling=1):
+        """Runs the model for a given number of ticks, recording the levels every
+        'sampling' ticks. Returns a SimulationResult."""
+        model = self.model
+        history = History(model, sampling)
+        model.addObserver(history)
+        try:
+            end = model.clock + nbTicks
+            while model.clock < end:
+                clock = model.clock
+                self.advance(min(end, clock + self.window - clock % self.window,\
+                clock + sampling - clock % sampling) - clock)
+        finally:
+            model.removeObserver(history)
+        return history.result()
+
+    def close(self):
+        """Gets the progress and the counters of the tasks back in the model, with the state
+        of the samplers (values drawn in advance, own streams), and stops the workers.
+        The model can then be run or checkpointed as usual. The stream of the model is left
+        as is : the partitions draw from streams of their own."""
+        for connection, process, nodes, _, _, samplers in self.workers:
+            connection.send(("state",))
+            values, states = connection.recv()
+            slots = [(task, name) for node in nodes if node.bTree is not None\
+            for task in node.bTree.walk() for name in task.STATE + task.COUNTERS]
+            for (task, name), value in zip(slots, values):
+                setattr(task, name, value)
+            for sampler, (pending, stream) in zip(samplers, states):
+                sampler.setPending(pending)
+                if stream is not None:
+                    sampler.rng.setstate(stream)
+            connection.send(("stop",))
+            process.join()
+        self.workers = []
+        if self.model.scheduler is not None:
+            self.model.scheduler.reset()
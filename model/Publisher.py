@@ -0,0 +1,61 @@
+"""Publication policy of the model snapshots to the GUI."""
+
+from time import perf_counter
+import queue
+from .Snapshot import Snapshot
+
+class Publisher(object):
+    """Decides which snapshots are sent to the GUI, without ever blocking the model.
+    A snapshot is published every 'every' ticks, at most 'maxRate' times per second
+    (no limit if None). When the channel is full, the oldest snapshot is dropped
+    (KEEP_LATEST) or the new one is (KEEP_OLDEST)."""
+    # Policy when the channel is full
+    KEEP_LATEST, KEEP_OLDEST = range(2)
+
+    def __init__(self, every=1, maxRate=None, policy=KEEP_LATEST):
+        self.every = every
+        self.maxRate = maxRate
+        self.policy = policy
+        # Minimum wall-clock time between two snapshots (seconds)
+        self.period = 1/maxRate if maxRate else 0
+        self.lastTime = None
+        # Counters : snapshots sent, dropped because the channel was full,
+        # and ticks skipped by the decimation or the rate limit
+        self.published = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def publish(self, channel, model):
+        """Sends a snapshot of the model in the channel, if the policy allows it."""
+        if model.clock % self.every != 0:
+            self.skipped += 1
+            return
+        if self.period:
+            now = perf_counter()
+            if self.lastTime is not None and now - self.lastTime < self.period:
+                self.skipped += 1
+                return
+            self.lastTime = now
+        snapshot = Snapshot.capture(model)
+        try:
+            channel.put_nowait(snapshot)
+        except queue.Full:
+            if self.policy == Publisher.KEEP_OLDEST:
+                self.dropped += 1
+                return
+            # Makes room for the latest snapshot
+            try:
+                channel.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                channel.put_nowait(snapshot)
+            except queue.Full:
+                self.dropped += 1
+                return
+        self.published += 1
+
+    def counters(self):
+        """Returns the publication counters."""
+        return {"published": self.published, "dropped": self.dropped, "skipped": self.skipped}
@@ -0,0 +1,251 @@
+"""Columnar recording of the levels in memory-mapped .npy files."""
+
+from array import array
+import json
+import mmap
+import os
+from .Simulation import labels
+
+# The .npy header fills one allocation granularity, so that the data chunks are aligned
+HEADER_SIZE = max(mmap.ALLOCATIONGRANULARITY, 4096)
+# numpy type descriptions of the levels, and of the changes (tick, element index, level)
+LEVELS = "'<f8'"
+CHANGES = "[('tick', '<i8'), ('index', '<i8'), ('value', '<f8')]"
+# Name of the description file of a trace, and of its data files
+MANIFEST = "trace.json"
+LEVELS_FILE = "levels.npy"
+CHANGES_FILE = "changes.npy"
+
+def npyHeader(descr, shape):
+    """Returns the .npy (version 1.0) header of an array."""
+    header = "{'descr': %s, 'fortran_order': False, 'shape': (%s), }" % (descr,\
+    "".join("%d," % size for size in shape))
+    header = header.ljust(HEADER_SIZE-10-1) + "\n"
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+class ChunkedFile(object):
+    """Array of 8-byte items appended to a .npy file, through a memory-mapped window on the
+    current chunk only : the memory used depends neither on the length of the array nor on
+    its width. A record of 'record' items never spans two chunks."""
+    def __init__(self, path, descr, shape=(), record=1, chunkSize=1 << 16):
+        self.path = path
+        self.descr = descr
+        # Sizes of the dimensions after the first one, and number of items of a record
+        self.shape = tuple(shape)
+        self.record = record
+        # Chunks are a whole number of allocation granularities and of records
+        unit = record*mmap.ALLOCATIONGRANULARITY//8
+        self.chunkItems = max(chunkSize - chunkSize % unit, unit)
+        self.chunkBytes = self.chunkItems*8
+        self.file = open(path, 'w+b')
+        self.file.write(npyHeader(descr, (0,) + self.shape))
+        self.items = 0
+        self.chunk = -1
+        self.window = None
+        self.doubles = None
+        self.integers = None
+
+    def _position(self):
+        """Returns the position of the next item in the current chunk, mapping the next
+        chunk if the current one is full."""
+        position = self.items - self.chunk*self.chunkItems
+        if position >= self.chunkItems or self.window is None:
+            self._unmap()
+            self.chunk += 1
+            offset = HEADER_SIZE + self.chunk*self.chunkBytes
+            self.file.truncate(offset + self.chunkBytes)
+            self.window = mmap.mmap(self.file.fileno(), self.chunkBytes, offset=offset)
+            self.doubles = memoryview(self.window).cast('d')
+            self.integers = memoryview(self.window).cast('q')
+            position = 0
+        return position
+
+    def _unmap(self):
+        """Releases the current window."""
+        if self.window is not None:
+            self.doubles.release()
+            self.integers.release()
+            self.window.close()
+            self.window = None
+
+    def extend(self, values):
+        """Appends doubles (array of doubles), over as many chunks as needed."""
+        start = 0
+        while start < len(values):
+            position = self._position()
+            count = min(len(values) - start, self.chunkItems - position)
+            self.doubles[position:position+count] = values[start:start+count]
+            self.items += count
+            start += count
+
+    def change(self, tick, index, value):
+        """Appends a (tick, index, value) record."""
+        position = self._position()
+        self.integers[position] = tick
+        self.integers[position+1] = index
+        self.doubles[position+2] = value
+        self.items += 3
+
+    def close(self):
+        """Writes the final header and removes the unused preallocated space."""
+        self._unmap()
+        self.file.truncate(HEADER_SIZE + self.items*8)
+        self.file.seek(0)
+        rowItems = self.record
+        for size in self.shape:
+            rowItems *= size
+        self.file.write(npyHeader(self.descr, (self.items//rowItems if rowItems else 0,)\
+        + self.shape))
+        self.file.close()
+
+class ColumnRecorder(object):
+    """Model observer writing the level of every node and edge in a single chunked file.
+    EVERY_TICK records all the levels every 'every' ticks, as one row (ticks x elements).
+    ON_CHANGE records, whenever the level of an element changes, the tick, the index of
+    the element and its new level ; with the next-event time advance, the changes inside
+    a skipped stretch are recorded at its end.
+    Only one file is open and one chunk mapped, whatever the number of elements."""
+    EVERY_TICK, ON_CHANGE = range(2)
+
+    def __init__(self, model, directory, mode=EVERY_TICK, every=1, chunkSize=1 << 16):
+        self.model = model
+        self.directory = directory
+        self.mode = mode
+        os.makedirs(directory, exist_ok=True)
+        elements = model.nodes + model.edges
+        nodeLabels = labels(model.nodes, "node")
+        self.labels = nodeLabels + labels(model.edges, "edge", nodeLabels)
+        self.start = model.clock
+        if mode == ColumnRecorder.EVERY_TICK:
+            # Samples every 'every' ticks (see Model.advance)
+            self.sampling = every
+            self.file = ChunkedFile(os.path.join(directory, LEVELS_FILE), LEVELS,\
+            (len(elements),), 1, chunkSize)
+        else:
+            # Any tick the engine stops at
+            self.sampling = None
+            self.file = ChunkedFile(os.path.join(directory, CHANGES_FILE), CHANGES, (), 3,\
+            chunkSize)
+            # Last recorded levels
+            self.last = [None]*len(elements)
+        self.elements = elements
+
+    def update(self, model):
+        """Records the levels."""
+        if self.sampling is not None:
+            if model.clock % self.sampling == 0:
+                self.file.extend(array('d', [element.current for element in self.elements]))
+            return
+        last = self.last
+        for index, element in enumerate(self.elements):
+            current = element.current
+            if current != last[index]:
+                last[index] = current
+                self.file.change(model.clock, index, current)
+
+    def close(self):
+        """Closes the data file and writes the description of the trace."""
+        self.file.close()
+        manifest = {"mode": "every" if self.sampling is not None else "change",\
+        "start": self.start, "sampling": self.sampling,\
+        "file": os.path.basename(self.file.path), "labels": self.labels}
+        with open(os.path.join(self.directory, MANIFEST), 'w', encoding='utf-8') as output:
+            json.dump(manifest, output, indent=1, ensure_ascii=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+class Trace(object):
+    """Recorded trace, loaded without copy : the levels are views on the memory-mapped
+    file, valid until the trace is closed. In change mode, the levels and ticks of one
+    element are gathered from the records (see changes for the views)."""
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as manifest:
+            description = json.load(manifest)
+        self.mode = description["mode"]
+        self.start = description["start"]
+        self.sampling = description["sampling"]
+        self.path = os.path.join(directory, description["file"])
+        self.columns = {label: index for index, label in enumerate(description["labels"])}
+        self.width = len(self.columns)
+        self.map = None
+        # Views on the map (by key), released on close in the reverse order
+        self.views = {}
+        # Positions of the records of each element (change mode, see _records)
+        self.positions = None
+
+    def _view(self, key, make):
+        """Returns a view on the read-only map of the file, made once by make()."""
+        if key not in self.views:
+            if self.map is None:
+                with open(self.path, 'rb') as data:
+                    self.map = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+            self.views[key] = make()
+        return self.views[key]
+
+    def _data(self, typecode):
+        """Returns the data of the file as a flat view of integers or doubles."""
+        data = self._view("data", lambda: memoryview(self.map)[HEADER_SIZE:])
+        return self._view(typecode, lambda: data.cast(typecode))
+
+    def changes(self):
+        """Ticks, element indexes and levels of the records (change mode), as strided
+        memoryviews (of integers, integers and doubles)."""
+        integers = self._data('q')
+        doubles = self._data('d')
+        return self._view("changes", lambda: (integers[0::3], integers[1::3], doubles[2::3]))
+
+    def _records(self, label):
+        """Returns the positions of the records of an element (change mode)."""
+        if self.positions is None:
+            self.positions = [array('q') for _ in range(self.width)]
+            for position, index in enumerate(self.changes()[1]):
+                self.positions[index].append(position)
+        return self.positions[self.columns[label]]
+
+    def values(self, label):
+        """Levels of an element : a strided memoryview of doubles, or an array of doubles
+        in change mode."""
+        if self.mode == "change":
+            values = self.changes()[2]
+            return array('d', [values[position] for position in self._records(label)])
+        column = self.columns[label]
+        doubles = self._data('d')
+        return self._view(("column", label), lambda: doubles[column::self.width])
+
+    def ticks(self, label):
+        """Ticks of the levels of an element : an array in change mode, else a range."""
+        if self.mode == "change":
+            ticks = self.changes()[0]
+            return array('q', [ticks[position] for position in self._records(label)])
+        first = (self.start//self.sampling + 1)*self.sampling
+        return range(first, first + self.sampling*len(self.values(label)), self.sampling)
+
+    def array(self, label):
+        """Levels of an element as a view on a numpy memory map, or an array in change
+        mode (requires numpy)."""
+        import numpy
+        data = numpy.load(self.path, mmap_mode='r')
+        if self.mode == "change":
+            return data['value'][data['index'] == self.columns[label]]
+        return data[:, self.columns[label]]
+
+    def close(self):
+        """Releases the views on the file, then unmaps it."""
+        for views in reversed(list(self.views.values())):
+            for view in views if isinstance(views, tuple) else (views,):
+                view.release()
+        self.views = {}
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
@@ -0,0 +1,180 @@
+"""Replay files : the levels of a run, to be reviewed later at any simulated time.
+
+A replay file holds a file header, the frames of the snapshots as streamed (see Streaming :
+the layout, then keyframes and deltas), the time index of the keyframes, then a trailer
+locating the index. A file whose run did not finish has no trailer : its index is
+rebuilt by reading the frames."""
+
+import json
+import mmap
+import queue
+import struct
+from array import array
+from bisect import bisect_right
+from .Snapshot import Layout, Snapshot, HEADER, CHANGE, LAYOUT, KEYFRAME, DELTA, packLevels
+
+MAGIC = b'PLNTRPLY'
+VERSION = 1
+# File header : magic, version
+FILE_HEADER = struct.Struct('<8sH')
+# Entry of the time index : time of a keyframe, offset of its frame
+INDEX = struct.Struct('<QQ')
+# Trailer : offset and number of entries of the index, magic
+TRAILER = struct.Struct('<QQ8s')
+# Number of frames between two keyframes : bounds the deltas applied by a seek
+KEYFRAME_EVERY = 256
+
+class ReplayWriter(object):
+    """Model observer writing the levels (and the plant KPIs, see Snapshot) every 'every'
+    ticks in a replay file, as deltas with a keyframe every KEYFRAME_EVERY frames."""
+    def __init__(self, model, path, every=1, keyframeEvery=KEYFRAME_EVERY):
+        self.sampling = every
+        self.keyframeEvery = keyframeEvery
+        self.output = open(path, 'wb')
+        self.output.write(FILE_HEADER.pack(MAGIC, VERSION))
+        layout = json.dumps(Layout(model).asDict()).encode()
+        self.write(LAYOUT, model.clock, layout)
+        # Time index of the keyframes, number of frames and last levels written
+        self.index = []
+        self.frames = 0
+        self.values = None
+
+    def write(self, kind, time, payload):
+        """Writes a frame."""
+        self.output.write(HEADER.pack(len(payload), kind, time))
+        self.output.write(payload)
+
+    def update(self, model):
+        """Writes a frame, if a sample is due."""
+        if model.clock % self.sampling != 0:
+            return
+        values = Snapshot.capture(model).values
+        previous = self.values
+        if previous is None or self.frames % self.keyframeEvery == 0:
+            self.index.append((model.clock, self.output.tell()))
+            self.write(KEYFRAME, model.clock, packLevels(values))
+        else:
+            self.write(DELTA, model.clock, b''.join([CHANGE.pack(index, value)\
+            for index, (old, value) in enumerate(zip(previous, values)) if old != value]))
+        self.values = values
+        self.frames += 1
+
+    def close(self):
+        """Writes the time index and the trailer, then closes the file."""
+        offset = self.output.tell()
+        for time, position in self.index:
+            self.output.write(INDEX.pack(time, position))
+        self.output.write(TRAILER.pack(offset, len(self.index), MAGIC))
+        self.output.close()
+
+class Replay(object):
+    """Replay file, memory-mapped : seek jumps to the nearest keyframe before a time,
+    then applies the following deltas. It stands for the model process of the GUI
+    (getQueue, getLayout) : get plays the frames one after the other."""
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a replay file, or unsupported version : " + path)
+        kind, _, length, payload = self.frame(FILE_HEADER.size)
+        if kind != LAYOUT:
+            raise ValueError("the replay does not start with a layout : " + path)
+        self.layout = Layout.fromDict(json.loads(bytes(self.data[payload:payload+length])))
+        self.first = payload + length
+        self.end, self.index = self.readIndex()
+        if not self.index:
+            raise ValueError("the replay has no frame : " + path)
+        self.times = [time for time, _ in self.index]
+        self.values = array('d', [0.0])*self.layout.nbValues
+        # Offset of the next frame played by get
+        self.cursor = self.index[0][1]
+        self.start = self.index[0][0]
+        self.last = self.lastTime()
+
+    def frame(self, offset):
+        """Returns the kind, the time, the length and the offset of the payload of the
+        frame at an offset."""
+        length, kind, time = HEADER.unpack_from(self.data, offset)
+        return kind, time, length, offset + HEADER.size
+
+    def readIndex(self):
+        """Returns the end of the frames and the time index of the keyframes, from the
+        trailer, or by reading the frames if there is none."""
+        data = self.data
+        if len(data) >= self.first + TRAILER.size:
+            offset, count, magic = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+            if magic == MAGIC and offset + count*INDEX.size + TRAILER.size == len(data):
+                return offset, [INDEX.unpack_from(data, offset + i*INDEX.size)\
+                for i in range(count)]
+        index = []
+        offset = self.first
+        while offset + HEADER.size <= len(data):
+            kind, time, length, payload = self.frame(offset)
+            if payload + length > len(data):
+                break
+            if kind == KEYFRAME:
+                index.append((time, offset))
+            offset = payload + length
+        return offset, index
+
+    def lastTime(self):
+        """Returns the time of the last frame."""
+        offset = self.index[-1][1]
+        time = self.index[-1][0]
+        while offset < self.end:
+            _, time, length, payload = self.frame(offset)
+            offset = payload + length
+        return time
+
+    def apply(self, offset):
+        """Applies the frame at an offset to the levels. Returns its time and the offset
+        of the next frame."""
+        kind, time, length, payload = self.frame(offset)
+        values = self.values
+        if kind == KEYFRAME:
+            values[:] = array('d', struct.unpack_from('<%dd' % len(values), self.data, payload))
+        elif kind == DELTA:
+            for index, value in CHANGE.iter_unpack(self.data[payload:payload+length]):
+                values[index] = value
+        return time, payload + length
+
+    def seek(self, time):
+        """Returns the snapshot of the levels at a time (those of the last frame before it),
+        and plays the following frames from there."""
+        keyframe = max(0, bisect_right(self.times, time) - 1)
+        current, offset = self.apply(self.index[keyframe][1])
+        while offset < self.end:
+            following = self.frame(offset)[1]
+            if following > time:
+                break
+            current, offset = self.apply(offset)
+        self.cursor = offset
+        return Snapshot(current, array('d', self.values))
+
+    def get(self, block=False, timeout=None):
+        """Returns the snapshot of the next frame, or raises queue.Empty at the end."""
+        if self.cursor >= self.end:
+            raise queue.Empty
+        time, self.cursor = self.apply(self.cursor)
+        return Snapshot(time, array('d', self.values))
+
+    def getQueue(self):
+        """Returns the channel of the snapshots."""
+        return self
+
+    def getLayout(self):
+        """Returns the static layout of the model."""
+        return self.layout
+
+    def terminate(self):
+        """Nothing runs : same as close."""
+        self.close()
+
+    def close(self):
+        """Closes the file."""
+        if self.data is None:
+            return
+        self.data.close()
+        self.file.close()
+        self.data = None
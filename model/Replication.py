@@ -0,0 +1,124 @@
+"""Parallel replications of the model, with reproducible random streams."""
+
+from hashlib import sha256
+from os import cpu_count
+from random import Random
+from .Model import Model
+from .ModelBuilder import buildModel
+from .Loader import loadPlant
+from .Distributions import Streams
+from .config import parameters
+from .Statistics import meanConfidence
+from .Analysis import OutputAnalyzer
+from .KPI import PlantKPIs
+
+def replicaSeed(seed, replica):
+    """Returns the seed of the random stream of a replica, derived from the root seed."""
+    digest = sha256((str(seed) + "/" + str(replica)).encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+def runReplica(replica, seed, nbTicks, sampling=60, nextEvent=True, compiled=True,\
+overrides=None, checkpoint=None, plant=None, crn=False, analysis=False):
+    """Runs one replica of the model, with the given parameter overrides, starting from
+    a checkpoint if given (the replica keeps its own random stream).
+    The model is the reference plant, or a plant definition (see Loader), whose
+    parameters are overridden in turn. With common random numbers (crn), each random
+    input has its own stream : the scenarios of a replica get the same inputs.
+    With analysis, the KPIs estimated by an OutputAnalyzer are those of the steady state,
+    after the warm-up (whose length is the 'warmup' KPI, in ticks).
+    The plant KPIs (see KPI.PlantKPIs) are included.
+    Returns its KPIs as a flat dictionary ('element:statistic' -> value)."""
+    model = Model()
+    rng = Random(replicaSeed(seed, replica))
+    streams = Streams(replicaSeed(seed, replica)) if crn else None
+    if plant is None:
+        buildModel(model, rng, parameters(**(overrides or {})), streams)
+    else:
+        loadPlant(model, plant, rng, parameters(**dict(plant.get("parameters", {}),\
+        **(overrides or {}))), streams)
+    if checkpoint is not None:
+        model.restore(checkpoint, rngState=False)
+    if compiled:
+        model.compile()
+    model.kpis = PlantKPIs(model)
+    analyzer = OutputAnalyzer(model) if analysis else None
+    if analyzer is not None:
+        model.addObserver(analyzer)
+    result = model.simulate(nbTicks, sampling, nextEvent)
+    metrics = {}
+    for label, stats in result.kpis().items():
+        for name, value in stats.items():
+            metrics[label + ":" + name] = value
+    metrics.update(result.plant)
+    if analyzer is not None:
+        model.removeObserver(analyzer)
+        for name, (mean, _) in analyzer.estimates().items():
+            metrics[name] = mean
+        metrics["warmup"] = analyzer.warmupTicks()
+    return metrics
+
+# Settings of the replications run by a worker process (see ReplicationRunner)
+_SETTINGS = {}
+
+def _initWorker(settings):
+    """Stores the settings once per worker, so that a task only carries a replica number."""
+    _SETTINGS.update(settings)
+
+def _runTask(replica):
+    """Runs a replica in a worker process."""
+    return replica, runReplica(replica, **_SETTINGS)
+
+class ReplicationRunner(object):
+    """Runs seeded replications of the model over a pool of processes.
+    The same root seed gives the same results, whatever the number of processes."""
+    def __init__(self, nbTicks, sampling=60, nextEvent=True, compiled=True, processes=None,\
+    checkpoint=None, plant=None, crn=False, analysis=False):
+        self.settings = {"nbTicks": nbTicks, "sampling": sampling, "nextEvent": nextEvent,\
+        "compiled": compiled, "checkpoint": checkpoint, "plant": plant, "crn": crn,\
+        "analysis": analysis}
+        self.processes = processes or cpu_count() or 1
+
+    def run(self, seed, nbReplicas, first=0):
+        """Generates the (replica, metrics) couples as soon as the replicas finish,
+        for the replicas first to nbReplicas-1."""
+        settings = dict(self.settings, seed=seed)
+        replicas = range(first, nbReplicas)
+        if self.processes == 1:
+            for replica in replicas:
+                yield replica, runReplica(replica, **settings)
+            return
+        # Imported when needed, so that the workers and the other runs start faster
+        from multiprocessing import Pool
+        # A few chunks per process balance the load while keeping the overhead low
+        chunksize = max(1, len(replicas)//(8*self.processes))
+        with Pool(self.processes, _initWorker, (settings,)) as pool:
+            for result in pool.imap_unordered(_runTask, replicas, chunksize):
+                yield result
+
+    def runUntilPrecise(self, seed, targets, maxReplicas, minReplicas=3, level=0.95):
+        """Runs batches of replicas (one per process) until the mean of each metric of
+        targets (name -> half-width) is estimated within its target half-width, or
+        maxReplicas replicas have run. Returns the (replica, metrics) couples."""
+        results = []
+        while len(results) < maxReplicas:
+            count = min(maxReplicas, max(minReplicas, len(results) + self.processes))
+            results.extend(self.run(seed, count, len(results)))
+            aggregated = ReplicationRunner.aggregate(results, level)
+            for name in targets:
+                if name not in aggregated:
+                    raise KeyError("unknown metric : " + name)
+            if all(aggregated[name][1] <= target for name, target in targets.items()):
+                break
+        return results
+
+    @staticmethod
+    def aggregate(results, level=0.95):
+        """Returns the mean and the confidence interval half-width of each metric
+        over the (replica, metrics) couples."""
+        results = sorted(results, key=lambda result: result[0])
+        aggregated = {}
+        if not results:
+            return aggregated
+        for name in results[0][1]:
+            aggregated[name] = meanConfidence([metrics[name] for _, metrics in results], level)
+        return aggregated
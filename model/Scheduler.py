@@ -0,0 +1,127 @@
+"""Dirty-set scheduling : only the nodes which may do something are ticked."""
+
+from heapq import heapify, heappop, heappush
+from bt.base import FOREVER
+
+class Scheduler(object):
+    """Ticks the nodes whose elements changed, or whose trees are not idle.
+    A node sleeps when the peek of its tree is idle until an element changes (FOREVER).
+    The elements call the scheduler when increase or decrease changes them : the nodes
+    accessing them (see Node.elements) wake up, later in the same tick if they come
+    after the changing node, as in a full sweep, or at the next tick otherwise.
+    A waking node first skips the ticks it slept, before the element changes, so that
+    the results (and the counters of the tasks) are the same as ticking every node at
+    every tick. Nodes with running timers (Delay, Mine...)
+    stay awake ; their trees are only peeked from time to time (see Model.MAX_BACKOFF)."""
+    def __init__(self, model):
+        self.model = model
+        nodes = model.nodes
+        self.trees = [node.bTree for node in nodes]
+        # Nodes accessing each element
+        self.watchers = {}
+        for index, node in enumerate(nodes):
+            if node.bTree is not None:
+                for element in node.elements():
+                    self.watchers.setdefault(id(element), (element, []))[1].append(index)
+        for element, _ in self.watchers.values():
+            element.listener = self.changed
+        # Tick since which each node sleeps (None when awake),
+        # ticks before its next peek and backoff
+        self.asleep = [None]*len(nodes)
+        self.wait = [0]*len(nodes)
+        self.backoff = [1]*len(nodes)
+        # Last tick each node has been queued for
+        self.queued = [-1]*len(nodes)
+        # Nodes to tick in the current tick and in the next one, index of the running node
+        self.current = []
+        self.next = [index for index, tree in enumerate(self.trees) if tree is not None]
+        self.position = len(nodes)
+
+    def detach(self):
+        """Stops listening to the elements."""
+        for element, _ in self.watchers.values():
+            del element.listener
+
+    def changed(self, element):
+        """Wakes the nodes accessing an element about to change."""
+        clock = self.model.clock
+        position = self.position
+        queued, asleep = self.queued, self.asleep
+        end = len(asleep)
+        for index in self.watchers[id(element)][1]:
+            # The ticks slept saw the element before the change (the nodes before the
+            # running one have already slept the current tick)
+            if asleep[index] is not None:
+                self.trees[index].skip(clock - asleep[index] + (index < position < end))
+                asleep[index] = None
+                self.wait[index] = 0
+            if index > position:
+                if queued[index] < clock:
+                    queued[index] = clock
+                    heappush(self.current, index)
+            # The running node already peeks the changes it makes
+            elif index != position and queued[index] <= clock:
+                queued[index] = clock+1
+                self.next.append(index)
+
+    def settle(self):
+        """Applies the ticks slept so far to the sleeping nodes, which stay asleep : the
+        counters of their tasks are then up to date (see KPI.PlantKPIs). To be called
+        between two ticks."""
+        clock = self.model.clock
+        asleep = self.asleep
+        for index, since in enumerate(asleep):
+            if since is not None and since < clock:
+                self.trees[index].skip(clock - since)
+                asleep[index] = clock
+
+    def reset(self):
+        """Wakes all the nodes, without skipping the ticks they slept : to be called when
+        the levels and the progress of the tasks are set from outside (e.g. a checkpoint)."""
+        self.asleep = [None]*len(self.asleep)
+        self.wait = [0]*len(self.wait)
+        self.queued = [-1]*len(self.queued)
+        self.next = [index for index, tree in enumerate(self.trees) if tree is not None]
+
+    def tick(self):
+        """Ticks the awake nodes once, in the order of the model."""
+        clock = self.model.clock
+        nodes = self.model.nodes
+        trees = self.trees
+        asleep, queued, wait, backoff = self.asleep, self.queued, self.wait, self.backoff
+        heap = self.next
+        heapify(heap)
+        self.current = heap
+        self.next = nextTick = []
+        while heap:
+            index = heappop(heap)
+            self.position = index
+            if asleep[index] is not None:
+                trees[index].skip(clock - asleep[index])
+                asleep[index] = None
+                wait[index] = 0
+            nodes[index].run()
+            if wait[index] > 0:
+                wait[index] -= 1
+                queued[index] = clock+1
+                nextTick.append(index)
+            elif trees[index].peek()[1] == FOREVER:
+                asleep[index] = clock+1
+                backoff[index] = 1
+            else:
+                # Peeking is not free : waits longer after each unsuccessful attempt
+                wait[index] = backoff[index]
+                backoff[index] = min(2*backoff[index], self.model.MAX_BACKOFF)
+                queued[index] = clock+1
+                nextTick.append(index)
+        self.position = len(nodes)
+
+    def skip(self, ticks):
+        """Applies idle ticks to the awake nodes (see Model.advance) : the sleeping ones
+        catch up when they wake."""
+        for index, tree in enumerate(self.trees):
+            if tree is not None and self.asleep[index] is None:
+                tree.skip(ticks)
+        # The awake nodes are now queued for the tick after the jump
+        for index in self.next:
+            self.queued[index] = self.model.clock + ticks
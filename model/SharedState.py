@@ -0,0 +1,95 @@
+"""Shared memory channel between the model process and the GUI."""
+
+from multiprocessing.shared_memory import SharedMemory
+import queue
+from array import array
+from .Snapshot import Snapshot
+
+class SharedStateChannel(object):
+    """Double-buffered shared memory channel carrying the model snapshots.
+    It replaces the GUI queue : put() never blocks, and get() returns a copy of the newest
+    frame, without pickling.
+    The sequence counter is a seqlock : it is odd while the model writes a frame, and
+    get() copies the frame again if the counter changed during the copy."""
+    def __init__(self, size, name=None):
+        # Number of values in a snapshot
+        self.size = size
+        # Only the creator of the shared memory removes it
+        self.owner = name is None
+        # Sequence counter (even once a frame is published), then two frames of (time, values)
+        nbBytes = 8 + 2*(1+size)*8
+        if self.owner:
+            self.memory = SharedMemory(create=True, size=nbBytes)
+        else:
+            self.memory = SharedMemory(name)
+        self._attach()
+
+    def _attach(self):
+        """Creates the views on the shared memory."""
+        self.sequence = self.memory.buf[:8].cast('Q')
+        frames = self.memory.buf[8:8+2*(1+self.size)*8].cast('d')
+        self.frames = (frames[:1+self.size], frames[1+self.size:])
+        frames.release()
+        # Sequence number of the last frame returned by get()
+        self.lastRead = self.sequence[0]
+
+    def _detach(self):
+        """Releases the views on the shared memory, then closes it."""
+        if not self.frames:
+            return
+        self.sequence.release()
+        for frame in self.frames:
+            frame.release()
+        self.frames = ()
+        self.memory.close()
+
+    def __getstate__(self):
+        return (self.memory.name, self.size)
+
+    def __setstate__(self, state):
+        name, self.size = state
+        self.owner = False
+        self.memory = SharedMemory(name)
+        self._attach()
+
+    def put(self, snapshot, block=True, timeout=None):
+        """Writes a snapshot in the back buffer, then publishes it."""
+        sequence = self.sequence[0]
+        # Odd while writing
+        self.sequence[0] = sequence + 1
+        frame = self.frames[(sequence//2 + 1) % 2]
+        frame[0] = snapshot.time
+        frame[1:] = snapshot.values
+        self.sequence[0] = sequence + 2
+
+    def put_nowait(self, snapshot):
+        """Same as put : the channel never blocks."""
+        self.put(snapshot)
+
+    def get(self, block=False, timeout=None):
+        """Returns the newest frame, or raises queue.Empty if it has already been read."""
+        while True:
+            sequence = self.sequence[0]
+            if sequence - sequence % 2 == self.lastRead:
+                raise queue.Empty
+            if sequence % 2:
+                # The model is writing a frame
+                continue
+            frame = self.frames[(sequence//2) % 2]
+            time = int(frame[0])
+            values = array('d', frame[1:])
+            # The model overwrote the frame while it was copied
+            if self.sequence[0] == sequence:
+                break
+        self.lastRead = sequence
+        return Snapshot(time, values)
+
+    def close(self):
+        """Releases the shared memory, and removes it if this channel created it."""
+        if self.owner:
+            self.memory.unlink()
+            self.owner = False
+        self._detach()
+
+    def __del__(self):
+        self._detach()
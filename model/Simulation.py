@@ -0,0 +1,96 @@
+"""Headless simulation : level histories and summary KPIs."""
+
+from .config import TICK
+
+def labels(elements, prefix, taken=()):
+    """Returns unique labels for a list of model elements.
+    Unnamed elements are labelled with a prefix and their index."""
+    result = []
+    for index, element in enumerate(elements):
+        label = " ".join(element.name.split()) or prefix + str(index)
+        if label in result or label in taken:
+            label = prefix + str(index) + ":" + label
+        result.append(label)
+    return result
+
+class History(object):
+    """Model observer recording the levels of the nodes and edges."""
+    def __init__(self, model, sampling=1):
+        self.model = model
+        # Number of ticks between two samples
+        self.sampling = sampling
+        # Simulation times of the samples (minutes)
+        self.times = []
+        # One list of levels per node and per edge
+        self.nodeLevels = [[] for _ in model.nodes]
+        self.edgeLevels = [[] for _ in model.edges]
+
+    def update(self, model):
+        """Records the levels, if a sample is due."""
+        if model.clock % self.sampling != 0:
+            return
+        self.times.append(model.clock*TICK)
+        for levels, node in zip(self.nodeLevels, model.nodes):
+            levels.append(node.current)
+        for levels, edge in zip(self.edgeLevels, model.edges):
+            levels.append(edge.current)
+
+    def result(self):
+        """Returns the recorded histories as a SimulationResult."""
+        model = self.model
+        nodeLabels = labels(model.nodes, "node")
+        nodes = dict(zip(nodeLabels, self.nodeLevels))
+        edges = dict(zip(labels(model.edges, "edge", nodeLabels), self.edgeLevels))
+        capacities = {}
+        for label, element in zip(nodes, model.nodes):
+            capacities[label] = element.capacity
+        for label, element in zip(edges, model.edges):
+            capacities[label] = element.capacity
+        plant = model.kpis.kpis() if model.kpis is not None else {}
+        return SimulationResult(self.times, nodes, edges, capacities, plant)
+
+class SimulationResult(object):
+    """Level histories of a headless run."""
+    def __init__(self, times, nodes, edges, capacities, plant=None):
+        # Simulation times of the samples (minutes)
+        self.times = times
+        # Levels of the nodes and edges, by label
+        self.nodes = nodes
+        self.edges = edges
+        # Capacities, by label ("" when the element has no capacity)
+        self.capacities = capacities
+        # Plant KPIs, by name (see KPI.PlantKPIs)
+        self.plant = plant or {}
+
+    def kpis(self):
+        """Returns summary KPIs for each node and edge, by label."""
+        kpis = {}
+        for label, levels in list(self.nodes.items()) + list(self.edges.items()):
+            if not levels:
+                continue
+            capacity = self.capacities[label]
+            stats = {"mean": sum(levels)/len(levels), "min": min(levels), "max": max(levels),\
+            "final": levels[-1]}
+            if capacity != "" and capacity > 0:
+                stats["utilization"] = stats["mean"]/capacity
+                stats["fullRatio"] = sum(1 for level in levels if level >= capacity)/len(levels)
+                stats["emptyRatio"] = sum(1 for level in levels if level <= 0)/len(levels)
+            kpis[label] = stats
+        return kpis
+
+    def writeCSV(self, path):
+        """Writes the level histories in a CSV file, one column per element."""
+        import csv
+        columns = list(self.nodes.values()) + list(self.edges.values())
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(["time"] + list(self.nodes) + list(self.edges))
+            for row in zip(self.times, *columns):
+                writer.writerow(row)
+
+    def writeKPIs(self, path):
+        """Writes the summary KPIs in a JSON file."""
+        import json
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump({"duration": self.times[-1] if self.times else 0, "kpis": self.kpis(),\
+            "plant": self.plant}, output, indent=2, ensure_ascii=False)
@@ -0,0 +1,89 @@
+"""Compact representation of the model state for the GUI."""
+
+from array import array
+import struct
+
+# Frames of the snapshots sent over a stream or written in a replay (see Streaming) :
+# header (length of the payload, kind, simulation time), then payload
+HEADER = struct.Struct('<IBQ')
+# Kinds of frames
+LAYOUT, KEYFRAME, DELTA = range(3)
+# Changed level of a delta frame : index in the snapshot, level
+CHANGE = struct.Struct('<Id')
+
+def packLevels(values):
+    """Returns the payload of a keyframe."""
+    return struct.pack('<%dd' % len(values), *values)
+
+class Layout(object):
+    """Static part of the model : names, capacities, positions and sizes.
+    Sent once at startup, the snapshots only carry the levels."""
+    def __init__(self, model):
+        self.nodeNames = [node.name for node in model.nodes]
+        self.nodeCapacities = [node.capacity for node in model.nodes]
+        self.positions = [node.position for node in model.nodes]
+        self.sizes = [node.size for node in model.nodes]
+        self.edgeNames = [edge.name for edge in model.edges]
+        self.edgeCapacities = [edge.capacity for edge in model.edges]
+        # Indexes of the origin and destination nodes of the edges
+        nodeIndexes = {id(node): index for index, node in enumerate(model.nodes)}
+        self.edgeEnds = [(nodeIndexes[id(edge.nodeFrom)], nodeIndexes[id(edge.nodeTo)])\
+        for edge in model.edges]
+        # Names of the plant KPIs following the levels in the snapshots
+        self.kpiNames = list(model.kpis.names) if model.kpis is not None else []
+
+    def asDict(self):
+        """Returns the layout as a dictionary of lists (e.g. to send it as JSON)."""
+        return {name: [list(value) if isinstance(value, tuple) else value for value in values]\
+        for name, values in vars(self).items()}
+
+    @staticmethod
+    def fromDict(values):
+        """Returns the layout given by asDict."""
+        layout = Layout.__new__(Layout)
+        for name, items in values.items():
+            setattr(layout, name, [tuple(value) if isinstance(value, list) else value\
+            for value in items])
+        return layout
+
+    @property
+    def nbNodes(self):
+        """Number of nodes."""
+        return len(self.nodeNames)
+
+    @property
+    def nbEdges(self):
+        """Number of edges."""
+        return len(self.edgeNames)
+
+    @property
+    def nbValues(self):
+        """Number of values in a snapshot."""
+        return len(self.nodeNames) + len(self.edgeNames) + len(self.kpiNames)
+
+class Snapshot(object):
+    """Levels of the model elements at a given time.
+    The node levels come first in the buffer, followed by the edge levels, then by the
+    plant KPIs if the model has any (see Layout.kpiNames)."""
+    __slots__ = ('time', 'values')
+
+    def __init__(self, time, values):
+        # Simulation time (in number of ticks)
+        self.time = time
+        # Packed levels (array of doubles)
+        self.values = values
+
+    @staticmethod
+    def capture(model):
+        """Returns a snapshot of the current levels of a model."""
+        values = array('d', [node.current for node in model.nodes])
+        values.extend([edge.current for edge in model.edges])
+        if model.kpis is not None:
+            values.extend(model.kpis.values())
+        return Snapshot(model.clock, values)
+
+    def __getstate__(self):
+        return (self.time, self.values)
+
+    def __setstate__(self, state):
+        self.time, self.values = state
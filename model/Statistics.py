@@ -0,0 +1,73 @@
+"""Statistics on simulation outputs."""
+
+from math import sqrt, tan, pi
+
+def tQuantile(p, df):
+    """Quantile of the Student t distribution : exact for 1 and 2 degrees of freedom, else
+    Cornish-Fisher expansion around the normal one (accurate to 0.03 from 3 degrees)."""
+    if df == 1:
+        return tan(pi*(p-0.5))
+    if df == 2:
+        return (2*p-1)/sqrt(2*p*(1-p))
+    from statistics import NormalDist
+    z = NormalDist().inv_cdf(p)
+    z3, z5, z7 = z**3, z**5, z**7
+    return z + (z3+z)/(4*df) + (5*z5+16*z3+3*z)/(96*df**2)\
+    + (3*z7+19*z5+17*z3-15*z)/(384*df**3)
+
+def meanConfidence(values, level=0.95):
+    """Returns the mean of a sample, and the half-width of its confidence interval."""
+    n = len(values)
+    mean = sum(values)/n
+    if n < 2:
+        return mean, float('inf')
+    variance = sum((value-mean)**2 for value in values)/(n-1)
+    return mean, tQuantile((1+level)/2, n-1)*sqrt(variance/n)
+
+class RunningStats(object):
+    """Mean and variance of a stream of values, updated in constant memory (Welford)."""
+    def __init__(self, values=()):
+        self.count = 0
+        self.mean = 0.0
+        # Sum of the squared deviations from the mean
+        self.squares = 0.0
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        """Adds a value."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta/self.count
+        self.squares += delta*(value - self.mean)
+
+    def variance(self):
+        """Returns the sample variance (0 with less than 2 values)."""
+        return self.squares/(self.count-1) if self.count > 1 else 0.0
+
+    def halfWidth(self, level=0.95):
+        """Returns the half-width of the confidence interval of the mean."""
+        if self.count < 2:
+            return float('inf')
+        return tQuantile((1+level)/2, self.count-1)*sqrt(self.variance()/self.count)
+
+def mser(values):
+    """Returns the number of values to truncate at the start of a series (warm-up), by the
+    MSER rule : the one minimizing the variance of the mean of the remaining values, within
+    the first half of the series. Applied to batch means (e.g. of 5 values), it is MSER-5."""
+    n = len(values)
+    if n < 4:
+        return 0
+    # Sums of the remaining values and of their squares, from the end
+    total = sum(values)
+    squares = sum(value*value for value in values)
+    best, truncation = None, 0
+    for d in range(n//2 + 1):
+        remaining = n - d
+        mean = total/remaining
+        score = (squares/remaining - mean*mean)/remaining
+        if best is None or score < best:
+            best, truncation = score, d
+        total -= values[d]
+        squares -= values[d]*values[d]
+    return truncation
@@ -0,0 +1,239 @@
+"""Streaming of the model levels to any number of read-only dashboards over TCP.
+
+Each frame is a header (length of the payload, kind, simulation time in ticks) followed
+by its payload :
+- LAYOUT : the static layout of the model (JSON, see Layout.asDict), sent once,
+- KEYFRAME : all the levels (doubles, the nodes, the edges then the KPIs, as in Snapshot),
+- DELTA : the levels changed since the previous frame of the client, as (index, level)
+  couples.
+All the numbers are little-endian."""
+
+import asyncio
+import json
+import queue
+import socket
+import struct
+from array import array
+from threading import Thread, Lock
+from .Snapshot import Layout, Snapshot, HEADER, LAYOUT, KEYFRAME, DELTA, CHANGE, packLevels
+
+# Default host : the dashboards run on the same machine
+HOST = "127.0.0.1"
+# Number of ticks run between two turns of the event loop (see serve)
+CHUNK = 100
+
+def parseAddress(text, host=HOST):
+    """Returns the (host, port) couple of a '[HOST:]PORT' address."""
+    if ":" in text:
+        host, text = text.rsplit(":", 1)
+    return host, int(text)
+
+class StreamServer(object):
+    """Channel streaming the model snapshots to the connected clients : it replaces the GUI
+    queue (see Publisher), and put_nowait never blocks.
+    A client gets the layout, a keyframe, then deltas. The simulation never waits for a
+    client : while the socket buffer of a client is full, its changes are merged (the newest
+    level of each element wins) and sent in a single delta once the buffer has drained."""
+    def __init__(self, layout, highWater=64*1024):
+        self.layout = json.dumps(layout.asDict()).encode()
+        # Size of the socket buffer of a client above which its frames are merged
+        self.highWater = highWater
+        self.clients = set()
+        # Last snapshot (time and levels)
+        self.time = 0
+        self.values = None
+        self.server = None
+
+    async def start(self, host=HOST, port=0):
+        """Starts listening. Returns the (host, port) address of the server."""
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: _Client(self), host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    def put_nowait(self, snapshot):
+        """Sends the levels changed since the last snapshot to the clients."""
+        values = snapshot.values
+        previous = self.values
+        if previous is None or len(previous) != len(values):
+            changes = range(len(values))
+        else:
+            changes = [index for index, (old, new) in enumerate(zip(previous, values))\
+            if old != new]
+        self.time = snapshot.time
+        self.values = array('d', values)
+        for client in self.clients:
+            client.send(changes)
+
+    def put(self, snapshot, block=True, timeout=None):
+        """Same as put_nowait : the channel never blocks."""
+        self.put_nowait(snapshot)
+
+    def close(self):
+        """Stops listening and disconnects the clients."""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for client in list(self.clients):
+            client.transport.close()
+        self.clients.clear()
+
+class _Client(asyncio.Protocol):
+    """Connection of a client, with the levels changed since its last frame."""
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        # The socket buffer is full, a keyframe is due
+        self.paused = False
+        self.keyframe = True
+        # Levels not sent yet, by index
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.set_write_buffer_limits(high=self.server.highWater)
+        transport.write(HEADER.pack(len(self.server.layout), LAYOUT, self.server.time)\
+        + self.server.layout)
+        self.server.clients.add(self)
+        self.flush()
+
+    def connection_lost(self, exc):
+        self.server.clients.discard(self)
+
+    def data_received(self, data):
+        # The clients are read-only
+        return
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.flush()
+
+    def send(self, changes):
+        """Sends the changed levels, or merges them while the socket buffer is full."""
+        if not self.keyframe:
+            values = self.server.values
+            pending = self.pending
+            for index in changes:
+                pending[index] = values[index]
+        if not self.paused and not self.transport.is_closing():
+            self.flush()
+
+    def flush(self):
+        """Sends the keyframe or the pending delta."""
+        server = self.server
+        if server.values is None:
+            return
+        if self.keyframe:
+            payload = packLevels(server.values)
+            kind = KEYFRAME
+            self.keyframe = False
+        elif self.pending:
+            payload = b''.join([CHANGE.pack(index, value)\
+            for index, value in self.pending.items()])
+            kind = DELTA
+        else:
+            return
+        self.pending.clear()
+        self.transport.write(HEADER.pack(len(payload), kind, server.time) + payload)
+
+async def serve(model, host=HOST, port=0, ready=None):
+    """Runs the model forever, streaming its levels to the clients (see StreamServer)
+    according to its publication policy. ready is called with the address of the server."""
+    server = StreamServer(Layout(model))
+    address = await server.start(host, port)
+    model.gui = server
+    if ready is not None:
+        ready(address)
+    run = model.run
+    try:
+        while True:
+            for _ in range(CHUNK):
+                run()
+            # Lets the clients connect and their sockets drain
+            await asyncio.sleep(0)
+    finally:
+        model.gui = None
+        server.close()
+
+class StreamClient(object):
+    """Dashboard side of a StreamServer : rebuilds the snapshots from the frames in
+    a background thread. It stands for the model process of the GUI (getQueue, getLayout) :
+    get returns the newest snapshot, or raises queue.Empty if there is no new one."""
+    def __init__(self, host, port, timeout=10):
+        self.socket = socket.create_connection((host, port), timeout)
+        self.socket.settimeout(None)
+        self.source = self.socket.makefile('rb')
+        kind, _, payload = self.readFrame()
+        if kind != LAYOUT:
+            raise ValueError("the stream does not start with a layout")
+        self.layout = Layout.fromDict(json.loads(payload))
+        self.values = array('d', [0.0])*self.layout.nbValues
+        # Newest snapshot not read yet
+        self.latest = None
+        self.lock = Lock()
+        self.thread = Thread(target=self.receive, daemon=True)
+        self.thread.start()
+
+    def readFrame(self):
+        """Returns the kind, the time and the payload of the next frame.
+        Raises EOFError at the end of the stream."""
+        header = self.source.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise EOFError
+        length, kind, time = HEADER.unpack(header)
+        payload = self.source.read(length)
+        if len(payload) < length:
+            raise EOFError
+        return kind, time, payload
+
+    def receive(self):
+        """Applies the frames until the end of the stream."""
+        values = self.values
+        try:
+            while True:
+                kind, time, payload = self.readFrame()
+                if kind == KEYFRAME:
+                    values[:] = array('d', struct.unpack('<%dd' % len(values), payload))
+                elif kind == DELTA:
+                    for index, value in CHANGE.iter_unpack(payload):
+                        values[index] = value
+                else:
+                    continue
+                with self.lock:
+                    self.latest = Snapshot(time, array('d', values))
+        except (EOFError, OSError, ValueError):
+            return
+
+    def get(self, block=False, timeout=None):
+        """Returns the newest snapshot, or raises queue.Empty if it has already been read."""
+        with self.lock:
+            snapshot, self.latest = self.latest, None
+        if snapshot is None:
+            raise queue.Empty
+        return snapshot
+
+    def getQueue(self):
+        """Returns the channel of the snapshots."""
+        return self
+
+    def getLayout(self):
+        """Returns the static layout of the model."""
+        return self.layout
+
+    def terminate(self):
+        """Disconnects : the remote model keeps running."""
+        self.close()
+
+    def close(self):
+        """Closes the connection."""
+        if self.socket is None:
+            return
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.source.close()
+        self.socket.close()
+        self.socket = None
@@ -0,0 +1,94 @@
+"""Parameter sweeps : one model per set of parameter overrides, run in parallel."""
+
+import csv
+from itertools import product
+from os import cpu_count
+from .Replication import runReplica, ReplicationRunner
+from .config import parameters
+
+def grid(**axes):
+    """Returns the scenarios of a full factorial grid : grid(MAX_PIT2=[2000, 2500], ...)
+    gives one dictionary of overrides per combination of values."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in product(*(axes[name] for name in names))]
+
+# Settings of the sweep run by a worker process (see Sweep)
+_SETTINGS = {}
+
+def _initWorker(settings):
+    """Stores the settings once per worker."""
+    _SETTINGS.update(settings)
+
+def _runTask(task):
+    """Runs a replica of a scenario in a worker process."""
+    scenario, overrides, replica = task
+    return scenario, replica, runReplica(replica, overrides=overrides, **_SETTINGS)
+
+class Sweep(object):
+    """Runs replications of several scenarios over a pool of processes.
+    A scenario is a dictionary of parameter overrides (see config.parameters) : the
+    module globals are never modified. Scenarios giving the same parameter values are
+    only evaluated once. All the scenarios use the same random streams, and may branch
+    from the same checkpoint (e.g. a warmed-up state), and run a plant definition
+    instead of the reference plant (see Loader). With common random numbers (crn), the
+    random inputs stay the same across scenarios, which sharpens their comparison."""
+    def __init__(self, nbTicks, replications=1, seed=0, sampling=60, nextEvent=True,\
+    compiled=True, processes=None, checkpoint=None, plant=None, crn=False):
+        self.settings = {"seed": seed, "nbTicks": nbTicks, "sampling": sampling,\
+        "nextEvent": nextEvent, "compiled": compiled, "checkpoint": checkpoint, "plant": plant,\
+        "crn": crn}
+        self.replications = replications
+        self.processes = processes or cpu_count() or 1
+
+    def distinct(self, scenarios):
+        """Returns the scenarios giving distinct parameter values, in their original order
+        (the overrides apply over the parameters of the plant definition, if any)."""
+        plant = self.settings["plant"]
+        base = plant.get("parameters", {}) if plant is not None else {}
+        keys = set()
+        result = []
+        for overrides in scenarios:
+            key = parameters(**dict(base, **overrides)).key()
+            if key not in keys:
+                keys.add(key)
+                result.append(overrides)
+        return result
+
+    def run(self, scenarios, level=0.95):
+        """Runs the scenarios. Returns one row per distinct scenario : its overrides,
+        then the mean and confidence interval half-width of each metric."""
+        scenarios = self.distinct(scenarios)
+        tasks = [(index, overrides, replica) for index, overrides in enumerate(scenarios)\
+        for replica in range(self.replications)]
+        results = [[] for _ in scenarios]
+        if self.processes == 1:
+            _initWorker(self.settings)
+            for task in tasks:
+                scenario, replica, metrics = _runTask(task)
+                results[scenario].append((replica, metrics))
+        else:
+            # Imported when needed, so that the workers and the other runs start faster
+            from multiprocessing import Pool
+            chunksize = max(1, len(tasks)//(8*self.processes))
+            with Pool(self.processes, _initWorker, (self.settings,)) as pool:
+                for scenario, replica, metrics in pool.imap_unordered(_runTask, tasks, chunksize):
+                    results[scenario].append((replica, metrics))
+        rows = []
+        for overrides, scenarioResults in zip(scenarios, results):
+            row = dict(overrides)
+            for name, (mean, halfWidth) in ReplicationRunner.aggregate(scenarioResults,\
+            level).items():
+                row[name] = mean
+                row[name + ":halfWidth"] = halfWidth
+            rows.append(row)
+        return rows
+
+def writeTable(rows, path):
+    """Writes the rows of a sweep in a CSV file."""
+    columns = []
+    for row in rows:
+        columns.extend(name for name in row if name not in columns)
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.DictWriter(output, columns)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,361 @@
+"""Vectorized Monte Carlo engine : independent replicas of a model advanced at once.
+Requires numpy."""
+
+import numpy as np
+from bt.base import Task, TOLERANCE, Selector, SelectorStar, Sequence, SequenceStar
+from bt.base import Threshold, SpaceChecker, RawUpdater, Mine, Train, Boat
+from bt.base import Consume, MultipleConsume
+from bt.decorator import Delay, RandomDelay, Repeater, ThresholdDec
+from .Model import ModelObject
+from .ModelBuilder import triangularDistrib
+from .Distributions import Sampler
+from .Simulation import labels
+from .config import DEFAULTS
+
+ECHEC, SUCCES, RUNNING = Task.ECHEC, Task.SUCCES, Task.RUNNING
+
+class VectorModel(object):
+    """Replicas of a built model, whose levels are arrays over the replicas.
+    The behaviour trees are converted into vectorized tasks, which run on the replicas
+    selected by a boolean mask and keep their state (index, delay, remaining...) in arrays.
+    Each replica follows exactly the logic of the original model."""
+    def __init__(self, model, replicas, seed=None):
+        self.replicas = replicas
+        self.rng = np.random.default_rng(seed)
+        self.nodes = model.nodes
+        self.edges = model.edges
+        elements = model.nodes + model.edges
+        # Column of each element
+        self.columns = {id(element): column for column, element in enumerate(elements)}
+        # Levels, one row per element (see levels for the (replicas, elements) view)
+        self.current = np.empty((len(elements), replicas))
+        for column, element in enumerate(elements):
+            self.current[column] = element.current
+        # Capacities, elements without capacity are unbounded
+        self.capacity = np.array([np.inf if element.capacity == "" else element.capacity\
+        for element in elements], dtype=float)
+        self.trees = [self.convert(node.bTree) for node in model.nodes if node.bTree is not None]
+        self.everyone = np.ones(replicas, dtype=bool)
+        self.clock = model.clock
+
+    @property
+    def levels(self):
+        """Levels of the elements, shape (replicas, nodes+edges)."""
+        return self.current.T
+
+    def column(self, element):
+        """Returns the column of an element."""
+        return self.columns[id(element)]
+
+    def increase(self, column, amount, mask):
+        """Same as ModelObject.increase for the replicas in mask. Returns the success mask."""
+        current = self.current[column]
+        capacity = self.capacity[column]
+        success = mask & (current + amount <= capacity+ModelObject.TOLERANCE)
+        np.copyto(current, np.minimum(current+amount, capacity), where=success)
+        return success
+
+    def decrease(self, column, amount, mask):
+        """Same as ModelObject.decrease for the replicas in mask. Returns the success mask."""
+        current = self.current[column]
+        success = mask & (current - amount >= 0-ModelObject.TOLERANCE)
+        np.copyto(current, np.maximum(current-amount, 0), where=success)
+        return success
+
+    def sampler(self, genFunc):
+        """Returns a function drawing n values of a generation function."""
+        if genFunc is triangularDistrib or getattr(genFunc, 'func', None) is triangularDistrib:
+            # Parameters bound by miningBT
+            args = getattr(genFunc, 'args', ())
+            params = args[1] if len(args) > 1 else DEFAULTS
+            return lambda n: self.rng.triangular(params.MINE_MIN_OUTPUT, params.MINE_MODE_OUTPUT,\
+            params.MINE_MAX_OUTPUT, n)
+        if isinstance(genFunc, Sampler):
+            return lambda n: genFunc.distribution.numpy(self.rng, n)
+        return lambda n: np.array([genFunc() for _ in range(n)], dtype=float)
+
+    def convert(self, task):
+        """Returns the vectorized version of a task."""
+        kind = type(task)
+        if kind not in VECTOR_TASKS:
+            raise NotImplementedError("no vectorized version of " + kind.__name__)
+        vTask = VECTOR_TASKS[kind](self, task)
+        vTask.children = [self.convert(child) for child in task._children]
+        return vTask
+
+    def step(self):
+        """Ticks the behaviour trees of all the replicas once."""
+        for tree in self.trees:
+            tree.run(self.everyone)
+        self.clock += 1
+
+    def simulate(self, nbTicks):
+        """Runs all the replicas for a given number of ticks.
+        Returns a VectorResult with the level statistics of each replica."""
+        total = np.zeros_like(self.current)
+        low = self.current.copy()
+        high = self.current.copy()
+        step = self.step
+        for _ in range(nbTicks):
+            step()
+            total += self.current
+            np.minimum(low, self.current, out=low)
+            np.maximum(high, self.current, out=high)
+        return VectorResult(self, total/max(nbTicks, 1), low, high, self.current.copy())
+
+class VectorResult(object):
+    """Level statistics of the replicas, arrays of shape (replicas, nodes+edges)."""
+    def __init__(self, vModel, mean, low, high, final):
+        nodeLabels = labels(vModel.nodes, "node")
+        self.labels = nodeLabels + labels(vModel.edges, "edge", nodeLabels)
+        self.mean = mean.T
+        self.min = low.T
+        self.max = high.T
+        self.final = final.T
+
+    def summary(self, quantiles=(0.05, 0.5, 0.95)):
+        """Returns, for each element, the mean over the replicas of its mean level,
+        and the quantiles of its mean level over the replicas."""
+        result = {}
+        for column, label in enumerate(self.labels):
+            means = self.mean[:, column]
+            stats = {"mean": float(means.mean())}
+            for q, value in zip(quantiles, np.quantile(means, quantiles)):
+                stats["q" + str(q)] = float(value)
+            result[label] = stats
+        return result
+
+# ======================================== VECTORIZED TASKS ========================================
+
+class VTask(object):
+    """Vectorized task : run(mask) returns the statuses of the replicas in mask."""
+    def __init__(self, vModel, task):
+        self.vModel = vModel
+        self.children = []
+
+    def run(self, mask):
+        """Ticks the replicas in mask."""
+        raise NotImplementedError("run method not implemented !")
+
+class VComposite(VTask):
+    """Sequences and selectors, with one resume index per replica."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        kind = type(task)
+        self.star = kind in (SequenceStar, SelectorStar)
+        # Status ending the composite, and status returned when no child ends it
+        if kind in (Sequence, SequenceStar):
+            self.stop, self.default = ECHEC, SUCCES
+        else:
+            self.stop, self.default = SUCCES, ECHEC
+        self.index = np.full(vModel.replicas, task.index)
+
+    def run(self, mask):
+        status = np.full(self.vModel.replicas, self.default, dtype=np.int8)
+        active = mask.copy()
+        for i, child in enumerate(self.children):
+            selected = active & (self.index <= i)
+            if not selected.any():
+                continue
+            childStatus = child.run(selected)
+            stopped = selected & (childStatus == self.stop)
+            running = selected & (childStatus == RUNNING)
+            status[stopped] = self.stop
+            status[running] = RUNNING
+            if self.star:
+                self.index[stopped] = 0
+                self.index[running] = i
+            active &= ~(stopped | running)
+        if self.star:
+            self.index[active] = 0
+        return status
+
+class VDelay(VTask):
+    """Delay, with one counter per replica."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.delay = np.full(vModel.replicas, float(task.delay))
+        self._delay = task._delay
+
+    def run(self, mask):
+        waiting = mask & (self.delay > 0)
+        self.delay[waiting] -= 1
+        status = np.full(self.vModel.replicas, RUNNING, dtype=np.int8)
+        selected = mask & ~waiting
+        if selected.any():
+            childStatus = self.children[0].run(selected)
+            status[selected] = childStatus[selected]
+            self.restart(selected & (childStatus != RUNNING))
+        return status
+
+    def restart(self, finished):
+        """Restarts the delay of the replicas whose child finished."""
+        self.delay[finished] = self._delay
+
+class VRandomDelay(VDelay):
+    """Random delay, drawn again for each replica whose child finishes."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.sample = vModel.sampler(task.genFunc)
+        self.scale = task.scale
+        # Each replica draws its own current delay, minus the time already waited
+        elapsed = task._delay - task.delay
+        self.delay = np.maximum(self.sample(vModel.replicas)*task.scale - elapsed, 0)
+
+    def restart(self, finished):
+        count = int(finished.sum())
+        if count:
+            self.delay[finished] = self.sample(count)*self.scale
+
+class VRepeater(VTask):
+    """Repeater."""
+    def run(self, mask):
+        childStatus = self.children[0].run(mask)
+        return np.where(childStatus == SUCCES, SUCCES, RUNNING).astype(np.int8)
+
+class VThresholdDec(VTask):
+    """Threshold condition decorator."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.column = vModel.column(task.element)
+        self.threshold = task.threshold
+        self.inferior = task.cond == task._inf
+
+    def run(self, mask):
+        current = self.vModel.current[self.column]
+        cond = current <= self.threshold if self.inferior else current >= self.threshold
+        selected = mask & cond
+        status = np.full(self.vModel.replicas, ECHEC, dtype=np.int8)
+        if selected.any():
+            childStatus = self.children[0].run(selected)
+            status[selected] = childStatus[selected]
+        return status
+
+class VThreshold(VTask):
+    """Threshold condition."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.column = vModel.column(task.element)
+        self.inferior = task.cond == task._inf
+        self.threshold = task.threshold+TOLERANCE if self.inferior else task.threshold-TOLERANCE
+
+    def run(self, mask):
+        current = self.vModel.current[self.column]
+        cond = current <= self.threshold if self.inferior else current >= self.threshold
+        return np.where(cond, SUCCES, ECHEC).astype(np.int8)
+
+class VSpaceChecker(VTask):
+    """Remaining space condition."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.column = vModel.column(task.element)
+        self.minSpace = task.minSpace
+
+    def run(self, mask):
+        vModel = self.vModel
+        space = vModel.capacity[self.column] - vModel.current[self.column]
+        return np.where(space >= self.minSpace, SUCCES, ECHEC).astype(np.int8)
+
+class VRawUpdater(VTask):
+    """Raw update of an element from another."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.columnFrom = vModel.column(task.elementFrom)
+        self.columnTo = vModel.column(task.elementTo)
+        self.value = task.value
+
+    def run(self, mask):
+        success = self.vModel.increase(self.columnTo, self.value, mask)
+        self.vModel.decrease(self.columnFrom, self.value, success)
+        return np.where(success, SUCCES, ECHEC).astype(np.int8)
+
+class VMine(VTask):
+    """Mine, with one production period per replica."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.node = vModel.column(task.node)
+        self.outEdge = vModel.column(task.outEdge)
+        self.sample = vModel.sampler(task.genFunc)
+        self.nbTicks = task.nbTicks
+        self.minUpdate = task.minUpdate
+        self.remaining = np.full(vModel.replicas, float(task.remaining))
+        # Each replica draws its own first period
+        self.tickAmount = self.sample(vModel.replicas)/task.nbTicks
+
+    def run(self, mask):
+        vModel = self.vModel
+        new = mask & (self.remaining == 0)
+        count = int(new.sum())
+        if count:
+            self.remaining[new] = self.nbTicks
+            self.tickAmount[new] = self.sample(count)/self.nbTicks
+        running = vModel.increase(self.node, self.tickAmount, mask)
+        update = mask & (vModel.current[self.node] >= self.minUpdate)
+        updated = vModel.increase(self.outEdge, self.minUpdate, update)
+        vModel.decrease(self.node, self.minUpdate, updated)
+        self.remaining[mask] -= 1
+        return np.where(running, RUNNING, ECHEC).astype(np.int8)
+
+class VTrain(VTask):
+    """Train."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.outEdge = vModel.column(task.outEdge)
+        self.amount = task.nbWagons*task.wagonCapacity
+
+    def run(self, mask):
+        success = self.vModel.increase(self.outEdge, self.amount, mask)
+        return np.where(success, SUCCES, ECHEC).astype(np.int8)
+
+class VBoat(VTask):
+    """Boat."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        self.incEdge = vModel.column(task.incEdge)
+        self.boatSize = task.boatSize
+
+    def run(self, mask):
+        success = self.vModel.decrease(self.incEdge, self.boatSize, mask)
+        return np.where(success, SUCCES, ECHEC).astype(np.int8)
+
+class VConsume(VTask):
+    """Consume and MultipleConsume, with one remaining production per replica."""
+    def __init__(self, vModel, task):
+        super().__init__(vModel, task)
+        if isinstance(task, MultipleConsume):
+            self.incEdges = [vModel.column(edge) for edge in task.incEdges]
+            self.incSteps = list(task.incSteps)
+        else:
+            self.incEdges = [vModel.column(task.incEdge)]
+            self.incSteps = [task.incStep]
+        self.node = vModel.column(task.node)
+        self.outEdge = vModel.column(task.outEdge)
+        self.toProduce = task.toProduce
+        self.nodeStep = task.nodeStep
+        self.minUpdate = task.minUpdate
+        self.remaining = np.full(vModel.replicas, float(task.remaining))
+
+    def run(self, mask):
+        vModel = self.vModel
+        for column, step in zip(self.incEdges, self.incSteps):
+            vModel.decrease(column, step, mask)
+        vModel.increase(self.node, self.nodeStep, mask)
+        self.remaining[mask] -= self.nodeStep
+        update = mask & (vModel.current[self.node] >= self.minUpdate)
+        updated = vModel.increase(self.outEdge, self.nodeStep, update)
+        vModel.decrease(self.node, self.nodeStep, updated)
+        finished = mask & (self.remaining <= self.nodeStep-TOLERANCE)
+        self.remaining[finished] = self.toProduce
+        # Empties the node
+        leftovers = vModel.current[self.node].copy()
+        empty = finished & (leftovers <= self.minUpdate)
+        vModel.decrease(self.node, leftovers, empty)
+        vModel.increase(self.outEdge, leftovers, empty)
+        return np.where(finished, SUCCES, RUNNING).astype(np.int8)
+
+# Vectorized version of each task type
+VECTOR_TASKS = {Sequence: VComposite, SequenceStar: VComposite, Selector: VComposite,\
+SelectorStar: VComposite, Delay: VDelay, RandomDelay: VRandomDelay, Repeater: VRepeater,\
+ThresholdDec: VThresholdDec, Threshold: VThreshold, SpaceChecker: VSpaceChecker,\
+RawUpdater: VRawUpdater, Mine: VMine, Train: VTrain, Boat: VBoat, Consume: VConsume,\
+MultipleConsume: VConsume}
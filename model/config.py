@@ -7,6 +7,8 @@ NB_WAGONS = 12
 WAGON_CAPACITY = 30000 # litres
 TRAIN_CAPACITY = NB_WAGONS*WAGON_CAPACITY
 TRAIN_REFRESH_TIME = 4.3*1440 # 1 day = 1440 minutes
+# Coefficient of variation of the times between two trains (0 : fixed schedule)
+TRAIN_REFRESH_CV = 0
 MAX_TRAIN = TRAIN_CAPACITY*2 # litres
 # ============================================= RECEIPT ============================================
 MAX_RECEIPT = TRAIN_CAPACITY*2 # litres
@@ -15,6 +17,10 @@ TRAIN_UNLOADING_TIME = 30 # minutes, realistic ?
 MIN_RECEIPT = 10000 # litres
 # ============================================== MINE ==============================================
 MINE_REFRESH_TIME = 1440 # minutes
+# Triangular distribution of the ore produced over a period (tons)
+MINE_MIN_OUTPUT = 10
+MINE_MAX_OUTPUT = 60
+MINE_MODE_OUTPUT = 20
 MAX_MINING = 200 # tons
 MAX_PIT1 = 500 # tons
 # =========================================== PREPARATION ==========================================
@@ -34,3 +40,49 @@ SHIPMENT_SPEED = 100 # tons by hour
 MIN_SHIPMENT = 1 # tons
 # ============================================== BOAT ==============================================
 BOAT_CAPACITY = 2000 # tons
+
+# ******************************************** OVERRIDES *******************************************
+# Parameters computed from other ones, in dependency order
+DERIVED = (
+    ("TRAIN_CAPACITY", lambda p: p["NB_WAGONS"]*p["WAGON_CAPACITY"]),
+    ("MAX_TRAIN", lambda p: p["TRAIN_CAPACITY"]*2),
+    ("MAX_RECEIPT", lambda p: p["TRAIN_CAPACITY"]*2),
+    ("MAX_RECEIPT_EDGE", lambda p: p["TRAIN_CAPACITY"]*2),
+    ("MAX_PREPARATION", lambda p: p["TRAIN_CAPACITY"]*2),
+    ("MIN_PREPARATION", lambda p: p["MIN_RECEIPT"]),
+    ("PREPARATION_TIME", lambda p: p["TRAIN_UNLOADING_TIME"]*(p["MIN_PREPARATION"]/\
+    p["TRAIN_CAPACITY"])),
+    ("MAX_TANK", lambda p: p["TRAIN_CAPACITY"]*2),
+    ("MIN_TANK", lambda p: p["MIN_PIT1"]*1000),
+)
+
+class Parameters(object):
+    """Set of parameter values, read as attributes (params.MAX_PIT2)."""
+    def __init__(self, values):
+        self.__dict__.update(values)
+
+    def values(self):
+        """Returns the parameter values, by name."""
+        return dict(self.__dict__)
+
+    def key(self):
+        """Returns a hashable key identifying the parameter values."""
+        return tuple(sorted(self.__dict__.items()))
+
+def parameters(**overrides):
+    """Returns the parameters of the model, with some values overridden.
+    The module globals are left untouched. A derived parameter is recomputed
+    from the overridden values, unless it is overridden itself."""
+    values = {name: value for name, value in globals().items() if name.isupper()\
+    and name != "DERIVED" and isinstance(value, (int, float))}
+    for name in overrides:
+        if name not in values:
+            raise KeyError("unknown parameter : " + name)
+    values.update(overrides)
+    for name, derive in DERIVED:
+        if name not in overrides:
+            values[name] = derive(values)
+    return Parameters(values)
+
+# Parameters of the reference model
+DEFAULTS = parameters()
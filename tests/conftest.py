@@ -0,0 +1,42 @@
+"""Fixtures of the tests : the reference plant, built with fixed seeds."""
+
+import os
+import sys
+from random import Random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.Model import Model
+from model.ModelBuilder import buildModel
+from model.KPI import PlantKPIs
+from model.Checkpoint import taskValues
+from model.config import parameters
+
+# Ticks of a test run (about three weeks), and sampling period of the levels
+TICKS = 30000
+SAMPLING = 60
+
+@pytest.fixture(params=[{}, {"TRAIN_REFRESH_CV": 0.4, "MAX_TANK": 60}],\
+ids=["reference", "random-trains"])
+def plant(request):
+    """Returns a function building the reference plant from a seed : with the default
+    parameters, and with random times between the trains and a smaller tank."""
+    def build(seed=1):
+        model = Model()
+        buildModel(model, Random(seed), parameters(**request.param))
+        model.kpis = PlantKPIs(model)
+        return model
+    return build
+
+def outcome(model, result):
+    """Returns what a run has to reproduce : the recorded levels, the progress and the
+    counters of the tasks, and the plant KPIs."""
+    return (result.nodes, result.edges, [getattr(task, name) for task, name\
+    in taskValues(model)], result.plant)
+
+@pytest.fixture
+def stepped(plant):
+    """Outcome of a plain tick by tick run of the plant."""
+    model = plant()
+    return outcome(model, model.simulate(TICKS, SAMPLING))
@@ -0,0 +1,72 @@
+"""Checkpoints : a restored run continues exactly as the uninterrupted one."""
+
+from random import Random
+import pytest
+from model import Checkpoint
+from model.Model import Model
+from model.ModelBuilder import buildModel
+from model.Distributions import Streams
+from conftest import TICKS, SAMPLING, outcome
+
+def split(model, data):
+    """Returns the outcome of a run continued from a checkpoint in another model."""
+    model.restore(data)
+    return outcome(model, model.simulate(TICKS//2, SAMPLING))
+
+def test_continues_as_uninterrupted(plant):
+    model = plant()
+    model.simulate(TICKS//2, SAMPLING)
+    restored = plant(seed=2)
+    continued = split(restored, model.checkpoint())
+    expected = outcome(model, model.simulate(TICKS//2, SAMPLING))
+    assert continued == expected
+    assert restored.clock == model.clock
+
+def test_restores_samplers():
+    def build():
+        model = Model()
+        buildModel(model, Random(1), streams=Streams(1))
+        return model
+    model = build()
+    model.simulate(TICKS//2, SAMPLING)
+    data = model.checkpoint()
+    restored = build()
+    restored.restore(data)
+    for sampler, copy in zip(model.samplers, restored.samplers):
+        assert list(copy.pending()) == list(sampler.pending())
+        assert copy.rng.getstate() == sampler.rng.getstate()
+    assert split(build(), data) == outcome(model, model.simulate(TICKS//2, SAMPLING))
+
+def test_branches_diverge(plant):
+    model = plant()
+    model.simulate(TICKS//2, SAMPLING)
+    data = model.checkpoint()
+    branches = []
+    for seed in (1, 2):
+        branch = plant(seed)
+        branch.restore(data, rngState=False)
+        branches.append(branch.simulate(TICKS//2, SAMPLING).nodes)
+    assert branches[0] != branches[1]
+
+def test_previous_version(plant, monkeypatch):
+    model = plant()
+    model.simulate(TICKS//2, SAMPLING)
+    taskValues = Checkpoint.taskValues
+    monkeypatch.setattr(Checkpoint, "VERSION", 2)
+    monkeypatch.setattr(Checkpoint, "taskValues", lambda model: taskValues(model, False))
+    data = model.checkpoint()
+    monkeypatch.undo()
+    restored = plant()
+    restored.restore(data)
+    assert restored.clock == model.clock
+    # The counters are left as is
+    assert restored.kpis.counters() == [0]*len(restored.kpis.counters())
+
+def test_other_structure(plant):
+    data = plant().checkpoint()
+    model = Model()
+    model.addNode("node", 10)
+    with pytest.raises(ValueError):
+        model.restore(data)
+    with pytest.raises(ValueError):
+        model.restore(b'XXXX' + data[4:])
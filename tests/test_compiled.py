@@ -0,0 +1,20 @@
+"""Compiled behaviour trees : same results as the object trees."""
+
+import pickle
+from conftest import TICKS, SAMPLING, outcome
+
+def test_same_outcome(plant, stepped):
+    model = plant()
+    model.compile()
+    assert outcome(model, model.simulate(TICKS, SAMPLING)) == stepped
+
+def test_same_outcome_next_event(plant, stepped):
+    model = plant()
+    model.compile()
+    assert outcome(model, model.simulate(TICKS, SAMPLING, nextEvent=True)) == stepped
+
+def test_copy_runs_object_tree(plant):
+    model = plant()
+    model.compile()
+    copy = pickle.loads(pickle.dumps(model.nodes[0]))
+    assert copy.compiled is None
@@ -0,0 +1,21 @@
+"""Next-event time advance : same results as the tick by tick runs."""
+
+from conftest import TICKS, SAMPLING, outcome
+
+def test_same_outcome(plant, stepped):
+    model = plant()
+    assert outcome(model, model.simulate(TICKS, SAMPLING, nextEvent=True)) == stepped
+
+def test_skips_idle_ticks(plant):
+    model = plant()
+    advances = 0
+    while model.clock < TICKS:
+        model.advance(TICKS - model.clock)
+        advances += 1
+    assert model.clock == TICKS
+    assert advances < TICKS
+
+def test_stops_at_samples(plant):
+    model = plant()
+    result = model.simulate(TICKS, 7, nextEvent=True)
+    assert result.times == plant().simulate(TICKS, 7).times
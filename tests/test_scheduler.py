@@ -0,0 +1,45 @@
+"""Dirty-set scheduling : same results as ticking every node at every tick."""
+
+from bt.base import RawUpdater, Threshold
+from bt.decorator import Delay
+from model.Model import Model
+from conftest import TICKS, SAMPLING, outcome
+
+def test_same_outcome(plant, stepped):
+    model = plant()
+    model.schedule()
+    assert outcome(model, model.simulate(TICKS, SAMPLING)) == stepped
+
+def test_same_outcome_next_event(plant, stepped):
+    model = plant()
+    model.schedule()
+    assert outcome(model, model.simulate(TICKS, SAMPLING, nextEvent=True)) == stepped
+
+def test_same_outcome_compiled(plant, stepped):
+    model = plant()
+    model.compile()
+    model.schedule()
+    assert outcome(model, model.simulate(TICKS, SAMPLING, nextEvent=True)) == stepped
+
+def relay():
+    """Returns a model of two nodes : the first one moves a unit to the second one every
+    50 ticks, the second one checks its level every 500 ticks."""
+    model = Model()
+    source, _ = model.addNode("source", 1000)
+    target, _ = model.addNode("target", 1000)
+    source.current = 1000
+    source.bTree = Delay(50)
+    source.bTree.add_child(RawUpdater(source, target, 1))
+    target.bTree = Delay(500)
+    target.bTree.add_child(Threshold(target, 1000))
+    return model
+
+def test_change_after_skip():
+    # The first tick after a skip changes an element of an awake node coming later
+    expected = relay()
+    expected.simulate(400, 400)
+    model = relay()
+    model.schedule()
+    model.simulate(400, 400, nextEvent=True)
+    assert [(node.bTree.delay, node.current) for node in model.nodes]\
+    == [(node.bTree.delay, node.current) for node in expected.nodes]
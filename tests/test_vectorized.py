@@ -0,0 +1,61 @@
+"""Vectorized Monte Carlo engine : each replica follows the logic of the model."""
+
+import pytest
+from bt.base import Mine
+from bt.decorator import RandomDelay
+
+np = pytest.importorskip("numpy")
+from model.Vectorized import VectorModel
+
+# Replicas and ticks of the vectorized runs (two trains)
+REPLICAS = 4
+TICKS = 8000
+
+def deterministic(model):
+    """Replaces the random inputs of a plant by constant ones : the mine output over a
+    period, and the times between the trains."""
+    for node in model.nodes:
+        if node.bTree is None:
+            continue
+        for task in node.bTree.walk():
+            if isinstance(task, Mine):
+                task.genFunc = lambda: 30.0
+                task.tickAmount = task.genFunc()/task.nbTicks
+            elif isinstance(task, RandomDelay):
+                task.genFunc = lambda: 4.3*1440
+                task.delay = task._delay = task.genFunc()*task.scale
+    return model
+
+class Statistics(object):
+    """Model observer computing the statistics of the levels as VectorModel.simulate."""
+    def __init__(self, model):
+        self.elements = model.nodes + model.edges
+        levels = [element.current for element in self.elements]
+        self.total = [0.0]*len(levels)
+        self.low = list(levels)
+        self.high = list(levels)
+
+    def update(self, model):
+        for column, element in enumerate(self.elements):
+            self.total[column] += element.current
+            self.low[column] = min(self.low[column], element.current)
+            self.high[column] = max(self.high[column], element.current)
+
+def test_replicas_match_model(plant):
+    model = deterministic(plant())
+    result = VectorModel(deterministic(plant()), REPLICAS, seed=0).simulate(TICKS)
+    statistics = Statistics(model)
+    model.addObserver(statistics)
+    for _ in range(TICKS):
+        model.step()
+    final = [element.current for element in statistics.elements]
+    for replica in range(REPLICAS):
+        assert result.final[replica].tolist() == final
+        assert result.min[replica].tolist() == statistics.low
+        assert result.max[replica].tolist() == statistics.high
+        np.testing.assert_allclose(result.mean[replica], np.array(statistics.total)/TICKS,\
+        rtol=1e-12)
+
+def test_replicas_differ(plant):
+    result = VectorModel(plant(), REPLICAS, seed=0).simulate(TICKS)
+    assert len({tuple(levels) for levels in result.final.tolist()}) > 1